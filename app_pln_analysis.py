@@ -2,20 +2,76 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.express as px
+import plotly.graph_objects as go
 import base64
+import cProfile
+import hashlib
+import io
+import json
+import logging
+import logging.handlers
+import os
+import pickle
+import pstats
+import shutil
+import sqlite3
+import stat
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
 import openpyxl
+import pyarrow as pa
+import pyarrow.parquet as pq
+from plotly.subplots import make_subplots
+from PIL import Image
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+try:
+    import fcntl
+except ImportError:  # Windows: tanpa kunci antarproses
+    fcntl = None
 
 # -------------------------------
 # KONFIGURASI AWAL
 # -------------------------------
-st.set_page_config(
-    page_title="Simulasi RAB & Efisiensi PLN",
-    layout="wide",
-    page_icon="⚡"
-)
-
 # Konstanta
 REQUIRED_SHEETS = ["RAB", "Gambar"]
+PROFILE_SHEET = "Profil Beban"
+GAMBAR_COLUMNS = [
+    "Nama Lokasi", "Jenis Kabel", "Panjang Jaringan (m)", "Beban Total (kVA)", "Tegangan (V)",
+    "Tipe Phase", "Daya Trafo (kVA)", "Rugi Trafo (kW)", "Baseline Losses (kW)", "Profil Beban",
+    "ID Segmen", "Segmen Induk"
+]
+GAMBAR_NUMERIC_COLUMNS = [
+    "Panjang Jaringan (m)", "Beban Total (kVA)", "Tegangan (V)", "Daya Trafo (kVA)", "Rugi Trafo (kW)",
+    "Baseline Losses (kW)"
+]
+# Skema validasi per sheet: wajib (kolom harus ada), tipe "angka", batas "non_negatif"/"positif",
+# pilihan (nama daftar nilai yang diizinkan), dan kecuali_ada (abaikan jika kolom lain tersedia)
+GAMBAR_SCHEMA = {
+    "Nama Lokasi": {"wajib": True},
+    "Jenis Kabel": {"wajib": True, "pilihan": "kabel"},
+    "Panjang Jaringan (m)": {"wajib": True, "tipe": "angka", "batas": "non_negatif"},
+    "Beban Total (kVA)": {"wajib": True, "tipe": "angka", "batas": "positif"},
+    "Tegangan (V)": {"wajib": True, "tipe": "angka", "batas": "positif"},
+    "Daya Trafo (kVA)": {"tipe": "angka", "batas": "non_negatif"},
+    "Rugi Trafo (kW)": {"tipe": "angka", "batas": "non_negatif", "kecuali_ada": "Daya Trafo (kVA)"},
+    "Baseline Losses (kW)": {"tipe": "angka", "batas": "non_negatif"},
+}
+RAB_SCHEMA = {
+    "Total (Rp)": {"wajib": True, "tipe": "angka", "batas": "non_negatif"},
+}
+VALIDATION_MESSAGE_EXAMPLES = 5  # contoh kesalahan yang dicantumkan di pesan ValidationError
 DEFAULT_KABEL_DB = {
     "NFA2X-T 2 x 70 + N 70 mm²": 0.443,
     "NFA2X-T 3 x 70 + N 70 mm²": 0.443
@@ -31,19 +87,175 @@ COLORS = {
     "adequate": "#e4b725",
     "unfeasible": "#f12738"
 }
+DEFAULT_CONFIG = {
+    "tarif_kwh": 1500,
+    "faktor_daya": 0.8,
+    "tipe_phase": "3 Phase",
+    "rugi_trafo": 0.5,
+    "baseline_losses": 5.0,
+    "core_loss": 0.2,
+    "full_load_loss": 1.0,
+    "resistansi_kabel": dict(DEFAULT_KABEL_DB),
+    "selected_kabel": list(DEFAULT_KABEL_DB.keys()),
+    "profil_beban": True,
+    "tarif_wbp": 0
+}
+HOURS_PER_YEAR = 8760
+WBP_HOURS = (17, 22)  # Waktu Beban Puncak 17.00-22.00
+PROFILE_META_COLUMNS = ["Jam", "Waktu", "Tanggal", "Tarif (Rp/kWh)"]
+PROFILE_CHUNK_COLUMNS = 256
+SENSITIVITY_PARAMS = {
+    "tarif_kwh": "Tarif Listrik",
+    "faktor_daya": "Faktor Daya",
+    "core_loss": "Core Losses",
+    "full_load_loss": "Full-Load Losses",
+    "baseline_losses": "Baseline Losses"
+}
+SENSITIVITY_BLOCK_SIZE = 2_000_000  # elemen (skenario × lokasi) per blok perhitungan
+# Katalog konduktor bawaan: resistansi AC ~20°C dan KHA dari data pabrikan umum (SPLN 42-10 / SNI),
+# harga per meter bersifat indikatif dan sebaiknya diganti dengan katalog harga satuan terbaru.
+DEFAULT_CONDUCTOR_CATALOGUE = [
+    {"Jenis Kabel": "NFA2X-T 2 x 35 + N 35 mm²", "Resistansi (ohm/km)": 0.868, "KHA (A)": 125, "Harga (Rp/m)": 28000},
+    {"Jenis Kabel": "NFA2X-T 2 x 50 + N 50 mm²", "Resistansi (ohm/km)": 0.641, "KHA (A)": 154, "Harga (Rp/m)": 36000},
+    {"Jenis Kabel": "NFA2X-T 2 x 70 + N 70 mm²", "Resistansi (ohm/km)": 0.443, "KHA (A)": 196, "Harga (Rp/m)": 49525},
+    {"Jenis Kabel": "NFA2X-T 3 x 35 + N 35 mm²", "Resistansi (ohm/km)": 0.868, "KHA (A)": 125, "Harga (Rp/m)": 38000},
+    {"Jenis Kabel": "NFA2X-T 3 x 50 + N 50 mm²", "Resistansi (ohm/km)": 0.641, "KHA (A)": 154, "Harga (Rp/m)": 48000},
+    {"Jenis Kabel": "NFA2X-T 3 x 70 + N 70 mm²", "Resistansi (ohm/km)": 0.443, "KHA (A)": 196, "Harga (Rp/m)": 64000},
+    {"Jenis Kabel": "NFA2X-T 3 x 95 + N 70 mm²", "Resistansi (ohm/km)": 0.320, "KHA (A)": 242, "Harga (Rp/m)": 82000},
+    {"Jenis Kabel": "AAAC 70 mm²", "Resistansi (ohm/km)": 0.493, "KHA (A)": 255, "Harga (Rp/m)": 21000},
+    {"Jenis Kabel": "AAAC 150 mm²", "Resistansi (ohm/km)": 0.236, "KHA (A)": 425, "Harga (Rp/m)": 42000},
+    {"Jenis Kabel": "AAAC 240 mm²", "Resistansi (ohm/km)": 0.140, "KHA (A)": 585, "Harga (Rp/m)": 66000},
+    {"Jenis Kabel": "NYY 4 x 25 mm²", "Resistansi (ohm/km)": 0.727, "KHA (A)": 110, "Harga (Rp/m)": 150000},
+    {"Jenis Kabel": "NYY 4 x 50 mm²", "Resistansi (ohm/km)": 0.387, "KHA (A)": 165, "Harga (Rp/m)": 270000},
+    {"Jenis Kabel": "NYY 4 x 95 mm²", "Resistansi (ohm/km)": 0.193, "KHA (A)": 245, "Harga (Rp/m)": 480000}
+]
+CATALOGUE_COLUMNS = ["Jenis Kabel", "Resistansi (ohm/km)", "KHA (A)", "Harga (Rp/m)"]
+OPTIMIZER_BLOCK_SIZE = 4_000_000  # elemen (lokasi × kabel) per blok perhitungan
+TOPOLOGY_MAX_VECTOR_LEVELS = 1000  # di atas kedalaman ini traversal memakai loop iteratif
+RESULT_CACHE_MAX_ENTRIES = 16
+RESULT_CACHE_TTL = 3600  # detik
+SHARED_CACHE_VERSION = 1
+SHARED_CACHE_MAX_MB = float(os.environ.get("PLN_SHARED_CACHE_MAX_MB", 2048))
+SHARED_CACHE_TTL = 24 * 3600  # detik
+DATA_CACHE_VERSION = 4
+DATA_CACHE_MAX_MB = float(os.environ.get("PLN_CACHE_MAX_MB", 2048))
+DATA_CACHE_TTL = 7 * 24 * 3600  # detik
+CHART_MAX_BARS = 50  # di atas jumlah baris ini grafik diagregasi di server (top-N dan histogram)
+CHART_HISTOGRAM_BINS = 40
+CHART_MAX_POINTS = 5000  # titik maksimum scatter WebGL (sampel deterministik)
+CHART_METRICS = {
+    "Losses Total (kW)": {"judul": "Rugi Daya Total", "agregasi": "sum", "terburuk": "terbesar",
+                          "skala": "Plasma", "satuan": "kW"},
+    "Efisiensi (%)": {"judul": "Efisiensi Sistem", "agregasi": "mean", "terburuk": "terkecil",
+                      "skala": "Viridis", "satuan": "%"},
+    "Penghematan Losses (kW)": {"judul": "Penghematan Rugi Daya", "agregasi": "sum", "terburuk": "terkecil",
+                                "skala": "Inferno", "satuan": "kW"},
+}
+TABLE_PAGE_SIZES = [25, 50, 100, 250, 500]
+TABLE_DEFAULT_PAGE_SIZE = 50
+EXPORT_CHUNK_ROWS = 50_000
+XLSX_MAX_ROWS = 1_048_575  # baris data per sheet Excel (di luar header)
+STREAMING_CHUNK_ROWS = 50_000
+STREAMING_MAX_ROW_WARNINGS = 1000  # contoh peringatan per baris yang disimpan pada mode streaming
+STREAMING_TEXT_COLUMNS = ["Nama Lokasi", "Jenis Kabel", "Tipe Phase", "Profil Beban", "ID Segmen", "Rekomendasi Kabel"]
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+ASSET_DIR = os.path.join(APP_DIR, "static")  # disajikan Streamlit di app/static jika server.enableStaticServing aktif
+ASSET_URL_PREFIX = "app/static"
+ASSET_WEBP_QUALITY = 75
+BACKGROUND_ASSETS = {"app": 1920, "sidebar": 640}  # lebar maksimum varian gambar latar (px)
+# Direktori cache milik pengguna server (mode 0700), bukan direktori sementara bersama
+DATA_CACHE_DIR = os.environ.get("PLN_CACHE_DIR") or os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "pln_analysis")
+# Cache hasil lintas proses/server (pickle), hanya aktif jika PLN_SHARED_CACHE_DIR diatur
+SHARED_CACHE_DIR = os.environ.get("PLN_SHARED_CACHE_DIR") or None
+DIAGNOSTICS_LOG = os.environ.get("PLN_DIAGNOSTICS_LOG") or None  # opsional, misalnya /var/log/pln/diagnostics.jsonl
+DIAGNOSTICS_LOG_MAX_MB = 10  # ukuran per file log sebelum dirotasi
+DIAGNOSTICS_LOG_BACKUPS = 3
+DIAGNOSTICS_PROFILE_LIMIT = 40  # jumlah fungsi teratas pada ringkasan cProfile
+PROJECT_STORE_PATH = os.environ.get("PLN_STORE_PATH", os.path.join(APP_DIR, "proyek_pln.sqlite"))
+STORE_WORST_LOCATIONS = 100
+# Kolom hasil per baris yang disimpan di penyimpanan proyek: nama kolom SQL dan tipenya
+STORE_COLUMNS = {
+    "Nama Lokasi": ("nama_lokasi", "TEXT"),
+    "Jenis Kabel": ("jenis_kabel", "TEXT"),
+    "Panjang Jaringan (m)": ("panjang_m", "REAL"),
+    "Beban Total (kVA)": ("beban_kva", "REAL"),
+    "Tegangan (V)": ("tegangan_v", "REAL"),
+    "Tipe Phase": ("tipe_phase", "TEXT"),
+    "Daya Trafo (kVA)": ("daya_trafo_kva", "REAL"),
+    "Profil Beban": ("profil_beban", "TEXT"),
+    "ID Segmen": ("id_segmen", "TEXT"),
+    "Segmen Induk": ("segmen_induk", "TEXT"),
+    "Beban Kumulatif (kVA)": ("beban_kumulatif_kva", "REAL"),
+    "Rugi Trafo (kW)": ("rugi_trafo_kw", "REAL"),
+    "Baseline Losses (kW)": ("baseline_losses_kw", "REAL"),
+    "Losses Konduktor (kW)": ("losses_konduktor_kw", "REAL"),
+    "Losses Total (kW)": ("losses_total_kw", "REAL"),
+    "Efisiensi (%)": ("efisiensi_persen", "REAL"),
+    "Penghematan Losses (kW)": ("penghematan_kw", "REAL"),
+    "Manfaat (Rp/tahun)": ("manfaat_rp", "REAL"),
+    "Energi Losses (kWh/tahun)": ("energi_losses_kwh", "REAL"),
+    "Susut Tegangan Kumulatif (%)": ("susut_tegangan_persen", "REAL"),
+    "Rekomendasi Kabel": ("rekomendasi_kabel", "TEXT"),
+}
 
 # -------------------------------
 # FUNGSI UI DAN STYLING
 # -------------------------------
+def build_image_variant(image_file, max_width, quality=ASSET_WEBP_QUALITY):
+    """Membuat varian WebP yang diperkecil dan mengembalikan (nama file berhash isi, bytes)."""
+    with Image.open(image_file) as img:
+        img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+        if img.width > max_width:
+            img = img.resize((max_width, round(img.height * max_width / img.width)), Image.LANCZOS)
+        buffer = io.BytesIO()
+        img.save(buffer, "WEBP", quality=quality, method=6)
+    data = buffer.getvalue()
+    stem = os.path.splitext(os.path.basename(image_file))[0]
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}.w{max_width}.webp", data
+
+def publish_static_asset(name, data):
+    """Menulis aset ke folder static aplikasi; mengembalikan URL-nya, atau None jika tidak bisa disajikan."""
+    if not st.get_option("server.enableStaticServing"):
+        return None
+    path = os.path.join(ASSET_DIR, name)
+    try:
+        if not os.path.exists(path):
+            os.makedirs(ASSET_DIR, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as file:
+                file.write(data)
+            os.replace(tmp_path, path)
+    except OSError:
+        return None  # folder aplikasi read-only, gunakan data URI
+    return f"{ASSET_URL_PREFIX}/{name}"
+
+@st.cache_resource(show_spinner=False)
+def get_image_asset_url(image_file, max_width):
+    """Mengembalikan URL gambar latar yang sudah dioptimasi, dihitung sekali per proses.
+
+    Varian WebP disajikan sebagai file statis (nama berhash isi sehingga aman di-cache browser);
+    jika static serving tidak aktif, dipakai data URI dari varian yang sama. None jika file tidak ada.
+    """
+    image_path = os.path.join(APP_DIR, image_file)
+    if not os.path.exists(image_path):
+        return None
+    name, data = build_image_variant(image_path, max_width)
+    url = publish_static_asset(name, data)
+    if url is None:
+        url = f"data:image/webp;base64,{base64.b64encode(data).decode()}"
+    return url
+
 def set_background(image_file):
     """Menambahkan latar belakang untuk aplikasi."""
-    with open(image_file, "rb") as file:
-        encoded_string = base64.b64encode(file.read()).decode()
+    url = get_image_asset_url(image_file, BACKGROUND_ASSETS["app"])
+    if url is None:
+        return
     st.markdown(
         f"""
         <style>
         .stApp {{
-            background-image: url(data:image/jpeg;base64,{encoded_string});
+            background-image: url({url});
             background-size: cover;
             background-position: center;
             background-attachment: fixed;
@@ -55,13 +267,14 @@ def set_background(image_file):
 
 def set_sidebar_background(image_file):
     """Menambahkan latar belakang untuk sidebar."""
-    with open(image_file, "rb") as file:
-        encoded_string = base64.b64encode(file.read()).decode()
+    url = get_image_asset_url(image_file, BACKGROUND_ASSETS["sidebar"])
+    if url is None:
+        return
     st.markdown(
         f"""
         <style>
         [data-testid="stSidebar"] {{
-            background-image: url(data:image/png;base64,{encoded_string});
+            background-image: url({url});
             background-size: cover;
             background-position: center;
         }}
@@ -88,18 +301,60 @@ def display_header():
         unsafe_allow_html=True
     )
 
+def configure_sensitivity_sidebar():
+    """Mengatur opsi analisis sensitivitas (terpisah dari config agar tidak memicu analisis ulang)."""
+    st.sidebar.subheader("🎲 Analisis Sensitivitas")
+    if not st.sidebar.checkbox("Tampilkan analisis sensitivitas ROI", value=False):
+        return None
+    n_scenario = st.sidebar.number_input("Jumlah Skenario", value=10000, min_value=100, max_value=1_000_000, step=1000)
+    rentang = st.sidebar.slider("Rentang Variasi Parameter (±%)", min_value=1, max_value=100, value=20)
+    return {"n_scenario": int(n_scenario), "rentang": rentang / 100}
+
+def configure_optimizer_sidebar():
+    """Mengatur opsi optimasi ukuran kabel berdasarkan katalog konduktor."""
+    st.sidebar.subheader("🧮 Optimasi Kabel")
+    if not st.sidebar.checkbox("Tampilkan optimasi ukuran kabel", value=False):
+        return None
+    umur_tahun = st.sidebar.number_input("Umur Ekonomis (tahun)", value=30, min_value=1, max_value=60)
+    suku_bunga = st.sidebar.number_input("Suku Bunga Diskonto (%)", value=8.0, min_value=0.0, max_value=50.0)
+    batas_susut = st.sidebar.number_input("Batas Susut Tegangan (%)", value=5.0, min_value=0.1, max_value=20.0)
+    katalog_file = st.sidebar.file_uploader("Katalog Kabel (CSV/XLSX)", type=["csv", "xlsx"],
+                                            help=f"Kolom: {', '.join(CATALOGUE_COLUMNS)}. Kosongkan untuk katalog bawaan.")
+    return {"umur_tahun": int(umur_tahun), "suku_bunga": suku_bunga / 100, "batas_susut": batas_susut,
+            "katalog_file": katalog_file}
+
+def configure_streaming_sidebar():
+    """Mengatur mode streaming untuk workbook yang terlalu besar untuk dimuat utuh ke memori."""
+    st.sidebar.subheader("💾 Mode Streaming")
+    return st.sidebar.checkbox("Proses sheet Gambar per potongan (hemat memori)", value=False,
+                               help="Hanya menampilkan ringkasan; hasil per baris diunduh sebagai Parquet. "
+                                    "Topologi penyulang, sensitivitas, dan optimasi kabel tidak tersedia.")
+
+def configure_diagnostics_sidebar():
+    """Mengatur panel diagnostik dan perekaman cProfile untuk satu rerun.
+
+    Dipanggil sebelum render_app agar tetap tampil pada rerun yang dihentikan st.stop (misalnya
+    validasi gagal); status tombol cProfile dibaca dari session state di awal rerun berikutnya
+    (lihat main).
+    """
+    st.sidebar.subheader("🩺 Diagnostik")
+    tampilkan = st.sidebar.checkbox("Tampilkan waktu per tahap", value=False)
+    st.sidebar.button("Rekam cProfile untuk satu rerun", key="diagnostics_profile",
+                      help="Menjalankan ulang aplikasi sekali dengan cProfile dan menampilkan fungsi terlama.")
+    return {"tampilkan": tampilkan}
+
 def configure_sidebar():
     """Mengatur sidebar untuk input asumsi dan pemilihan kabel."""
     st.sidebar.header("⚙️ Pengaturan")
-    tarif_kwh = st.sidebar.number_input("Tarif Listrik (Rp/kWh)", value=1500, min_value=0)
-    faktor_daya = st.sidebar.number_input("Faktor Daya", value=0.8, min_value=0.0, max_value=1.0)
+    tarif_kwh = st.sidebar.number_input("Tarif Listrik (Rp/kWh)", value=DEFAULT_CONFIG["tarif_kwh"], min_value=0)
+    faktor_daya = st.sidebar.number_input("Faktor Daya", value=DEFAULT_CONFIG["faktor_daya"], min_value=0.0, max_value=1.0)
     tipe_phase = st.sidebar.selectbox("Tipe Phase", ["3 Phase", "1 Phase"], index=0)
-    rugi_trafo = st.sidebar.number_input("Rugi Daya Trafo Default (kW)", value=0.5, min_value=0.0)
-    baseline_losses = st.sidebar.number_input("Baseline Losses per Lokasi (kW)", value=5.0, min_value=0.0,
+    rugi_trafo = st.sidebar.number_input("Rugi Daya Trafo Default (kW)", value=DEFAULT_CONFIG["rugi_trafo"], min_value=0.0)
+    baseline_losses = st.sidebar.number_input("Baseline Losses per Lokasi (kW)", value=DEFAULT_CONFIG["baseline_losses"], min_value=0.0,
                                              help="Rugi daya sistem lama untuk menghitung penghematan")
-    core_loss = st.sidebar.number_input("Core Losses Default (kW)", value=0.2, min_value=0.0,
+    core_loss = st.sidebar.number_input("Core Losses Default (kW)", value=DEFAULT_CONFIG["core_loss"], min_value=0.0,
                                         help="Rugi inti trafo jika tidak ada data")
-    full_load_loss = st.sidebar.number_input("Full-Load Losses Default (kW)", value=1.0, min_value=0.0,
+    full_load_loss = st.sidebar.number_input("Full-Load Losses Default (kW)", value=DEFAULT_CONFIG["full_load_loss"], min_value=0.0,
                                              help="Rugi tembaga trafo pada beban penuh")
     
     st.sidebar.subheader("🔌 Jenis Kabel")
@@ -111,6 +366,12 @@ def configure_sidebar():
     )
     resistansi_kabel = {k: DEFAULT_KABEL_DB[k] for k in selected_kabel}
     
+    st.sidebar.subheader("📈 Profil Beban")
+    profil_beban = st.sidebar.checkbox("Gunakan Profil Beban (jika tersedia)", value=DEFAULT_CONFIG["profil_beban"],
+                                       help="Sheet 'Profil Beban' di workbook atau file CSV di bawah.")
+    tarif_wbp = st.sidebar.number_input("Tarif WBP (Rp/kWh)", value=DEFAULT_CONFIG["tarif_wbp"], min_value=0,
+                                        help="Tarif jam 17.00-22.00 pada mode profil beban. 0 = sama dengan tarif listrik.")
+    
     return {
         "tarif_kwh": tarif_kwh,
         "faktor_daya": faktor_daya,
@@ -120,84 +381,421 @@ def configure_sidebar():
         "core_loss": core_loss,
         "full_load_loss": full_load_loss,
         "resistansi_kabel": resistansi_kabel,
-        "selected_kabel": selected_kabel
+        "selected_kabel": selected_kabel,
+        "profil_beban": profil_beban,
+        "tarif_wbp": tarif_wbp
     }
 
+# -------------------------------
+# FUNGSI PEMUATAN WORKBOOK
+# -------------------------------
+def _unique_header(header):
+    """Menormalkan header seperti pandas: kolom kosong 'Unnamed: i', duplikat diberi akhiran '.n'."""
+    names, seen = [], {}
+    for i, h in enumerate(header):
+        name = f"Unnamed: {i}" if h is None else str(h)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+def _rows_to_frame(data, names, columns=None):
+    """Menyusun DataFrame dari baris worksheet, opsional hanya kolom tertentu.
+
+    Baris yang lebih pendek dari header (sel kosong di ujung tidak ditulis sebagian aplikasi)
+    dilengkapi None, baris yang lebih panjang dipotong.
+    """
+    lebar = len(names)
+    if any(len(row) != lebar for row in data):
+        data = [tuple(row[:lebar]) + (None,) * (lebar - len(row)) for row in data]
+    df = pd.DataFrame(data, columns=names) if data else pd.DataFrame(columns=names)
+    if columns is not None:
+        df = df[[c for c in df.columns if c in columns]]
+    return df
+
+def _set_blank_rows(df, kosong, terakhir):
+    """Mencatat nomor baris Excel kosong sebelum baris data terakhir di df.attrs (lihat excel_rows)."""
+    df.attrs["baris_kosong"] = [baris for baris in kosong if baris < terakhir]
+    return df
+
+def read_sheet(ws, columns=None):
+    """Membaca worksheet mode read-only menjadi DataFrame, opsional hanya kolom tertentu.
+
+    Baris kosong dilewati; nomor barisnya dicatat agar excel_rows bisa memetakan indeks kembali
+    ke nomor baris spreadsheet.
+    """
+    rows = ws.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return pd.DataFrame(columns=columns or [])
+    names = _unique_header(header)
+    data, kosong, terakhir = [], [], 1
+    for baris, row in enumerate(rows, start=2):
+        if any(v is not None for v in row):
+            data.append(row)
+            terakhir = baris
+        else:
+            kosong.append(baris)
+    return _set_blank_rows(_rows_to_frame(data, names, columns), kosong, terakhir)
+
+def iter_sheet_chunks(ws, chunk_rows=STREAMING_CHUNK_ROWS, columns=None, numeric_columns=()):
+    """Membaca worksheet read-only per potongan baris tanpa memuat seluruh sheet.
+
+    Indeks tiap potongan melanjutkan nomor baris potongan sebelumnya. Kolom numeric_columns yang
+    kosong seluruhnya dalam satu potongan dijadikan float (NaN) agar tipe data antar potongan
+    konsisten; kolom teks tetap object. Selalu menghasilkan minimal satu potongan (bisa kosong)
+    sehingga header tetap bisa divalidasi.
+    """
+    rows = ws.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        yield pd.DataFrame(columns=columns or [])
+        return
+    names = _unique_header(header)
+    offset, data, emitted = 0, [], False
+    kosong, terakhir = [], 1
+    for baris, row in enumerate(rows, start=2):
+        if any(v is not None for v in row):
+            data.append(row)
+            terakhir = baris
+        else:
+            kosong.append(baris)
+        if len(data) >= chunk_rows:
+            yield _set_blank_rows(_chunk_frame(data, names, columns, offset, numeric_columns), kosong, terakhir)
+            offset, data, emitted = offset + len(data), [], True
+    if data or not emitted:
+        yield _set_blank_rows(_chunk_frame(data, names, columns, offset, numeric_columns), kosong, terakhir)
+
+def _chunk_frame(data, names, columns, offset, numeric_columns=()):
+    """Menyusun satu potongan sheet dengan indeks global dan kolom angka kosong bertipe float."""
+    df = _rows_to_frame(data, names, columns)
+    df.index = pd.RangeIndex(offset, offset + len(df))
+    kosong = [c for c in df.columns if c in numeric_columns and df[c].isna().all()]
+    if kosong and len(df):
+        df[kosong] = df[kosong].astype(float)
+    return df
+
+def parse_workbook(file_bytes):
+    """Mem-parsing sheet RAB, Gambar, dan (opsional) Profil Beban dalam satu kali buka workbook."""
+    wb = openpyxl.load_workbook(io.BytesIO(file_bytes), read_only=True, data_only=True)
+    try:
+        missing = [sheet for sheet in REQUIRED_SHEETS if sheet not in wb.sheetnames]
+        if missing:
+            raise ValidationError(f"File Excel harus memiliki sheet: {REQUIRED_SHEETS}.")
+        df_profil = read_sheet(wb[PROFILE_SHEET]) if PROFILE_SHEET in wb.sheetnames else None
+        return read_sheet(wb["RAB"]), read_sheet(wb["Gambar"], GAMBAR_COLUMNS), df_profil
+    finally:
+        wb.close()
+
+def ensure_private_dir(path):
+    """Membuat direktori cache dengan mode 0700 dan memastikan hanya pengguna proses ini yang memilikinya.
+
+    Isi direktori cache dimuat kembali sebagai data aplikasi, jadi direktori yang berupa symlink,
+    dimiliki pengguna lain, atau dapat diakses grup/lainnya ditolak dengan PermissionError.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"Direktori cache '{path}' bukan direktori.")
+    if hasattr(os, "getuid") and (info.st_uid != os.getuid() or info.st_mode & 0o077):
+        raise PermissionError(f"Direktori cache '{path}' harus dimiliki pengguna server dengan mode 0700.")
+    return path
+
+def evict_directory(directory, suffixes, max_bytes, ttl, stale_suffixes=(".tmp",)):
+    """Membuang entri kedaluwarsa lalu entri paling lama tidak dipakai hingga ukuran di bawah batas.
+
+    File berakhiran suffixes dengan awalan nama yang sama (hash sebelum '_' pertama) adalah satu
+    entri dan dibuang bersama; file stale_suffixes yang lebih tua dari ttl ikut dihapus. Hanya satu
+    proses yang melakukan eviksi pada satu waktu; proses lain melewatinya. Mengembalikan jumlah
+    file entri yang dihapus.
+    """
+    try:
+        kunci_eviksi = open(os.path.join(directory, ".evict.lock"), "a")
+    except OSError:
+        return 0
+    dihapus = 0
+    with kunci_eviksi:
+        if fcntl is not None:
+            try:
+                fcntl.flock(kunci_eviksi, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return 0
+        sekarang = time.time()
+        entri = {}
+        with os.scandir(directory) as it:
+            for item in it:
+                try:
+                    info = item.stat()
+                except FileNotFoundError:
+                    continue
+                if item.name.endswith(suffixes):
+                    kunci = item.name.split("_", 1)[0]
+                    mtime, ukuran, paths = entri.get(kunci, (0, 0, []))
+                    entri[kunci] = (max(mtime, info.st_mtime), ukuran + info.st_size, paths + [item.path])
+                elif item.name.endswith(stale_suffixes) and sekarang - info.st_mtime > ttl:
+                    _remove_file(item.path)  # sisa penulisan yang gagal atau kunci yang tidak dipakai lagi
+        total = sum(ukuran for _, ukuran, _ in entri.values())
+        for mtime, ukuran, paths in sorted(entri.values()):
+            if sekarang - mtime <= ttl and total <= max_bytes:
+                break
+            dihapus += sum(_remove_file(path) for path in paths)
+            total -= ukuran
+    return dihapus
+
+def data_cache_dir():
+    """Mengembalikan DATA_CACHE_DIR yang sudah diperiksa kepemilikannya, atau None jika tidak bisa dipakai."""
+    try:
+        return ensure_private_dir(DATA_CACHE_DIR)
+    except OSError as e:
+        logging.getLogger("pln_analysis").warning("Cache Parquet dinonaktifkan: %s", e)
+        return None
+
+def evict_data_cache():
+    """Menjalankan eviksi ukuran dan umur pada cache Parquet workbook dan hasil streaming."""
+    return evict_directory(DATA_CACHE_DIR, (".parquet",), DATA_CACHE_MAX_MB * 1024 * 1024, DATA_CACHE_TTL)
+
+def _cache_paths(file_hash):
+    """Mengembalikan path file Parquet cache untuk sheet RAB, Gambar, dan Profil Beban."""
+    prefix = os.path.join(DATA_CACHE_DIR, f"{file_hash}_v{DATA_CACHE_VERSION}")
+    return f"{prefix}_RAB.parquet", f"{prefix}_Gambar.parquet", f"{prefix}_Profil.parquet"
+
+def _write_parquet(df, path):
+    """Menulis DataFrame ke Parquet secara atomik (tulis ke file sementara lalu rename)."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+def load_workbook(file_bytes, cache=True):
+    """Memuat workbook dari cache Parquet jika ada, jika tidak parsing Excel lalu simpan ke cache.
+
+    Mengembalikan (df_rab, df_gambar, df_profil, info); df_profil bernilai None jika workbook
+    tidak memiliki sheet Profil Beban, info berisi sumber data dan durasi muat. cache=False
+    melewati cache Parquet sepenuhnya (misalnya analisis batch yang membaca tiap file sekali).
+    """
+    start = time.perf_counter()
+    file_hash = hash_file(file_bytes)
+    if not cache or data_cache_dir() is None:
+        df_rab, df_gambar, df_profil = parse_workbook(file_bytes)
+        return df_rab, df_gambar, df_profil, {"sumber": "excel", "hash": file_hash,
+                                              "durasi": time.perf_counter() - start}
+    rab_path, gambar_path, profil_path = _cache_paths(file_hash)
+    if os.path.exists(rab_path) and os.path.exists(gambar_path):
+        try:
+            df_rab, df_gambar = pd.read_parquet(rab_path), pd.read_parquet(gambar_path)
+            df_profil = pd.read_parquet(profil_path) if os.path.exists(profil_path) else None
+            for path in (rab_path, gambar_path, profil_path):
+                if os.path.exists(path):
+                    os.utime(path)  # tandai baru dipakai untuk eviksi LRU
+            return df_rab, df_gambar, df_profil, {"sumber": "cache", "hash": file_hash,
+                                                  "durasi": time.perf_counter() - start}
+        except Exception:
+            pass  # cache rusak, parsing ulang dari Excel
+
+    df_rab, df_gambar, df_profil = parse_workbook(file_bytes)
+    durasi_parse = time.perf_counter() - start
+    try:
+        # Profil ditulis lebih dulu: cache hanya dianggap lengkap setelah Gambar tertulis
+        if df_profil is not None:
+            _write_parquet(df_profil, profil_path)
+        _write_parquet(df_rab, rab_path)
+        _write_parquet(df_gambar, gambar_path)
+        evict_data_cache()
+    except Exception:
+        pass  # cache disk bersifat opsional, misalnya kolom campuran yang tidak bisa ditulis ke Parquet
+    return df_rab, df_gambar, df_profil, {"sumber": "excel", "hash": file_hash, "durasi": durasi_parse,
+                                          "durasi_total": time.perf_counter() - start}
+
 # -------------------------------
 # FUNGSI VALIDASI DATA
 # -------------------------------
+class ValidationError(ValueError):
+    """Kesalahan validasi data input; ditampilkan dengan st.error di aplikasi.
+
+    laporan berisi ValidationReport lengkap jika kesalahan berasal dari validasi skema.
+    """
+
+    def __init__(self, pesan, laporan=None):
+        super().__init__(pesan)
+        self.laporan = laporan
+
+@dataclass(frozen=True)
+class ValidationReport:
+    """Seluruh kesalahan validasi skema (sheet, baris, kolom, nilai, alasan) dan durasi validasi."""
+    kesalahan: pd.DataFrame
+    jumlah_baris: dict
+    durasi: float
+
+    @property
+    def valid(self):
+        """True jika tidak ada kesalahan."""
+        return self.kesalahan.empty
+
+    def summary(self):
+        """Jumlah kesalahan per sheet, kolom, dan alasan."""
+        return (self.kesalahan.groupby(["Sheet", "Kolom", "Alasan"], sort=False).size()
+                .rename("Jumlah").reset_index())
+
+    def raise_if_invalid(self):
+        """Melempar ValidationError berisi ringkasan dan laporan ini jika ada kesalahan."""
+        if self.valid:
+            return
+        contoh = [
+            f"sheet '{r.Sheet}'" + ("" if pd.isna(r.Baris) else f" baris {int(r.Baris)}") + f" kolom '{r.Kolom}': {r.Alasan}"
+            for r in self.kesalahan.head(VALIDATION_MESSAGE_EXAMPLES).itertuples()
+        ]
+        sisa = len(self.kesalahan) - len(contoh)
+        raise ValidationError(
+            f"Validasi gagal dengan {len(self.kesalahan):,} kesalahan: " + "; ".join(contoh)
+            + (f"; dan {sisa:,} kesalahan lain." if sisa else "."),
+            self,
+        )
+
+def excel_rows(df, posisi=None):
+    """Nomor baris spreadsheet (header di baris 1) untuk baris df pada posisi (default semua baris).
+
+    Indeks df adalah posisi di antara baris yang tidak kosong; baris kosong yang dilewati
+    read_sheet/iter_sheet_chunks (df.attrs['baris_kosong']) ditambahkan kembali.
+    """
+    indeks = df.index.to_numpy() if posisi is None else df.index.to_numpy()[posisi]
+    if not pd.api.types.is_integer_dtype(df.index):
+        return indeks
+    kosong = np.asarray(df.attrs.get("baris_kosong", ()), dtype=np.int64)
+    # Baris kosong ke-k terletak sebelum baris data pada posisi kosong[k] - 2 - k
+    return indeks + 2 + np.searchsorted(kosong - 2 - np.arange(len(kosong)), indeks, side="right")
+
+def _validation_errors(df, mask, sheet, kolom, alasan):
+    """Menyusun baris laporan kesalahan (dengan nomor baris spreadsheet) untuk sel yang ditandai mask."""
+    posisi = np.flatnonzero(mask)
+    return pd.DataFrame({
+        "Sheet": sheet,
+        "Baris": excel_rows(df, posisi),
+        "Kolom": kolom,
+        "Nilai": df[kolom].iloc[posisi].astype(str).to_numpy(),
+        "Alasan": alasan,
+    })
+
+def validate_frame(df, schema, sheet, pilihan=None):
+    """Memeriksa seluruh kolom skema pada satu sheet dan mengembalikan DataFrame kesalahan.
+
+    Tiap kolom dipindai sekali secara vektor: sel teks di kolom angka, nilai negatif atau nol,
+    dan nilai di luar daftar pilihan (dict nama -> nilai yang diizinkan) dilaporkan per baris;
+    kolom wajib yang tidak ada dilaporkan dengan Baris kosong.
+    """
+    pilihan = pilihan or {}
+    bagian = []
+    for kolom, aturan in schema.items():
+        if kolom not in df.columns:
+            if aturan.get("wajib"):
+                bagian.append(pd.DataFrame({"Sheet": [sheet], "Baris": [None], "Kolom": [kolom], "Nilai": [None],
+                                            "Alasan": ["kolom wajib tidak ada"]}))
+            continue
+        if aturan.get("kecuali_ada") in df.columns:
+            continue
+        seri = df[kolom]
+        if aturan.get("tipe") == "angka":
+            if not pd.api.types.is_numeric_dtype(seri):
+                if pd.api.types.is_object_dtype(seri):
+                    # Sel teks (termasuk angka yang disimpan sebagai teks di Excel) tidak dihitung sebagai angka
+                    bukan_angka = seri.map(type).isin((str, bool)).to_numpy()
+                    nilai = pd.to_numeric(seri.where(~bukan_angka), errors="coerce")
+                    bukan_angka = bukan_angka | (seri.notna() & nilai.isna()).to_numpy()
+                else:
+                    bukan_angka = seri.notna().to_numpy()
+                    nilai = pd.Series(np.nan, index=seri.index)
+                bagian.append(_validation_errors(df, bukan_angka, sheet, kolom, "harus berisi angka"))
+                nilai = nilai.to_numpy(dtype=float)
+            else:
+                nilai = seri.to_numpy(dtype=float)
+            batas = aturan.get("batas")
+            if batas in ("non_negatif", "positif"):
+                bagian.append(_validation_errors(df, nilai < 0, sheet, kolom, "tidak boleh negatif"))
+            if batas == "positif":
+                bagian.append(_validation_errors(df, nilai == 0, sheet, kolom, "tidak boleh nol"))
+        if aturan.get("pilihan") in pilihan:
+            diizinkan = pilihan[aturan["pilihan"]]
+            bagian.append(_validation_errors(df, ~seri.isin(diizinkan).to_numpy(), sheet, kolom,
+                                             f"harus salah satu dari {list(diizinkan)}"))
+    bagian = [b for b in bagian if len(b)]
+    if not bagian:
+        return pd.DataFrame(columns=["Sheet", "Baris", "Kolom", "Nilai", "Alasan"])
+    return pd.concat(bagian, ignore_index=True)
+
+def validate_schema(tabel):
+    """Memvalidasi daftar (DataFrame, skema, nama sheet, pilihan) dan mengembalikan ValidationReport."""
+    start = time.perf_counter()
+    kesalahan = pd.concat([validate_frame(df, schema, sheet, pilihan) for df, schema, sheet, pilihan in tabel],
+                          ignore_index=True)
+    return ValidationReport(kesalahan, {sheet: len(df) for df, _, sheet, _ in tabel}, time.perf_counter() - start)
+
+def validate_workbook(df_rab, df_gambar, selected_kabel):
+    """Memvalidasi sheet RAB dan Gambar terhadap skemanya dan mengembalikan ValidationReport.
+
+    Tidak bergantung pada Streamlit; seluruh kesalahan dikumpulkan sekaligus. Pada mode topologi
+    (kolom 'Segmen Induk') segmen tanpa beban sendiri boleh bernilai nol.
+    """
+    gambar_schema = GAMBAR_SCHEMA
+    if "Segmen Induk" in df_gambar.columns:
+        gambar_schema = {**GAMBAR_SCHEMA, "Beban Total (kVA)": {**GAMBAR_SCHEMA["Beban Total (kVA)"], "batas": "non_negatif"}}
+    return validate_schema([
+        (df_rab, RAB_SCHEMA, "RAB", None),
+        (df_gambar, gambar_schema, "Gambar", {"kabel": list(selected_kabel) + ["-"]}),
+    ])
+
 def validate_excel_file(uploaded_file):
-    """Memvalidasi file Excel dan mengembalikan DataFrame untuk RAB dan Gambar."""
+    """Memvalidasi file Excel dan mengembalikan DataFrame RAB, Gambar, Profil Beban, serta info waktu muat."""
     try:
-        excel_file = pd.ExcelFile(uploaded_file)
-        if not all(sheet in excel_file.sheet_names for sheet in REQUIRED_SHEETS):
-            st.error(f"File Excel harus memiliki sheet: {REQUIRED_SHEETS}.")
-            st.stop()
-        return pd.read_excel(uploaded_file, sheet_name="RAB"), pd.read_excel(uploaded_file, sheet_name="Gambar")
+        return load_workbook(uploaded_file.getvalue())
+    except ValidationError:
+        raise
     except Exception as e:
-        st.error(f"Terjadi kesalahan saat membaca file: {e}")
-        st.stop()
+        raise ValidationError(f"Terjadi kesalahan saat membaca file: {e}") from e
 
 def validate_columns(df_rab, df_gambar):
     """Memvalidasi kolom wajib di sheet RAB dan Gambar."""
-    required_columns_rab = ["Total (Rp)"]
-    required_columns_gambar = ["Nama Lokasi", "Jenis Kabel", "Panjang Jaringan (m)", "Beban Total (kVA)", "Tegangan (V)"]
-    
-    if not set(required_columns_rab).issubset(df_rab.columns):
-        st.error("Kolom wajib di sheet 'RAB' tidak lengkap.")
-        st.stop()
-    if not set(required_columns_gambar).issubset(df_gambar.columns):
-        st.error("Kolom wajib di sheet 'Gambar' tidak lengkap.")
-        st.stop()
-
-def validate_numeric(df, columns):
-    """Memvalidasi bahwa kolom berisi data numerik yang valid."""
-    for col in columns:
-        if not pd.api.types.is_numeric_dtype(df[col]):
-            st.error(f"Kolom '{col}' harus berisi angka.")
-            st.stop()
-        if (df[col] < 0).any():
-            st.error(f"Kolom '{col}' tidak boleh negatif.")
-            st.stop()
-        if col in ["Beban Total (kVA)", "Tegangan (V)"] and (df[col] <= 0).any():
-            st.error(f"Kolom '{col}' tidak boleh nol atau negatif.")
-            st.stop()
+    validate_schema([
+        (df_rab.head(0), {k: {"wajib": True} for k, v in RAB_SCHEMA.items() if v.get("wajib")}, "RAB", None),
+        (df_gambar.head(0), {k: {"wajib": True} for k, v in GAMBAR_SCHEMA.items() if v.get("wajib")}, "Gambar", None),
+    ]).raise_if_invalid()
+
+def validate_numeric(df, columns, positive_columns=("Beban Total (kVA)", "Tegangan (V)"), sheet="Gambar"):
+    """Memvalidasi bahwa kolom berisi data numerik yang valid (positive_columns harus > 0)."""
+    schema = {c: {"wajib": True, "tipe": "angka", "batas": "positif" if c in positive_columns else "non_negatif"}
+              for c in columns}
+    validate_schema([(df, schema, sheet, None)]).raise_if_invalid()
 
 def validate_kabel(df_gambar, selected_kabel):
     """Memvalidasi jenis kabel di sheet Gambar sesuai dengan pilihan sidebar."""
-    valid_kabel = selected_kabel + ["-"]
-    kabel_excel = df_gambar["Jenis Kabel"].unique()
-    invalid_kabel = [k for k in kabel_excel if k not in valid_kabel]
-    
-    if invalid_kabel:
-        st.error(f"Jenis kabel tidak diizinkan: {invalid_kabel}. Hanya {valid_kabel} yang diperbolehkan.")
-        st.stop()
+    validate_schema([(df_gambar, {"Jenis Kabel": GAMBAR_SCHEMA["Jenis Kabel"]}, "Gambar",
+                      {"kabel": list(selected_kabel) + ["-"]})]).raise_if_invalid()
 
 def preprocess_data(df_gambar, tipe_phase, rugi_trafo, baseline_losses, core_loss, full_load_loss):
-    """Memproses data Gambar: validasi tipe phase, rugi trafo, dan baseline losses."""
+    """Memproses data Gambar: normalisasi tipe phase, rugi trafo, dan baseline losses.
+
+    Kolom angka harus sudah diperiksa dengan GAMBAR_SCHEMA (validate_workbook atau validate_schema).
+    Mengembalikan DataFrame hasil dan daftar peringatan tingkat dataset.
+    """
     df_gambar = df_gambar.copy()
+    peringatan = []
     
     # Normalisasi Tipe Phase
     if "Tipe Phase" in df_gambar.columns:
         df_gambar["Tipe Phase"] = df_gambar["Tipe Phase"].str.upper().replace({"1 PHASE": "1 Phase", "3 PHASE": "3 Phase"})
     else:
-        st.warning(f"Kolom 'Tipe Phase' tidak ada, diasumsikan '{tipe_phase}'.")
+        peringatan.append(dataset_warning("tipe_phase_default", f"Kolom 'Tipe Phase' tidak ada, diasumsikan '{tipe_phase}'."))
         df_gambar["Tipe Phase"] = tipe_phase
     
-    # Validasi dan hitung rugi trafo
+    # Hitung rugi trafo
     if "Daya Trafo (kVA)" in df_gambar.columns:
-        validate_numeric(df_gambar, ["Daya Trafo (kVA)"])
         if (df_gambar["Beban Total (kVA)"] > 0.9 * df_gambar["Daya Trafo (kVA)"]).any():
-            st.warning("Beban Total (kVA) melebihi 90% Daya Trafo (kVA) di beberapa lokasi.")
-        df_gambar["Rugi Trafo (kW)"] = df_gambar.apply(
-            lambda row: calculate_transformer_loss(row["Beban Total (kVA)"], row["Daya Trafo (kVA)"], core_loss, full_load_loss),
-            axis=1
+            peringatan.append(dataset_warning("beban_trafo_tinggi", "Beban Total (kVA) melebihi 90% Daya Trafo (kVA) di beberapa lokasi."))
+        df_gambar["Rugi Trafo (kW)"] = calculate_transformer_loss_array(
+            df_gambar["Beban Total (kVA)"], df_gambar["Daya Trafo (kVA)"], core_loss, full_load_loss
         )
-    else:
-        if "Rugi Trafo (kW)" in df_gambar.columns:
-            validate_numeric(df_gambar, ["Rugi Trafo (kW)"])
-        else:
-            df_gambar["Rugi Trafo (kW)"] = rugi_trafo
+    elif "Rugi Trafo (kW)" not in df_gambar.columns:
+        df_gambar["Rugi Trafo (kW)"] = rugi_trafo
     
     # Validasi Baseline Losses
     if "Baseline Losses (kW)" not in df_gambar.columns:
@@ -211,125 +809,1966 @@ def preprocess_data(df_gambar, tipe_phase, rugi_trafo, baseline_losses, core_los
         "Tegangan (V)": 380
     }, inplace=True)
     
-    return df_gambar
+    return df_gambar, peringatan
 
 # -------------------------------
 # FUNGSI PERHITUNGAN
 # -------------------------------
-@st.cache_data
-def calculate_transformer_loss(beban, daya_trafo, core_loss, full_load_loss):
-    """Menghitung rugi trafo berdasarkan beban relatif."""
-    if beban <= 0 or daya_trafo <= 0:
-        return core_loss
-    load_ratio = beban / daya_trafo
-    copper_loss = (load_ratio ** 2) * full_load_loss
-    return core_loss + copper_loss
-
-@st.cache_data
-def calculate_conductor_loss(row, resistansi_kabel):
-    """Menghitung rugi daya konduktor (I²R) dalam kW."""
-    jenis = row.get("Jenis Kabel", "-")
-    panjang = row.get("Panjang Jaringan (m)", 0)
-    beban = row.get("Beban Total (kVA)", 0)
-    tegangan = row.get("Tegangan (V)", 380)
-    tipe_phase = row.get("Tipe Phase", "3 Phase").upper()
-    
-    if beban <= 0 or tegangan <= 0:
-        st.warning(f"Input tidak valid di lokasi '{row.get('Nama Lokasi', '-')}' (beban/tegangan <=0), losses dianggap 0.")
-        return 0
-    
-    if jenis not in resistansi_kabel:
-        default_kabel = list(resistansi_kabel.keys())[0]
-        st.warning(f"Jenis kabel '{jenis}' tidak dikenali di lokasi '{row.get('Nama Lokasi', '-')}', menggunakan '{default_kabel}'.")
-        jenis = default_kabel
-    
-    r = resistansi_kabel[jenis] * (panjang / 1000)
-    i = (beban * 1000) / (np.sqrt(3) * tegangan if tipe_phase == "3 PHASE" else tegangan)
-    return (i ** 2) * r / 1000  # kW
-
-@st.cache_data
-def calculate_efficiency(conductor_loss, transformer_loss, beban, faktor_daya):
-    """Menghitung efisiensi sistem dalam persen."""
-    if beban <= 0 or faktor_daya <= 0:
+def _column_array(df, column, default):
+    """Mengambil kolom sebagai array float, atau array default jika kolom tidak ada."""
+    if column in df.columns:
+        return df[column].to_numpy(dtype=float)
+    return np.full(len(df), default, dtype=float)
+
+def load_column(df):
+    """Nama kolom beban yang dialirkan konduktor: beban kumulatif pada mode topologi penyulang."""
+    return "Beban Kumulatif (kVA)" if "Beban Kumulatif (kVA)" in df.columns else "Beban Total (kVA)"
+
+def calculate_current_array(beban, tegangan, three_phase):
+    """Menghitung arus (A) seluruh baris sekaligus untuk sistem 1 phase / 3 phase."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (beban * 1000) / np.where(three_phase, np.sqrt(3) * tegangan, tegangan)
+
+def calculate_transformer_loss_array(beban, daya_trafo, core_loss, full_load_loss):
+    """Menghitung rugi trafo (rugi inti + rugi tembaga × rasio beban²) seluruh baris; beban/daya <= 0 hanya rugi inti."""
+    beban = np.asarray(beban, dtype=float)
+    daya_trafo = np.asarray(daya_trafo, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        copper_loss = ((beban / daya_trafo) ** 2) * full_load_loss
+    return np.where((beban <= 0) | (daya_trafo <= 0), core_loss, core_loss + copper_loss)
+
+def calculate_conductor_losses(df_gambar, resistansi_kabel):
+    """Menghitung losses konduktor (I²R) per baris; kabel tak dikenal memakai kabel pertama.
+
+    Mengembalikan (losses kW, mask input tidak valid, mask kabel tidak dikenal, array jenis kabel).
+    """
+    kabel_names = list(resistansi_kabel.keys())
+    resistansi = np.array([resistansi_kabel[k] for k in kabel_names], dtype=float)
+    n = len(df_gambar)
+    jenis = (df_gambar["Jenis Kabel"] if "Jenis Kabel" in df_gambar.columns
+             else pd.Series("-", index=df_gambar.index)).astype(object).to_numpy()
+    panjang = _column_array(df_gambar, "Panjang Jaringan (m)", 0)
+    beban = _column_array(df_gambar, load_column(df_gambar), 0)
+    tegangan = _column_array(df_gambar, "Tegangan (V)", 380)
+    tipe_phase = (df_gambar["Tipe Phase"] if "Tipe Phase" in df_gambar.columns
+                  else pd.Series("3 Phase", index=df_gambar.index)).astype(str)
+    # Tipe phase dibandingkan tanpa membedakan huruf besar
+    three_phase = (tipe_phase.str.upper() == "3 PHASE").to_numpy()
+
+    invalid_input = (beban <= 0) | (tegangan <= 0)
+    kabel_index = pd.Index(kabel_names).get_indexer(jenis)
+    unknown_kabel = (kabel_index < 0) & ~invalid_input
+    if len(kabel_names):
+        r_per_km = resistansi[np.where(kabel_index < 0, 0, kabel_index)]
+    else:
+        r_per_km = np.full(n, np.nan)
+    arus = calculate_current_array(beban, tegangan, three_phase)
+    losses_konduktor = np.where(invalid_input, 0.0, (arus ** 2) * r_per_km * (panjang / 1000) / 1000)
+    return losses_konduktor, invalid_input, unknown_kabel, jenis
+
+def recommend_cable_array(df_gambar, resistansi_kabel):
+    """Merekomendasikan kabel dengan losses terendah untuk seluruh baris (matriks baris × kabel)."""
+    kabel_names = list(resistansi_kabel.keys())
+    beban = _column_array(df_gambar, load_column(df_gambar), 0)
+    if not len(kabel_names):
+        return np.full(len(df_gambar), "-", dtype=object)
+    resistansi = np.array([resistansi_kabel[k] for k in kabel_names], dtype=float)
+    panjang = _column_array(df_gambar, "Panjang Jaringan (m)", 0)
+    tegangan = _column_array(df_gambar, "Tegangan (V)", 380)
+    tipe_phase = (df_gambar["Tipe Phase"] if "Tipe Phase" in df_gambar.columns
+                  else pd.Series("3 Phase", index=df_gambar.index)).astype(str)
+    # Rekomendasi membandingkan tipe phase persis (setelah normalisasi di preprocess_data)
+    three_phase = (tipe_phase == "3 Phase").to_numpy()
+    arus = calculate_current_array(beban, tegangan, three_phase)
+    losses_matrix = (arus ** 2)[:, None] * resistansi[None, :] * (panjang / 1000)[:, None] / 1000
+    rekomendasi = np.array(kabel_names, dtype=object)[np.argmin(losses_matrix, axis=1)]
+    return np.where(beban <= 0, "-", rekomendasi)
+
+def calculate_efficiency_array(losses_total, beban, faktor_daya):
+    """Menghitung efisiensi sistem (%) seluruh baris; beban atau faktor daya <= 0 bernilai 0."""
+    if faktor_daya <= 0:
+        return np.zeros(len(beban))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(beban <= 0, 0.0, 100 * (1 - losses_total / (beban * faktor_daya)))
+
+def calculate_benefit_array(penghematan, tarif_kwh):
+    """Manfaat tahunan (Rp) dari penghematan losses pada beban puncak sepanjang tahun."""
+    return np.clip(penghematan, 0, None) * HOURS_PER_YEAR * tarif_kwh
+
+def compute_losses(df_gambar, resistansi_kabel, faktor_daya, tarif_kwh):
+    """Menghitung losses, efisiensi, penghematan, manfaat, dan rekomendasi kabel secara vektor.
+
+    Jika kolom 'Beban Kumulatif (kVA)' ada (mode topologi), arus dan efisiensi memakai beban
+    kumulatif segmen, bukan beban lokasinya sendiri.
+
+    Mengembalikan salinan DataFrame dengan kolom hasil dan daftar peringatan per baris
+    (dict berisi "baris", "lokasi", "kode", dan "pesan").
+    """
+    losses_konduktor, invalid_input, unknown_kabel, jenis = calculate_conductor_losses(df_gambar, resistansi_kabel)
+    beban = _column_array(df_gambar, load_column(df_gambar), 0)
+    losses_total = losses_konduktor + _column_array(df_gambar, "Rugi Trafo (kW)", 0)
+    penghematan = _column_array(df_gambar, "Baseline Losses (kW)", 0) - losses_total
+
+    df_hasil = df_gambar.assign(**{
+        "Losses Konduktor (kW)": losses_konduktor,
+        "Losses Total (kW)": losses_total,
+        "Efisiensi (%)": calculate_efficiency_array(losses_total, beban, faktor_daya),
+        "Penghematan Losses (kW)": penghematan,
+        "Manfaat (Rp/tahun)": calculate_benefit_array(penghematan, tarif_kwh),
+        "Rekomendasi Kabel": recommend_cable_array(df_gambar, resistansi_kabel),
+    })
+    return df_hasil, collect_loss_warnings(df_gambar, invalid_input, unknown_kabel, jenis, list(resistansi_kabel))
+
+def collect_loss_warnings(df_gambar, invalid_input, unknown_kabel, jenis, kabel_names):
+    """Menyusun daftar peringatan per baris dari mask hasil perhitungan vektor."""
+    lokasi = (df_gambar["Nama Lokasi"] if "Nama Lokasi" in df_gambar.columns
+              else pd.Series("-", index=df_gambar.index)).to_numpy()
+    index = df_gambar.index.to_numpy()
+    default_kabel = kabel_names[0] if kabel_names else "-"
+    peringatan = [
+        {"baris": index[i], "lokasi": lokasi[i], "kode": "input_tidak_valid",
+         "pesan": f"Input tidak valid di lokasi '{lokasi[i]}' (beban/tegangan <=0), losses dianggap 0."}
+        for i in np.flatnonzero(invalid_input)
+    ]
+    peringatan += [
+        {"baris": index[i], "lokasi": lokasi[i], "kode": "kabel_tidak_dikenali",
+         "pesan": f"Jenis kabel '{jenis[i]}' tidak dikenali di lokasi '{lokasi[i]}', menggunakan '{default_kabel}'."}
+        for i in np.flatnonzero(unknown_kabel)
+    ]
+    return peringatan
+
+def dataset_warning(kode, pesan):
+    """Membuat entri peringatan yang berlaku untuk seluruh dataset (bukan per baris)."""
+    return {"baris": None, "lokasi": None, "kode": kode, "pesan": pesan}
+
+def display_validation_report(laporan):
+    """Menampilkan ringkasan dan detail seluruh kesalahan validasi beserta tombol unduh laporan."""
+    st.caption(f"Validasi {sum(laporan.jumlah_baris.values()):,} baris dalam {laporan.durasi * 1000:.1f} ms "
+               f"menemukan {len(laporan.kesalahan):,} kesalahan.")
+    st.dataframe(laporan.summary(), use_container_width=True)
+    with st.expander("Detail Kesalahan Validasi"):
+        display_paginated_table(laporan.kesalahan, "validasi")
+    st.download_button(
+        label="📥 Unduh Laporan Validasi (CSV)",
+        data=laporan.kesalahan.to_csv(index=False).encode("utf-8"),
+        file_name="laporan_validasi_rab_pln.csv",
+        mime="text/csv",
+        key="validasi_csv"
+    )
+
+def display_warnings(peringatan):
+    """Menampilkan peringatan dataset satu per satu dan meringkas peringatan per baris."""
+    per_baris = [p for p in peringatan if p["baris"] is not None]
+    for p in peringatan:
+        if p["baris"] is None:
+            st.warning(p["pesan"])
+    if per_baris:
+        st.warning(f"Terdapat {len(per_baris)} peringatan perhitungan losses. Lihat detail di bawah.")
+        with st.expander("Detail Peringatan Perhitungan"):
+            display_paginated_table(pd.DataFrame(per_baris), "peringatan")
+
+# -------------------------------
+# TOPOLOGI PENYULANG RADIAL
+# -------------------------------
+def _segment_keys(values):
+    """Menormalkan ID segmen menjadi string; angka bulat bertipe float (mis. 12.0) menjadi '12'."""
+    keys = pd.Series(values).reset_index(drop=True)
+    if pd.api.types.is_float_dtype(keys) and (keys.dropna() % 1 == 0).all():
+        keys = keys.astype("Int64")
+    return keys.astype(str)
+
+def _bfs_order(start, anak, ptr):
+    """Urutan BFS iteratif dari node awal; dipakai untuk penyulang yang sangat dalam."""
+    urutan = start.tolist()
+    anak, ptr = anak.tolist(), ptr.tolist()
+    for v in urutan:  # list diperpanjang selama iterasi
+        urutan.extend(anak[ptr[v]:ptr[v + 1]])
+    return np.array(urutan, dtype=int)
+
+def build_feeder_topology(segment_ids, parent_ids):
+    """Membangun pohon penyulang radial sebagai array induk dan urutan traversal (tanpa rekursi).
+
+    Mengembalikan dict berisi "induk" (indeks baris induk, -1 untuk akar), "urutan" (indeks baris
+    dalam urutan BFS, induk selalu sebelum anaknya), "level" (list array indeks per kedalaman
+    untuk pemrosesan vektor, atau None jika penyulang lebih dalam dari TOPOLOGY_MAX_VECTOR_LEVELS),
+    dan "induk_tidak_ditemukan" (jumlah baris yang induknya tidak ada sehingga dianggap akar).
+    Melempar ValidationError untuk ID ganda atau siklus.
+    """
+    ids = pd.Index(_segment_keys(segment_ids))
+    n = len(ids)
+    if ids.has_duplicates:
+        duplikat = ids[ids.duplicated()].unique()[:5].tolist()
+        raise ValidationError(f"ID segmen harus unik, ditemukan duplikat: {duplikat}.")
+    parents = pd.Series(parent_ids).reset_index(drop=True)
+    parent_keys = _segment_keys(parents)
+    kosong = parents.isna().to_numpy() | parent_keys.str.strip().isin(["", "-"]).to_numpy()
+    induk = ids.get_indexer(parent_keys)
+    induk_tidak_ditemukan = int(((induk < 0) & ~kosong).sum())
+    induk = np.where(kosong, -1, induk)
+
+    # Daftar anak dalam format CSR: anak dari node v = anak[ptr[v]:ptr[v + 1]]
+    punya_induk = induk >= 0
+    urutan = np.argsort(induk, kind="stable")
+    anak = urutan[(~punya_induk).sum():]
+    ptr = np.concatenate([[0], np.cumsum(np.bincount(induk[punya_induk], minlength=n))])
+
+    # BFS per level secara vektor; penyulang yang sangat dalam dilanjutkan dengan loop iteratif
+    level, urutan = [], None
+    frontier = np.flatnonzero(~punya_induk)
+    while frontier.size:
+        if len(level) >= TOPOLOGY_MAX_VECTOR_LEVELS:
+            urutan = np.concatenate(level + [_bfs_order(frontier, anak, ptr)])
+            level = None
+            break
+        level.append(frontier)
+        awal, panjang = ptr[frontier], ptr[frontier + 1] - ptr[frontier]
+        total = panjang.sum()
+        if total == 0:
+            break
+        offset = np.repeat(awal - (np.cumsum(panjang) - panjang), panjang)
+        frontier = anak[np.arange(total) + offset]
+    if urutan is None:
+        urutan = np.concatenate(level) if level else np.array([], dtype=int)
+    if len(urutan) < n:
+        raise ValidationError(f"Topologi penyulang mengandung siklus ({n - len(urutan)} segmen tidak terhubung ke akar).")
+    return {"induk": induk, "urutan": urutan, "level": level, "induk_tidak_ditemukan": induk_tidak_ditemukan}
+
+def accumulate_downstream(topologi, nilai):
+    """Menjumlahkan nilai setiap segmen dengan seluruh segmen di hilirnya (dari hilir ke akar)."""
+    induk = topologi["induk"]
+    if topologi["level"] is not None:
+        kumulatif = np.asarray(nilai, dtype=float).copy()
+        for node in reversed(topologi["level"][1:]):
+            np.add.at(kumulatif, induk[node], kumulatif[node])
+        return kumulatif
+    kumulatif, induk = np.asarray(nilai, dtype=float).tolist(), induk.tolist()
+    for v in topologi["urutan"][::-1].tolist():
+        if induk[v] >= 0:
+            kumulatif[induk[v]] += kumulatif[v]
+    return np.array(kumulatif)
+
+def accumulate_from_root(topologi, nilai):
+    """Menjumlahkan nilai sepanjang jalur dari akar ke setiap segmen (dari akar ke hilir)."""
+    induk = topologi["induk"]
+    if topologi["level"] is not None:
+        kumulatif = np.asarray(nilai, dtype=float).copy()
+        for node in topologi["level"][1:]:
+            kumulatif[node] += kumulatif[induk[node]]
+        return kumulatif
+    kumulatif, induk = np.asarray(nilai, dtype=float).tolist(), induk.tolist()
+    for v in topologi["urutan"].tolist():
+        if induk[v] >= 0:
+            kumulatif[v] += kumulatif[induk[v]]
+    return np.array(kumulatif)
+
+def apply_feeder_topology(df_gambar):
+    """Menambahkan kolom 'Beban Kumulatif (kVA)' jika sheet Gambar memiliki kolom 'Segmen Induk'.
+
+    ID segmen diambil dari kolom 'ID Segmen', atau 'Nama Lokasi' jika tidak ada. Mengembalikan
+    (DataFrame, topologi atau None, daftar peringatan).
+    """
+    if "Segmen Induk" not in df_gambar.columns:
+        return df_gambar, None, []
+    id_column = "ID Segmen" if "ID Segmen" in df_gambar.columns else "Nama Lokasi"
+    topologi = build_feeder_topology(df_gambar[id_column], df_gambar["Segmen Induk"])
+    peringatan = []
+    if topologi["induk_tidak_ditemukan"]:
+        peringatan.append(dataset_warning(
+            "segmen_induk_tidak_ditemukan",
+            f"{topologi['induk_tidak_ditemukan']} segmen memiliki induk yang tidak ditemukan, dianggap sebagai awal penyulang."
+        ))
+    beban_kumulatif = accumulate_downstream(topologi, df_gambar["Beban Total (kVA)"].to_numpy(dtype=float))
+    return df_gambar.assign(**{"Beban Kumulatif (kVA)": beban_kumulatif}), topologi, peringatan
+
+def calculate_feeder_voltage_drop(df_hasil, topologi, resistansi_kabel, faktor_daya):
+    """Menghitung susut tegangan per segmen dan kumulatif dari awal penyulang (%).
+
+    Susut segmen = k · I_kumulatif · R · cos φ · L / V × 100 dengan k = √3 (3 phase) atau 2 (1 phase);
+    kabel yang tidak dikenali memakai kabel pertama seperti pada perhitungan losses.
+    """
+    kabel_names = list(resistansi_kabel.keys())
+    resistansi = np.array([resistansi_kabel[k] for k in kabel_names] or [np.nan], dtype=float)
+    kabel_index = pd.Index(kabel_names).get_indexer(df_hasil["Jenis Kabel"].astype(object).to_numpy())
+    r_per_km = resistansi[np.maximum(kabel_index, 0)]
+    tegangan = df_hasil["Tegangan (V)"].to_numpy(dtype=float)
+    three_phase = (df_hasil["Tipe Phase"].astype(str).str.upper() == "3 PHASE").to_numpy()
+    arus = calculate_current_array(df_hasil["Beban Kumulatif (kVA)"].to_numpy(dtype=float), tegangan, three_phase)
+    panjang_km = df_hasil["Panjang Jaringan (m)"].to_numpy(dtype=float) / 1000
+    with np.errstate(divide="ignore", invalid="ignore"):
+        susut = np.where(three_phase, np.sqrt(3), 2.0) * arus * r_per_km * faktor_daya * panjang_km / tegangan * 100
+    susut = np.where(tegangan > 0, susut, 0.0)
+    return df_hasil.assign(**{
+        "Susut Tegangan Segmen (%)": susut,
+        "Susut Tegangan Kumulatif (%)": accumulate_from_root(topologi, susut),
+    })
+
+# -------------------------------
+# PROFIL BEBAN
+# -------------------------------
+def build_tou_tariff(jam, tarif_kwh, tarif_wbp):
+    """Membuat tarif per interval: tarif WBP pada jam 17.00-22.00, tarif biasa di luar itu."""
+    if tarif_wbp <= 0:
+        return np.full(len(jam), float(tarif_kwh))
+    return np.where((jam >= WBP_HOURS[0]) & (jam < WBP_HOURS[1]), float(tarif_wbp), float(tarif_kwh))
+
+def summarize_load_profile(df_profil, tarif_kwh, tarif_wbp=0):
+    """Meringkas profil beban menjadi agregat per kolom profil.
+
+    Setiap kolom numerik (selain kolom meta) adalah faktor beban relatif terhadap Beban Total (kVA)
+    untuk satu lokasi atau kelas penyulang; jumlah baris menentukan interval (8760 = per jam,
+    35040 = per 15 menit). Karena rugi tembaga sebanding dengan beban², cukup disimpan
+    Σ f²·Δt dan Σ f²·tarif·Δt per profil, sehingga tidak perlu matriks lokasi × interval.
+    Kolom diproses per potongan agar memori tetap kecil untuk profil yang sangat lebar.
+    """
+    keys = [c for c in df_profil.columns if c not in PROFILE_META_COLUMNS]
+    n_interval = len(df_profil)
+    if n_interval == 0 or not keys:
+        raise ValidationError(f"Sheet '{PROFILE_SHEET}' tidak berisi data faktor beban.")
+    dt = HOURS_PER_YEAR / n_interval
+
+    # Tarif per interval: kolom tarif di profil, atau WBP/LWBP dari sidebar
+    tarif_tetap = "Tarif (Rp/kWh)" in df_profil.columns
+    if tarif_tetap:
+        try:
+            tarif = df_profil["Tarif (Rp/kWh)"].to_numpy(dtype=float)
+        except (TypeError, ValueError):
+            raise ValidationError(f"Kolom 'Tarif (Rp/kWh)' di sheet '{PROFILE_SHEET}' harus berisi angka.")
+        wbp = np.zeros(n_interval)
+    else:
+        if "Waktu" in df_profil.columns:
+            waktu = pd.to_datetime(df_profil["Waktu"], errors="coerce")
+            if waktu.isna().any():
+                salah = df_profil["Waktu"][waktu.isna()]
+                raise ValidationError(
+                    f"Kolom 'Waktu' di sheet '{PROFILE_SHEET}' harus berisi tanggal/jam yang valid dan tidak kosong "
+                    f"({len(salah):,} baris, misalnya baris {salah.index[0]}: {salah.iloc[0]!r})."
+                )
+            jam = waktu.dt.hour.to_numpy()
+        else:
+            jam = (np.arange(n_interval) * dt).astype(int) % 24
+        tarif = build_tou_tariff(jam, tarif_kwh, tarif_wbp)
+        wbp = ((jam >= WBP_HOURS[0]) & (jam < WBP_HOURS[1])).astype(float)
+
+    sum_f2 = np.empty(len(keys))
+    sum_f2_tarif = np.empty(len(keys))
+    sum_f2_wbp = np.empty(len(keys))
+    for start in range(0, len(keys), PROFILE_CHUNK_COLUMNS):
+        chunk = keys[start:start + PROFILE_CHUNK_COLUMNS]
+        try:
+            faktor = df_profil[chunk].to_numpy(dtype=float)
+        except (TypeError, ValueError):
+            raise ValidationError(f"Kolom faktor beban di sheet '{PROFILE_SHEET}' harus berisi angka.")
+        if np.isnan(faktor).any() or (faktor < 0).any():
+            raise ValidationError(f"Faktor beban di sheet '{PROFILE_SHEET}' tidak boleh kosong atau negatif.")
+        f2 = faktor * faktor
+        sum_f2[start:start + len(chunk)] = f2.sum(axis=0) * dt
+        sum_f2_tarif[start:start + len(chunk)] = (tarif @ f2) * dt
+        sum_f2_wbp[start:start + len(chunk)] = (wbp @ f2) * dt
+
+    # Agregat per jam WBP memungkinkan retariff_load_profile tanpa membaca profil lagi
+    return {
+        "keys": [str(k) for k in keys],
+        "sum_f2": sum_f2,
+        "sum_f2_tarif": sum_f2_tarif,
+        "sum_f2_wbp": sum_f2_wbp,
+        "jam": n_interval * dt,
+        "jam_wbp": wbp.sum() * dt,
+        "sum_tarif": tarif.sum() * dt,
+        "tarif_tetap": tarif_tetap,
+    }
+
+def retariff_load_profile(profil, tarif_kwh, tarif_wbp=0):
+    """Menghitung ulang agregat bertarif ringkasan profil untuk tarif sidebar yang baru.
+
+    Σ f²·tarif·Δt linear terhadap tarif LWBP dan WBP, sehingga cukup memakai Σ f²·Δt pada
+    jam WBP yang disimpan summarize_load_profile. Profil dengan kolom tarif sendiri tidak berubah.
+    """
+    if profil["tarif_tetap"]:
+        return profil
+    tarif_puncak = tarif_wbp if tarif_wbp > 0 else tarif_kwh
+    return {
+        **profil,
+        "sum_f2_tarif": tarif_kwh * (profil["sum_f2"] - profil["sum_f2_wbp"]) + tarif_puncak * profil["sum_f2_wbp"],
+        "sum_tarif": tarif_kwh * (profil["jam"] - profil["jam_wbp"]) + tarif_puncak * profil["jam_wbp"],
+    }
+
+def match_load_profile(df_hasil, profil):
+    """Mencari indeks profil tiap baris dari kolom 'Profil Beban' (atau 'Nama Lokasi'); -1 jika tidak cocok."""
+    key_column = "Profil Beban" if "Profil Beban" in df_hasil.columns else "Nama Lokasi"
+    row_keys = df_hasil[key_column].astype(str).to_numpy()
+    return pd.Index(profil["keys"]).get_indexer(row_keys)
+
+def profile_fallback_warning(jumlah, profil):
+    """Peringatan dataset untuk baris yang tidak memiliki profil beban yang cocok."""
+    pesan = "profil 'Default'" if "Default" in profil["keys"] else "beban puncak sepanjang tahun"
+    return dataset_warning("profil_tidak_ditemukan",
+                           f"{jumlah} baris tidak memiliki profil beban yang cocok, memakai {pesan}.")
+
+def resolve_profile_index(profil, profil_index):
+    """Mengganti indeks profil -1 dengan kolom 'Default' bila ada (tetap -1 jika tidak ada)."""
+    fallback = profil["keys"].index("Default") if "Default" in profil["keys"] else -1
+    return np.where(profil_index < 0, fallback, profil_index)
+
+def profile_row_sums(profil, profil_index):
+    """Agregat profil per baris: (Σ f²·Δt, Σ f²·tarif·Δt, Σ f²·Δt pada jam WBP).
+
+    profil_index sudah melalui resolve_profile_index; -1 berarti beban puncak konstan (f = 1).
+    """
+    valid = profil_index >= 0
+    take = np.where(valid, profil_index, 0)
+    return (np.where(valid, profil["sum_f2"][take], profil["jam"]),
+            np.where(valid, profil["sum_f2_tarif"][take], profil["sum_tarif"]),
+            np.where(valid, profil["sum_f2_wbp"][take], profil["jam_wbp"]))
+
+def apply_load_profile(df_hasil, profil, core_loss, profil_index=None):
+    """Menghitung energi losses dan manfaat tahunan berdasarkan profil beban.
+
+    Losses konduktor, rugi tembaga trafo, dan baseline losses dianggap terjadi pada beban puncak
+    (Beban Total) dan diskalakan dengan faktor beban²; rugi inti trafo (atau rugi trafo tetap jika
+    Daya Trafo tidak tersedia) dihitung konstan sepanjang tahun. Baris tanpa profil yang cocok
+    memakai kolom 'Default' bila ada, jika tidak dianggap berbeban puncak terus-menerus.
+    profil_index dari match_load_profile boleh diberikan jika sudah dihitung.
+    Mengembalikan salinan DataFrame dan daftar peringatan.
+    """
+    if profil_index is None:
+        profil_index = match_load_profile(df_hasil, profil)
+    peringatan = []
+    if (profil_index < 0).any():
+        peringatan.append(profile_fallback_warning(int((profil_index < 0).sum()), profil))
+        profil_index = resolve_profile_index(profil, profil_index)
+    sum_f2, sum_f2_tarif, _ = profile_row_sums(profil, profil_index)
+
+    rugi_trafo = df_hasil["Rugi Trafo (kW)"].to_numpy(dtype=float)
+    if "Daya Trafo (kVA)" in df_hasil.columns:
+        rugi_tembaga = rugi_trafo - core_loss
+    else:
+        rugi_tembaga = np.zeros(len(df_hasil))
+    rugi_tetap = rugi_trafo - rugi_tembaga
+    rugi_beban = df_hasil["Losses Konduktor (kW)"].to_numpy(dtype=float) + rugi_tembaga
+    baseline = df_hasil["Baseline Losses (kW)"].to_numpy(dtype=float)
+
+    energi_losses = rugi_beban * sum_f2 + rugi_tetap * profil["jam"]
+    manfaat = (baseline - rugi_beban) * sum_f2_tarif - rugi_tetap * profil["sum_tarif"]
+    df_hasil = df_hasil.assign(**{
+        "Faktor Rugi": sum_f2 / profil["jam"],
+        "Faktor Rugi Tarif": sum_f2_tarif / profil["sum_tarif"],
+        "Energi Losses (kWh/tahun)": energi_losses,
+        "Manfaat (Rp/tahun)": np.clip(manfaat, 0, None),
+    })
+    return df_hasil, peringatan
+
+# -------------------------------
+# CACHE HASIL ANALISIS
+# -------------------------------
+class SharedResultCache:
+    """Cache hasil analisis di direktori bersama yang dipakai lintas proses dan server Streamlit.
+
+    Tiap entri adalah file pickle yang ditulis atomik (file sementara lalu rename) sehingga pembaca
+    di proses lain tidak pernah melihat entri setengah jadi. Waktu modifikasi diperbarui saat hit
+    dan dipakai untuk eviksi LRU jika ukuran total melebihi max_bytes; entri lebih tua dari ttl dibuang.
+    Karena isinya dimuat dengan pickle, direktori diperiksa dengan ensure_private_dir sebelum dipakai;
+    jika dimiliki pengguna lain atau dapat diakses grup/lainnya, cache bersama tidak dipakai sama sekali.
+    """
+
+    def __init__(self, directory, max_bytes=SHARED_CACHE_MAX_MB * 1024 * 1024, ttl=SHARED_CACHE_TTL):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._ditolak = False
+
+    def _aman(self):
+        """True jika direktori ada (dibuat jika perlu) dan hanya milik pengguna proses ini."""
+        try:
+            ensure_private_dir(self.directory)
+            return True
+        except OSError as e:
+            with self._lock:
+                catat, self._ditolak = not self._ditolak, True
+            if catat:
+                logging.getLogger("pln_analysis").warning("Cache hasil bersama dinonaktifkan: %s", e)
+            return False
+
+    def _path(self, key):
+        """Path file entri untuk satu kunci cache."""
+        return os.path.join(self.directory, f"{hashlib.sha256(key.encode()).hexdigest()}_v{SHARED_CACHE_VERSION}.pkl")
+
+    def _count(self, nama, n=1):
+        """Menambah penghitung statistik secara thread-safe."""
+        with self._lock:
+            setattr(self, nama, getattr(self, nama) + n)
+
+    def get(self, key):
+        """Memuat hasil dari disk, atau None jika tidak ada, kedaluwarsa, rusak, atau direktori tidak aman."""
+        if not self._aman():
+            self._count("misses")
+            return None
+        path = self._path(key)
+        try:
+            if time.time() - os.stat(path).st_mtime > self.ttl:
+                self._count("evictions", _remove_file(path))
+                self._count("misses")
+                return None
+            with open(path, "rb") as file:
+                value = pickle.load(file)
+            try:
+                os.utime(path)  # tandai baru dipakai untuk eviksi LRU
+            except OSError:
+                pass
+        except FileNotFoundError:
+            self._count("misses")
+            return None
+        except Exception:
+            _remove_file(path)  # entri rusak atau dari versi kode lain
+            self._count("misses")
+            return None
+        self._count("hits")
+        return value
+
+    def put(self, key, value):
+        """Menulis hasil ke disk secara atomik lalu menjalankan eviksi."""
+        if not self._aman():
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as file:
+                pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception:
+            _remove_file(tmp_path)  # cache bersama bersifat opsional, misalnya disk penuh
+            return
+        self.evict()
+
+    @contextmanager
+    def lock(self, key):
+        """Kunci eksklusif antarproses (dan antarthread) per kunci selama blok berjalan."""
+        if fcntl is None or not self._aman():
+            yield
+            return
+        with open(self._path(key) + ".lock", "a") as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                os.utime(file.name)
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def evict(self):
+        """Membuang entri kedaluwarsa lalu entri paling lama tidak dipakai hingga ukuran di bawah batas.
+
+        Hanya satu proses yang melakukan eviksi pada satu waktu; proses lain melewatinya.
+        """
+        self._count("evictions", evict_directory(self.directory, (".pkl",), self.max_bytes, self.ttl,
+                                                 (".tmp", ".pkl.lock")))
+
+    def discard(self, key):
+        """Menghapus satu entri."""
+        _remove_file(self._path(key))
+
+    def clear(self):
+        """Menghapus seluruh entri tanpa mereset penghitung."""
+        if not self._aman():
+            return
+        try:
+            with os.scandir(self.directory) as it:
+                for item in it:
+                    if item.name.endswith(".pkl"):
+                        _remove_file(item.path)
+        except FileNotFoundError:
+            pass
+
+    def stats(self):
+        """Mengembalikan statistik proses ini serta jumlah dan ukuran entri di disk."""
+        entries, ukuran = 0, 0
+        try:
+            with os.scandir(self.directory) as it:
+                for item in it:
+                    if item.name.endswith(".pkl"):
+                        try:
+                            ukuran += item.stat().st_size
+                            entries += 1
+                        except FileNotFoundError:
+                            continue
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": entries, "size_mb": ukuran / (1024 * 1024)}
+
+def _remove_file(path):
+    """Menghapus file jika ada; mengembalikan 1 jika terhapus (proses lain mungkin sudah menghapusnya)."""
+    try:
+        os.remove(path)
+        return 1
+    except FileNotFoundError:
         return 0
-    total_loss = conductor_loss + transformer_loss
-    daya_masuk = beban * faktor_daya
-    return 100 * (1 - total_loss / daya_masuk)
-
-@st.cache_data
-def recommend_cable(row, resistansi_kabel):
-    """Merekomendasikan kabel dengan rugi daya terendah."""
-    beban = row.get("Beban Total (kVA)", 0)
-    if beban <= 0:
-        return "-"
-    losses = {}
-    for jenis, resistansi in resistansi_kabel.items():
-        r = resistansi * (row["Panjang Jaringan (m)"] / 1000)
-        i = (beban * 1000) / (np.sqrt(3) * row["Tegangan (V)"] if row["Tipe Phase"] == "3 Phase" else row["Tegangan (V)"])
-        losses[jenis] = (i ** 2) * r / 1000
-    return min(losses, key=losses.get)
+
+class ResultCache:
+    """Cache hasil analisis per dataset dengan batas ukuran, TTL, dan eviksi LRU.
+
+    Jika shared (SharedResultCache) diberikan, entri yang tidak ada di memori dicari di cache
+    bersama dan hasil baru juga ditulis ke sana.
+    """
+
+    def __init__(self, max_entries=RESULT_CACHE_MAX_ENTRIES, ttl=RESULT_CACHE_TTL, shared=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared = shared
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._key_locks = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def _get_memory(self, key):
+        """Mengambil entri memori tanpa mengubah penghitung hit/miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def _put_memory(self, key, value):
+        """Menyimpan entri ke memori dengan eviksi LRU."""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _get_shared(self, key):
+        """Mengambil dari cache bersama dan menyalinnya ke memori; None jika tidak ada."""
+        if self.shared is None:
+            return None
+        value = self.shared.get(key)
+        if value is not None:
+            self._put_memory(key, value)
+            with self._lock:
+                self.shared_hits += 1
+        return value
+
+    def get(self, key):
+        """Mengambil hasil dari memori atau cache bersama, atau None jika tidak ada / sudah kedaluwarsa."""
+        value = self._get_memory(key)
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+            return value
+        value = self._get_shared(key)
+        if value is None:
+            with self._lock:
+                self.misses += 1
+        return value
+
+    def put(self, key, value):
+        """Menyimpan hasil ke cache dan membuang entri yang paling lama tidak dipakai."""
+        self._put_memory(key, value)
+        if self.shared is not None:
+            self.shared.put(key, value)
+
+    def compute_once(self, key, hitung):
+        """Menjalankan hitung() dan menyimpan hasilnya dengan kunci antarproses per key.
+
+        Sesi atau proses lain yang meminta key yang sama menunggu, lalu memakai hasil yang sudah
+        disimpan alih-alih menghitung ulang.
+        """
+        with self.shared.lock(key) if self.shared is not None else self._lock_lokal(key):
+            value = self._get_memory(key)
+            if value is None:
+                value = self._get_shared(key)
+            if value is None:
+                value = hitung()
+                self.put(key, value)
+            return value
+
+    @contextmanager
+    def _lock_lokal(self, key):
+        """Kunci per key di dalam proses jika cache bersama tidak aktif."""
+        with self._lock:
+            kunci = self._key_locks.get(key)
+            if kunci is None:
+                kunci = threading.Lock()
+                self._key_locks[key] = kunci
+        with kunci:
+            yield
+
+    def discard(self, key):
+        """Menghapus satu entri dari memori dan cache bersama."""
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.shared is not None:
+            self.shared.discard(key)
+
+    def clear(self):
+        """Mengosongkan cache memori tanpa mereset penghitung (cache bersama tidak dihapus)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Mengembalikan statistik cache (hit memori, hit bersama, miss, eviksi, dan jumlah entri)."""
+        with self._lock:
+            return {"hits": self.hits, "shared_hits": self.shared_hits, "misses": self.misses,
+                    "evictions": self.evictions, "entries": len(self._entries)}
+
+@st.cache_resource
+def get_result_cache():
+    """Mengembalikan cache hasil yang dipakai bersama oleh seluruh sesi dalam proses ini.
+
+    Jika PLN_SHARED_CACHE_DIR diatur, proses dan server lain (dengan pengguna yang sama) yang memakai
+    direktori itu ikut berbagi hasil; tanpa variabel ini cache hanya ada di memori proses.
+    """
+    return ResultCache(shared=SharedResultCache(SHARED_CACHE_DIR) if SHARED_CACHE_DIR else None)
+
+def hash_file(file_bytes):
+    """Menghitung hash isi file (SHA-256)."""
+    return hashlib.sha256(file_bytes).hexdigest()
+
+def dataset_cache_key(file_hash, config):
+    """Membuat kunci cache dari hash workbook dan konfigurasi sidebar."""
+    config_json = json.dumps(config, sort_keys=True, default=str)
+    return f"{file_hash}:{hashlib.sha256(config_json.encode()).hexdigest()}"
 
 # -------------------------------
-# FUNGSI VISUALISASI DAN OUTPUT
+# DIAGNOSTIK
+# -------------------------------
+def peak_memory_mb():
+    """Memori puncak (RSS) proses dalam MB, atau None jika platform tidak menyediakannya."""
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024  # macOS: byte, Linux: KB
+
+def get_diagnostics_logger():
+    """Logger JSON lines untuk catatan diagnostik.
+
+    Hanya ditulis ke file jika PLN_DIAGNOSTICS_LOG diatur; file dirotasi setiap DIAGNOSTICS_LOG_MAX_MB
+    dengan DIAGNOSTICS_LOG_BACKUPS cadangan.
+    """
+    logger = logging.getLogger("pln_analysis.diagnostics")
+    if DIAGNOSTICS_LOG and not logger.handlers:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(DIAGNOSTICS_LOG)), exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                DIAGNOSTICS_LOG, maxBytes=DIAGNOSTICS_LOG_MAX_MB * 1024 * 1024, backupCount=DIAGNOSTICS_LOG_BACKUPS,
+                encoding="utf-8")
+        except OSError:
+            return logger  # log diagnostik bersifat opsional
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+class Diagnostics:
+    """Pencatat durasi, jumlah baris, dan memori puncak setiap tahap dalam satu rerun.
+
+    Tiap tahap juga dikirim sebagai satu baris JSON ke logger diagnostik agar bisa diagregasi
+    lintas sesi. Memori yang dicatat adalah RSS puncak proses (murah diukur, tanpa tracemalloc);
+    kenaikannya menunjukkan tahap yang menaikkan batas tertinggi memori.
+    """
+
+    def __init__(self, sesi=None, rerun=0):
+        self.sesi = sesi
+        self.rerun = rerun
+        self.records = []
+        self._logger = get_diagnostics_logger()
+
+    @contextmanager
+    def stage(self, tahap, baris=None):
+        """Mengukur satu tahap; nilai "baris" di dict yang di-yield boleh diisi di dalam blok."""
+        info = {"baris": baris}
+        memori_awal = peak_memory_mb()
+        start = time.perf_counter()
+        try:
+            yield info
+        finally:
+            memori_puncak = peak_memory_mb()
+            record = {
+                "waktu": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+                "sesi": self.sesi,
+                "rerun": self.rerun,
+                "tahap": tahap,
+                "durasi_ms": (time.perf_counter() - start) * 1000,
+                "baris": None if info["baris"] is None else int(info["baris"]),
+                "memori_puncak_mb": memori_puncak,
+                "kenaikan_memori_mb": None if memori_puncak is None else memori_puncak - memori_awal,
+            }
+            self.records.append(record)
+            if self._logger.isEnabledFor(logging.INFO):
+                self._logger.info(json.dumps(record))
+
+    def to_frame(self):
+        """Mengembalikan catatan tahap sebagai DataFrame."""
+        return pd.DataFrame(self.records, columns=["tahap", "durasi_ms", "baris", "memori_puncak_mb", "kenaikan_memori_mb"])
+
+def get_session_diagnostics():
+    """Membuat Diagnostics untuk rerun ini dengan id sesi dan nomor rerun dari session state."""
+    if "diagnostics_session" not in st.session_state:
+        st.session_state["diagnostics_session"] = uuid.uuid4().hex[:12]
+    st.session_state["diagnostics_rerun"] = st.session_state.get("diagnostics_rerun", 0) + 1
+    return Diagnostics(st.session_state["diagnostics_session"], st.session_state["diagnostics_rerun"])
+
+def profile_summary(profiler, limit=DIAGNOSTICS_PROFILE_LIMIT):
+    """Meringkas hasil cProfile menjadi teks (diurutkan menurut waktu kumulatif) dan bytes pstats."""
+    output = io.StringIO()
+    stats = pstats.Stats(profiler, stream=output)
+    stats.sort_stats("cumulative").print_stats(limit)
+    with tempfile.NamedTemporaryFile(suffix=".prof", delete=False) as file:
+        path = file.name
+    try:
+        stats.dump_stats(path)
+        with open(path, "rb") as file:
+            data = file.read()
+    finally:
+        os.remove(path)
+    return output.getvalue(), data
+
 # -------------------------------
-def display_results(df_rab, df_gambar, tarif_kwh, faktor_daya, resistansi_kabel):
-    """Menampilkan hasil analisis, tabel, grafik, dan kesimpulan."""
-    # Perhitungan
-    df_gambar["Losses Konduktor (kW)"] = df_gambar.apply(lambda row: calculate_conductor_loss(row, resistansi_kabel), axis=1)
-    df_gambar["Losses Total (kW)"] = df_gambar["Losses Konduktor (kW)"] + df_gambar["Rugi Trafo (kW)"]
-    df_gambar["Efisiensi (%)"] = df_gambar.apply(
-        lambda row: calculate_efficiency(row["Losses Konduktor (kW)"], row["Rugi Trafo (kW)"], row["Beban Total (kVA)"], faktor_daya),
-        axis=1
+# HASIL ANALISIS
+# -------------------------------
+@dataclass(frozen=True, eq=False)
+class AnalysisResult:
+    """Hasil analisis satu workbook yang tidak diubah lagi setelah dibuat.
+
+    Data per baris, total, ROI, dan ringkasan per lokasi dihitung sekali; UI hanya
+    memfilter dan menampilkan. DataFrame di dalamnya tidak boleh dimodifikasi.
+    """
+    df_rab: pd.DataFrame
+    df_gambar: pd.DataFrame
+    peringatan: tuple
+    info_muat: dict
+    total_biaya: float
+    total_manfaat: float
+    roi: float
+    efisiensi_di_luar_rentang: bool
+    lokasi_options: tuple
+    lokasi_index: dict
+    ringkasan_lokasi: pd.DataFrame
+    rata_rata_semua: dict
+    profil: dict = None
+    kolom_input: tuple = ()
+    jumlah_tanpa_profil: int = 0
+
+    def __getstate__(self):
+        """State pickle (cache bersama): lokasi_index disimpan sebagai satu array posisi dan batasnya.
+
+        Ratusan ribu array kecil di dalam dict jauh lebih lambat di-pickle daripada DataFrame hasilnya.
+        """
+        state = dict(self.__dict__)
+        posisi = list(self.lokasi_index.values())
+        state["lokasi_index"] = (
+            list(self.lokasi_index),
+            np.concatenate(posisi) if posisi else np.empty(0, dtype=np.intp),
+            np.cumsum([len(p) for p in posisi[:-1]], dtype=np.int64),
+        )
+        return state
+
+    def __setstate__(self, state):
+        """Membangun kembali lokasi_index dari state pickle."""
+        kunci, posisi, batas = state["lokasi_index"]
+        self.__dict__.update(state, lokasi_index=dict(zip(kunci, np.split(posisi, batas))))
+
+    def filter_lokasi(self, lokasi):
+        """Mengembalikan baris untuk satu lokasi (atau semua) tanpa memindai ulang seluruh tabel."""
+        if lokasi == "Semua":
+            return self.df_gambar
+        return self.df_gambar.take(self.lokasi_index.get(lokasi, []))
+
+    def conclusion(self, lokasi="Semua"):
+        """Mengembalikan klasifikasi kesimpulan untuk satu lokasi (atau semua)."""
+        if lokasi == "Semua":
+            rata_rata = self.rata_rata_semua
+        elif lokasi in self.ringkasan_lokasi.index:
+            rata_rata = self.ringkasan_lokasi.loc[lokasi]
+        else:
+            rata_rata = {"Efisiensi (%)": np.nan, "Penghematan Losses (kW)": np.nan}
+        return classify_conclusion(rata_rata["Efisiensi (%)"], rata_rata["Penghematan Losses (kW)"], self.roi)
+
+def build_analysis_result(df_rab, df_gambar, peringatan, info_muat, profil=None, kolom_input=()):
+    """Menyusun AnalysisResult dari DataFrame yang sudah dihitung.
+
+    profil adalah ringkasan profil beban yang dipakai (jika ada) dan kolom_input adalah kolom asli
+    sheet Gambar sebelum preprocessing; keduanya dipakai ulang oleh analisis sensitivitas.
+    """
+    total_biaya, total_manfaat, roi = calculate_roi(df_rab, df_gambar)
+    efisiensi = df_gambar["Efisiensi (%)"]
+    grouped = df_gambar.groupby("Nama Lokasi", sort=False, dropna=False)
+    ringkasan_lokasi = grouped[["Efisiensi (%)", "Penghematan Losses (kW)"]].mean()
+    return AnalysisResult(
+        df_rab=df_rab,
+        df_gambar=df_gambar,
+        peringatan=tuple(peringatan),
+        info_muat=info_muat,
+        total_biaya=total_biaya,
+        total_manfaat=total_manfaat,
+        roi=roi,
+        efisiensi_di_luar_rentang=bool(((efisiensi < 0) | (efisiensi > 100)).any()),
+        lokasi_options=("Semua",) + tuple(df_gambar["Nama Lokasi"].unique()),
+        lokasi_index=grouped.indices,
+        ringkasan_lokasi=ringkasan_lokasi,
+        rata_rata_semua={
+            "Efisiensi (%)": efisiensi.mean(),
+            "Penghematan Losses (kW)": df_gambar["Penghematan Losses (kW)"].mean(),
+        },
+        profil=profil,
+        kolom_input=tuple(kolom_input),
+        jumlah_tanpa_profil=int((match_load_profile(df_gambar, profil) < 0).sum()) if profil is not None else 0,
     )
-    df_gambar["Penghematan Losses (kW)"] = df_gambar["Baseline Losses (kW)"] - df_gambar["Losses Total (kW)"]
-    df_gambar["Manfaat (Rp/tahun)"] = df_gambar["Penghematan Losses (kW)"].clip(lower=0) * 8760 * tarif_kwh
-    df_gambar["Rekomendasi Kabel"] = df_gambar.apply(lambda row: recommend_cable(row, resistansi_kabel), axis=1)
-    
-    # Validasi efisiensi
-    if (df_gambar["Efisiensi (%)"] < 0).any() or (df_gambar["Efisiensi (%)"] > 100).any():
-        st.warning("Efisiensi di luar rentang realistis (0-100%). Periksa data input.")
-    
-    # Hitung total biaya dan ROI
-    total_biaya = df_rab["Total (Rp)"].sum()
-    total_manfaat = df_gambar["Manfaat (Rp/tahun)"].sum()
-    roi = (total_manfaat / total_biaya) * 100 if total_biaya > 0 else 0
-    
-    # Tampilkan tabel
-    st.subheader("Data RAB")
-    st.dataframe(df_rab, use_container_width=True)
-    st.subheader("Data Teknis Jaringan")
-    st.dataframe(df_gambar, use_container_width=True)
+
+def classify_conclusion(avg_efisiensi, avg_penghematan, roi):
+    """Mengklasifikasikan efisiensi, penghematan, dan ROI menjadi daftar (teks, warna)."""
+    if avg_efisiensi > 95:
+        efisiensi_teks = f"Efisiensi sistem sangat baik ({avg_efisiensi:.2f}%)."
+        efisiensi_color = COLORS["good"]
+    elif avg_efisiensi > 90:
+        efisiensi_teks = f"Efisiensi sistem baik ({avg_efisiensi:.2f}%)."
+        efisiensi_color = COLORS["moderate"]
+    else:
+        efisiensi_teks = f"Efisiensi sistem perlu ditingkatkan ({avg_efisiensi:.2f}%)."
+        efisiensi_color = COLORS["poor"]
     
-    # Filter berdasarkan lokasi
-    st.subheader("Hasil Analisis Teknis & Ekonomi")
-    lokasi_options = ['Semua'] + list(df_gambar['Nama Lokasi'].unique())
-    selected_lokasi = st.selectbox("Pilih Lokasi untuk Analisis", lokasi_options)
-    df_filtered = df_gambar if selected_lokasi == 'Semua' else df_gambar[df_gambar['Nama Lokasi'] == selected_lokasi]
+    if avg_penghematan > 3:
+        penghematan_teks = f"Penghematan rugi daya sangat baik ({avg_penghematan:.2f} kW)."
+        penghematan_color = COLORS["very_good"]
+    elif avg_penghematan > 1:
+        penghematan_teks = f"Penghematan rugi daya cukup baik ({avg_penghematan:.2f} kW)."
+        penghematan_color = COLORS["fair"]
+    else:
+        penghematan_teks = f"Penghematan rugi daya rendah ({avg_penghematan:.2f} kW), perlu optimasi."
+        penghematan_color = COLORS["low"]
     
-    st.dataframe(
-        df_filtered[["Nama Lokasi", "Jenis Kabel", "Panjang Jaringan (m)", "Beban Total (kVA)", "Tegangan (V)",
-                     "Daya Trafo (kVA)", "Losses Konduktor (kW)", "Losses Total (kW)", "Penghematan Losses (kW)",
-                     "Efisiensi (%)", "Manfaat (Rp/tahun)", "Rekomendasi Kabel"]]
-        .style.format({
-            "Losses Konduktor (kW)": "{:.2f}",
-            "Losses Total (kW)": "{:.2f}",
-            "Penghematan Losses (kW)": "{:.2f}",
-            "Efisiensi (%)": "{:.2f}",
-            "Manfaat (Rp/tahun)": "Rp {:,.0f}"
-        }),
-        use_container_width=True
-    )
+    if roi > 20:
+        roi_teks = f"Proyek ini layak secara ekonomi (ROI {roi:.2f}%)."
+        roi_color = COLORS["excellent"]
+    elif roi > 10:
+        roi_teks = f"Proyek cukup layak (ROI {roi:.2f}%)."
+        roi_color = COLORS["adequate"]
+    else:
+        roi_teks = f"Proyek kurang layak (ROI {roi:.2f}%)."
+        roi_color = COLORS["unfeasible"]
     
-    # Visualisasi Losses
-    st.subheader("Visualisasi Losses per Lokasi")
-    fig = px.bar(
-        df_filtered,
-        x="Nama Lokasi",
-        y="Losses Total (kW)",
-        color="Losses Total (kW)",
-        color_continuous_scale="Plasma",
-        title="Rugi Daya Total per Lokasi",
-        height=500,
+    return [(efisiensi_teks, efisiensi_color), (penghematan_teks, penghematan_color), (roi_teks, roi_color)]
+
+# -------------------------------
+# ANALISIS INKREMENTAL
+# -------------------------------
+def _recompute_rugi_trafo(df, config, konteks):
+    """Rugi trafo dari Daya Trafo, kolom Rugi Trafo di sheet, atau nilai default sidebar."""
+    if "Daya Trafo (kVA)" in df.columns:
+        return {"Rugi Trafo (kW)": calculate_transformer_loss_array(
+            df["Beban Total (kVA)"], df["Daya Trafo (kVA)"], config["core_loss"], config["full_load_loss"])}
+    if "Rugi Trafo (kW)" in konteks["kolom_input"]:
+        return {}
+    return {"Rugi Trafo (kW)": config["rugi_trafo"]}
+
+def _recompute_baseline(df, config, konteks):
+    """Baseline losses default sidebar, kecuali sheet memiliki kolom baseline sendiri."""
+    if "Baseline Losses (kW)" in konteks["kolom_input"]:
+        return {}
+    return {"Baseline Losses (kW)": config["baseline_losses"]}
+
+def _recompute_losses_konduktor(df, config, konteks):
+    """Losses konduktor dengan resistansi kabel yang baru."""
+    return {"Losses Konduktor (kW)": calculate_conductor_losses(df, config["resistansi_kabel"])[0]}
+
+def _recompute_losses_total(df, config, konteks):
+    """Losses total = losses konduktor + rugi trafo."""
+    return {"Losses Total (kW)": _column_array(df, "Losses Konduktor (kW)", 0) + _column_array(df, "Rugi Trafo (kW)", 0)}
+
+def _recompute_efisiensi(df, config, konteks):
+    """Efisiensi dari losses total dan beban (kumulatif pada mode topologi)."""
+    return {"Efisiensi (%)": calculate_efficiency_array(
+        _column_array(df, "Losses Total (kW)", 0), _column_array(df, load_column(df), 0), config["faktor_daya"])}
+
+def _recompute_penghematan(df, config, konteks):
+    """Penghematan = baseline losses - losses total."""
+    return {"Penghematan Losses (kW)": _column_array(df, "Baseline Losses (kW)", 0) - _column_array(df, "Losses Total (kW)", 0)}
+
+def _recompute_manfaat(df, config, konteks):
+    """Manfaat tahunan; pada mode profil beban ringkasan profil ditarif ulang lalu diterapkan lagi."""
+    if konteks["profil"] is None:
+        return {"Manfaat (Rp/tahun)": calculate_benefit_array(
+            _column_array(df, "Penghematan Losses (kW)", 0), config["tarif_kwh"])}
+    konteks["profil"] = retariff_load_profile(konteks["profil"], config["tarif_kwh"], config.get("tarif_wbp", 0))
+    df_profil, _ = apply_load_profile(df, konteks["profil"], config["core_loss"])
+    return {c: df_profil[c] for c in ["Faktor Rugi", "Faktor Rugi Tarif", "Energi Losses (kWh/tahun)", "Manfaat (Rp/tahun)"]}
+
+def _recompute_rekomendasi(df, config, konteks):
+    """Rekomendasi kabel dengan resistansi kabel yang baru."""
+    return {"Rekomendasi Kabel": recommend_cable_array(df, config["resistansi_kabel"])}
+
+# Graf dependensi kolom turunan dalam urutan topologis: tiap kolom bergantung pada parameter
+# sidebar dan kolom lain di atasnya. ROI dan ringkasan per lokasi diperbarui dari kolom akhir.
+ANALYSIS_GRAPH = {
+    "Rugi Trafo (kW)": {"parameter": ("rugi_trafo", "core_loss", "full_load_loss"), "sumber": (),
+                        "hitung": _recompute_rugi_trafo},
+    "Baseline Losses (kW)": {"parameter": ("baseline_losses",), "sumber": (), "hitung": _recompute_baseline},
+    "Losses Konduktor (kW)": {"parameter": ("resistansi_kabel",), "sumber": (), "hitung": _recompute_losses_konduktor},
+    "Losses Total (kW)": {"parameter": (), "sumber": ("Losses Konduktor (kW)", "Rugi Trafo (kW)"),
+                          "hitung": _recompute_losses_total},
+    "Efisiensi (%)": {"parameter": ("faktor_daya",), "sumber": ("Losses Total (kW)",), "hitung": _recompute_efisiensi},
+    "Penghematan Losses (kW)": {"parameter": (), "sumber": ("Baseline Losses (kW)", "Losses Total (kW)"),
+                                "hitung": _recompute_penghematan},
+    # Pada mode profil beban manfaat juga bergantung langsung pada rugi trafo (inti vs tembaga)
+    "Manfaat (Rp/tahun)": {"parameter": ("tarif_kwh", "tarif_wbp", "core_loss"),
+                           "sumber": ("Penghematan Losses (kW)", "Losses Konduktor (kW)", "Rugi Trafo (kW)"),
+                           "hitung": _recompute_manfaat},
+    "Rekomendasi Kabel": {"parameter": ("resistansi_kabel",), "sumber": (), "hitung": _recompute_rekomendasi},
+}
+# Parameter yang mengubah validasi, peringatan, atau kolom input hasil preprocessing
+FULL_RECOMPUTE_PARAMS = {"selected_kabel", "tipe_phase", "profil_beban"}
+WHAT_IF_COLUMNS = ["Jenis Kabel", "Panjang Jaringan (m)", "Beban Total (kVA)", "Tegangan (V)", "Tipe Phase",
+                   "Daya Trafo (kVA)", "Rugi Trafo (kW)", "Baseline Losses (kW)", "Profil Beban"]
+
+def changed_parameters(config_lama, config_baru):
+    """Mengembalikan nama parameter config yang nilainya berbeda."""
+    return {k for k in set(config_lama) | set(config_baru) if config_lama.get(k) != config_baru.get(k)}
+
+def dirty_columns(parameter, graph=ANALYSIS_GRAPH):
+    """Mengembalikan kolom turunan (urut topologis) yang harus dihitung ulang jika parameter berubah."""
+    kotor = []
+    for kolom, node in graph.items():
+        if set(node["parameter"]) & parameter or set(node["sumber"]) & set(kotor):
+            kotor.append(kolom)
+    return kotor
+
+def reanalyze(hasil, config_lama, config_baru):
+    """Memperbarui AnalysisResult untuk perubahan parameter sidebar tanpa menjalankan ulang pipeline.
+
+    Hanya kolom turunan yang dipengaruhi parameter yang berubah (menurut ANALYSIS_GRAPH) dihitung
+    ulang; peringatan, indeks lokasi, dan kolom lain dipakai ulang. Ringkasan per lokasi hanya
+    dihitung ulang jika efisiensi atau penghematan berubah. Mengembalikan None jika perubahan
+    memerlukan analisis penuh (pilihan kabel, tipe phase default, mode profil, atau susut
+    tegangan penyulang).
+    """
+    berubah = changed_parameters(config_lama, config_baru)
+    if not berubah:
+        return hasil
+    if berubah & FULL_RECOMPUTE_PARAMS:
+        return None
+    if set(config_lama.get("resistansi_kabel", {})) != set(config_baru.get("resistansi_kabel", {})):
+        return None  # nama kabel menentukan validasi dan peringatan kabel tak dikenal
+    if "Segmen Induk" in hasil.kolom_input and berubah & {"resistansi_kabel", "faktor_daya"}:
+        return None  # susut tegangan kumulatif memerlukan topologi penyulang
+
+    kotor = dirty_columns(berubah)
+    konteks = {"kolom_input": hasil.kolom_input, "profil": hasil.profil}
+    df = hasil.df_gambar
+    for kolom in kotor:
+        df = df.assign(**ANALYSIS_GRAPH[kolom]["hitung"](df, config_baru, konteks))
+
+    perubahan = {"df_gambar": df, "profil": konteks["profil"]}
+    if "Manfaat (Rp/tahun)" in kotor:
+        _, perubahan["total_manfaat"], perubahan["roi"] = calculate_roi(hasil.df_rab, df)
+    if {"Efisiensi (%)", "Penghematan Losses (kW)"} & set(kotor):
+        efisiensi = df["Efisiensi (%)"]
+        kolom_rata_rata = ["Efisiensi (%)", "Penghematan Losses (kW)"]
+        perubahan.update({
+            "efisiensi_di_luar_rentang": bool(((efisiensi < 0) | (efisiensi > 100)).any()),
+            "ringkasan_lokasi": df.groupby("Nama Lokasi", sort=False, dropna=False)[kolom_rata_rata].mean(),
+            "rata_rata_semua": df[kolom_rata_rata].mean().to_dict(),
+        })
+    return replace(hasil, **perubahan)
+
+def update_rows(hasil, config, perubahan):
+    """Menerapkan edit per baris (what-if) dan hanya menghitung ulang baris yang diedit.
+
+    perubahan adalah DataFrame berindeks label baris df_gambar dengan kolom input yang diedit.
+    Baris yang diedit melewati validasi dan pipeline per baris yang sama dengan mode streaming;
+    total manfaat, ROI, rata-rata, dan ringkasan lokasi terdampak diperbarui dari selisihnya.
+    config harus sama dengan config saat hasil dihitung. Mengembalikan None pada mode topologi
+    (edit satu segmen mengubah beban kumulatif hulunya). Melempar ValidationError jika edit tidak valid.
+    """
+    if perubahan.empty:
+        return hasil
+    if "Segmen Induk" in hasil.kolom_input:
+        return None
+    df_lama = hasil.df_gambar
+    posisi = df_lama.index.get_indexer(perubahan.index)
+    if (posisi < 0).any():
+        raise ValidationError("Baris yang diedit tidak ditemukan pada hasil analisis.")
+
+    baris = df_lama.iloc[posisi][list(hasil.kolom_input)]
+    for kolom in perubahan.columns:
+        baris[kolom] = perubahan[kolom]
+    baris_baru, peringatan_baris, tanpa_profil = analyze_chunk(baris, config, hasil.profil)
+
+    diedit_mask = np.zeros(len(df_lama), dtype=bool)
+    diedit_mask[posisi] = True
+
+    def sisipkan(kolom):
+        nilai = baris_baru[kolom].to_numpy()
+        seri = df_lama[kolom].copy()
+        try:
+            seri.iloc[posisi] = nilai
+            return seri
+        except (TypeError, ValueError):
+            # Nilai baru tidak muat di dtype lama (misalnya int menjadi float): mask menyesuaikan dtype
+            lain = np.empty(len(df_lama), dtype=nilai.dtype)
+            lain[posisi] = nilai
+            return df_lama[kolom].mask(diedit_mask, lain)
+
+    # Kolom input yang tidak diedit tidak berubah oleh preprocessing ulang
+    kolom_berubah = [k for k in df_lama.columns if k in perubahan.columns or k not in hasil.kolom_input]
+    df = df_lama.assign(**{kolom: sisipkan(kolom) for kolom in kolom_berubah})
+
+    # Peringatan: baris yang diedit diganti, peringatan dataset baru ditambahkan
+    diedit = set(perubahan.index)
+    peringatan = [p for p in hasil.peringatan if p["baris"] not in diedit and p["kode"] != "profil_tidak_ditemukan"]
+    kode_dataset = {p["kode"] for p in peringatan if p["baris"] is None}
+    peringatan += [p for p in peringatan_baris if p["baris"] is not None or p["kode"] not in kode_dataset]
+    jumlah_tanpa_profil = hasil.jumlah_tanpa_profil
+    if hasil.profil is not None:
+        jumlah_tanpa_profil += tanpa_profil - int((match_load_profile(df_lama.iloc[posisi], hasil.profil) < 0).sum())
+        if jumlah_tanpa_profil:
+            peringatan.append(profile_fallback_warning(jumlah_tanpa_profil, hasil.profil))
+
+    lokasi_lama = df_lama["Nama Lokasi"].iloc[posisi].to_numpy()
+    lokasi_baru = df["Nama Lokasi"].iloc[posisi].to_numpy()
+    if (lokasi_lama != lokasi_baru).any():
+        # Nama lokasi berubah: indeks dan ringkasan lokasi disusun ulang tanpa menghitung ulang losses
+        return replace(build_analysis_result(hasil.df_rab, df, peringatan, hasil.info_muat, hasil.profil, hasil.kolom_input),
+                       jumlah_tanpa_profil=jumlah_tanpa_profil)
+
+    def selisih(kolom):
+        return float(np.nansum(df[kolom].iloc[posisi].to_numpy(dtype=float))
+                     - np.nansum(df_lama[kolom].iloc[posisi].to_numpy(dtype=float)))
+
+    total_manfaat = hasil.total_manfaat + selisih("Manfaat (Rp/tahun)")
+    kolom_rata_rata = ["Efisiensi (%)", "Penghematan Losses (kW)"]
+    ringkasan_lokasi = hasil.ringkasan_lokasi.copy()
+    for lokasi in pd.unique(lokasi_baru):
+        ringkasan_lokasi.loc[lokasi, kolom_rata_rata] = df[kolom_rata_rata].take(hasil.lokasi_index[lokasi]).mean().to_numpy()
+    efisiensi_baru = baris_baru["Efisiensi (%)"]
+    return replace(
+        hasil,
+        df_gambar=df,
+        peringatan=tuple(peringatan),
+        total_manfaat=total_manfaat,
+        roi=(total_manfaat / hasil.total_biaya) * 100 if hasil.total_biaya > 0 else 0,
+        efisiensi_di_luar_rentang=(bool(((df["Efisiensi (%)"] < 0) | (df["Efisiensi (%)"] > 100)).any())
+                                   if hasil.efisiensi_di_luar_rentang
+                                   else bool(((efisiensi_baru < 0) | (efisiensi_baru > 100)).any())),
+        ringkasan_lokasi=ringkasan_lokasi,
+        rata_rata_semua={k: hasil.rata_rata_semua[k] + selisih(k) / len(df) for k in kolom_rata_rata},
+        jumlah_tanpa_profil=jumlah_tanpa_profil,
+    )
+
+# -------------------------------
+# ANALISIS SENSITIVITAS
+# -------------------------------
+def prepare_sensitivity_inputs(hasil, config):
+    """Menyiapkan array per lokasi yang tidak bergantung pada parameter yang divariasikan.
+
+    Agregat profil per baris (Σ f² seluruh jam dan jam WBP) disimpan agar Σ f²·tarif bisa disusun
+    ulang secara linear untuk tiap tarif skenario, seperti retariff_load_profile. Tanpa profil beban
+    setiap baris dianggap berbeban puncak sepanjang tahun.
+    """
+    df = hasil.df_gambar
+    beban = df["Beban Total (kVA)"].to_numpy(dtype=float)
+    profil = hasil.profil
+    if profil is not None:
+        sum_f2, sum_f2_tarif, sum_f2_wbp = profile_row_sums(
+            profil, resolve_profile_index(profil, match_load_profile(df, profil)))
+    else:
+        profil = {"jam": HOURS_PER_YEAR, "jam_wbp": 0.0, "sum_tarif": HOURS_PER_YEAR * config["tarif_kwh"],
+                  "tarif_tetap": False}
+        sum_f2, sum_f2_wbp = np.full(len(df), float(HOURS_PER_YEAR)), np.zeros(len(df))
+        sum_f2_tarif = sum_f2 * config["tarif_kwh"]
+    inputs = {
+        "beban": df[load_column(df)].to_numpy(dtype=float),
+        "losses_konduktor": df["Losses Konduktor (kW)"].to_numpy(dtype=float),
+        "sum_f2_lwbp": sum_f2 - sum_f2_wbp,
+        "sum_f2_wbp": sum_f2_wbp,
+        "sum_f2_tarif": sum_f2_tarif,
+        "jam_lwbp": profil["jam"] - profil["jam_wbp"],
+        "jam_wbp": profil["jam_wbp"],
+        "sum_tarif": profil["sum_tarif"],
+        # Profil dengan kolom tarif sendiri tidak dipengaruhi tarif sidebar
+        "tarif_tetap": profil["tarif_tetap"],
+        "tarif_wbp": config.get("tarif_wbp", 0),
+        "total_biaya": hasil.total_biaya,
+        "ada_daya_trafo": "Daya Trafo (kVA)" in df.columns,
+        # Baseline dari sidebar hanya berlaku jika sheet tidak memiliki kolom baseline sendiri
+        "baseline": (df["Baseline Losses (kW)"].to_numpy(dtype=float)
+                     if "Baseline Losses (kW)" in hasil.kolom_input else None),
+    }
+    if inputs["ada_daya_trafo"]:
+        daya_trafo = df["Daya Trafo (kVA)"].to_numpy(dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rasio2 = (beban / daya_trafo) ** 2
+        inputs["rasio_beban2"] = np.where((beban <= 0) | (daya_trafo <= 0), 0.0, rasio2)
+    else:
+        inputs["rugi_trafo_tetap"] = df["Rugi Trafo (kW)"].to_numpy(dtype=float)
+    return inputs
+
+def evaluate_scenarios(inputs, params):
+    """Menghitung ROI dan rata-rata efisiensi untuk satu blok skenario (matriks skenario × lokasi).
+
+    params berisi array per parameter dengan panjang sama (jumlah skenario dalam blok).
+    Rumus sama dengan compute_losses/apply_load_profile: rugi tembaga trafo = rasio² × full-load
+    losses, manfaat = clip((baseline - rugi beban) × Σ f²·tarif - rugi tetap × Σ tarif). Hanya tarif
+    LWBP yang divariasikan; tarif WBP sidebar (jika > 0) tetap.
+    """
+    core = params["core_loss"][:, None]
+    if inputs["ada_daya_trafo"]:
+        rugi_tembaga = inputs["rasio_beban2"][None, :] * params["full_load_loss"][:, None]
+        rugi_tetap = core
+    else:
+        rugi_tembaga = 0.0
+        rugi_tetap = inputs["rugi_trafo_tetap"][None, :]
+    rugi_beban = inputs["losses_konduktor"][None, :] + rugi_tembaga
+    baseline = inputs["baseline"][None, :] if inputs["baseline"] is not None else params["baseline_losses"][:, None]
+
+    if inputs["tarif_tetap"]:
+        f2_tarif = inputs["sum_f2_tarif"][None, :]
+        jam_tarif = inputs["sum_tarif"]
+    else:
+        tarif = params["tarif_kwh"][:, None]
+        tarif_puncak = inputs["tarif_wbp"] if inputs["tarif_wbp"] > 0 else tarif
+        f2_tarif = tarif * inputs["sum_f2_lwbp"][None, :] + tarif_puncak * inputs["sum_f2_wbp"][None, :]
+        jam_tarif = tarif * inputs["jam_lwbp"] + tarif_puncak * inputs["jam_wbp"]
+    manfaat = np.clip((baseline - rugi_beban) * f2_tarif - rugi_tetap * jam_tarif, 0, None).sum(axis=1)
+    roi = manfaat / inputs["total_biaya"] * 100 if inputs["total_biaya"] > 0 else np.zeros(len(manfaat))
+
+    beban = inputs["beban"][None, :]
+    faktor_daya = params["faktor_daya"][:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        efisiensi = 100 * (1 - (rugi_beban + rugi_tetap) / (beban * faktor_daya))
+    efisiensi = np.where((beban <= 0) | (faktor_daya <= 0), 0.0, efisiensi)
+    return roi, np.nanmean(efisiensi, axis=1)
+
+def run_scenarios(inputs, params, workers=None):
+    """Menjalankan banyak skenario dalam blok paralel (thread; NumPy melepas GIL)."""
+    n_scenario = len(next(iter(params.values())))
+    n_lokasi = max(len(inputs["beban"]), 1)
+    block = max(1, SENSITIVITY_BLOCK_SIZE // n_lokasi)
+    slices = [slice(i, min(i + block, n_scenario)) for i in range(0, n_scenario, block)]
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        hasil_blok = list(executor.map(
+            lambda sl: evaluate_scenarios(inputs, {k: v[sl] for k, v in params.items()}), slices
+        ))
+    roi = np.concatenate([r for r, _ in hasil_blok]) if hasil_blok else np.array([])
+    efisiensi = np.concatenate([e for _, e in hasil_blok]) if hasil_blok else np.array([])
+    return roi, efisiensi
+
+def sample_parameters(config, n_scenario, rentang, seed=None):
+    """Mengambil sampel acak seragam ±rentang (fraksi) di sekitar nilai sidebar."""
+    rng = np.random.default_rng(seed)
+    params = {}
+    for name in SENSITIVITY_PARAMS:
+        base = float(config[name])
+        params[name] = rng.uniform(base * (1 - rentang), base * (1 + rentang), n_scenario)
+    params["faktor_daya"] = np.clip(params["faktor_daya"], 0, 1)
+    return params
+
+def run_sensitivity(hasil, config, n_scenario=10000, rentang=0.2, seed=None, workers=None):
+    """Menjalankan simulasi Monte Carlo dan analisis tornado atas asumsi sidebar.
+
+    Mengembalikan dict berisi DataFrame "skenario" (parameter, ROI, efisiensi), "persentil"
+    (P10/P50/P90), dan "tornado" (ROI pada batas bawah/atas tiap parameter, lainnya tetap).
+    """
+    inputs = prepare_sensitivity_inputs(hasil, config)
+    params = sample_parameters(config, n_scenario, rentang, seed)
+    roi, efisiensi = run_scenarios(inputs, params, workers)
+    df_skenario = pd.DataFrame({**params, "ROI (%)": roi, "Efisiensi Rata-rata (%)": efisiensi})
+    df_persentil = df_skenario[["ROI (%)", "Efisiensi Rata-rata (%)"]].quantile([0.1, 0.5, 0.9])
+    df_persentil.index = ["P10", "P50", "P90"]
+
+    # Tornado: satu parameter di batas bawah/atas, parameter lain di nilai dasar
+    names = list(SENSITIVITY_PARAMS)
+    base = {name: np.full(2 * len(names) + 1, float(config[name])) for name in names}
+    for i, name in enumerate(names):
+        base[name][2 * i] *= 1 - rentang
+        base[name][2 * i + 1] *= 1 + rentang
+    base["faktor_daya"] = np.clip(base["faktor_daya"], 0, 1)
+    roi_oat, _ = evaluate_scenarios(inputs, base)
+    df_tornado = pd.DataFrame({
+        "Parameter": [SENSITIVITY_PARAMS[name] for name in names],
+        "ROI Bawah (%)": roi_oat[0:-1:2],
+        "ROI Atas (%)": roi_oat[1:-1:2],
+    })
+    df_tornado["Rentang ROI (%)"] = (df_tornado["ROI Atas (%)"] - df_tornado["ROI Bawah (%)"]).abs()
+    df_tornado = df_tornado.sort_values("Rentang ROI (%)", ignore_index=True)
+    return {"skenario": df_skenario, "persentil": df_persentil, "tornado": df_tornado, "roi_dasar": roi_oat[-1]}
+
+# -------------------------------
+# OPTIMASI UKURAN KABEL
+# -------------------------------
+def load_conductor_catalogue(catalogue_file=None):
+    """Memuat katalog konduktor dari file CSV/XLSX yang diunggah, atau katalog bawaan.
+
+    Kolom wajib: Jenis Kabel, Resistansi (ohm/km), KHA (A), Harga (Rp/m). Kolom opsional
+    'Reaktansi (ohm/km)' dipakai untuk susut tegangan dan 'Tipe Phase' (1 Phase/3 Phase/Semua)
+    membatasi kabel pada tipe phase tertentu.
+    """
+    if catalogue_file is None:
+        katalog = pd.DataFrame(DEFAULT_CONDUCTOR_CATALOGUE)
+    else:
+        try:
+            if catalogue_file.name.lower().endswith(".csv"):
+                katalog = pd.read_csv(io.BytesIO(catalogue_file.getvalue()))
+            else:
+                katalog = pd.read_excel(io.BytesIO(catalogue_file.getvalue()))
+        except Exception as e:
+            raise ValidationError(f"Terjadi kesalahan saat membaca katalog kabel: {e}") from e
+    if not set(CATALOGUE_COLUMNS).issubset(katalog.columns):
+        raise ValidationError(f"Katalog kabel harus memiliki kolom: {CATALOGUE_COLUMNS}.")
+    if katalog.empty:
+        raise ValidationError("Katalog kabel kosong.")
+    validate_numeric(katalog, CATALOGUE_COLUMNS[1:], sheet="Katalog Kabel")
+    if "Reaktansi (ohm/km)" not in katalog.columns:
+        katalog["Reaktansi (ohm/km)"] = 0.0
+    if "Tipe Phase" not in katalog.columns:
+        katalog["Tipe Phase"] = "Semua"
+    return katalog.reset_index(drop=True)
+
+def present_value_factor(suku_bunga, umur_tahun):
+    """Faktor nilai sekarang anuitas: Σ 1/(1+r)^t untuk t = 1..umur."""
+    if suku_bunga <= 0:
+        return float(umur_tahun)
+    return (1 - (1 + suku_bunga) ** -umur_tahun) / suku_bunga
+
+def optimize_cables(hasil, katalog, config, umur_tahun=30, suku_bunga=0.08, batas_susut=5.0):
+    """Memilih kabel dengan biaya siklus hidup terendah untuk setiap lokasi.
+
+    Biaya siklus hidup = harga kabel × panjang + nilai sekarang biaya energi losses I²R selama
+    umur_tahun (dengan faktor rugi tarif dari profil beban bila ada). Biaya investasi diambil dari
+    Harga (Rp/m) katalog untuk kabel optimal maupun kabel saat ini, bukan dari sheet RAB, agar
+    semua kandidat dibandingkan dengan dasar harga yang sama. Kandidat harus memenuhi
+    KHA (arus ≤ KHA) dan susut tegangan ≤ batas_susut (%). Dihitung sebagai matriks
+    lokasi × kabel per blok baris. Mengembalikan DataFrame berindeks sama dengan df_gambar.
+    """
+    df = hasil.df_gambar
+    n = len(df)
+    beban = df[load_column(df)].to_numpy(dtype=float)
+    tegangan = df["Tegangan (V)"].to_numpy(dtype=float)
+    panjang_km = df["Panjang Jaringan (m)"].to_numpy(dtype=float) / 1000
+    tipe_phase = df["Tipe Phase"].astype(str).str.upper()
+    three_phase = (tipe_phase == "3 PHASE").to_numpy()
+    faktor_rugi_tarif = _column_array(df, "Faktor Rugi Tarif", 1.0)
+    jam_tarif = hasil.profil["sum_tarif"] if hasil.profil is not None else HOURS_PER_YEAR * config["tarif_kwh"]
+    pv = present_value_factor(suku_bunga, umur_tahun)
+
+    nama = katalog["Jenis Kabel"].astype(str).to_numpy()
+    resistansi = katalog["Resistansi (ohm/km)"].to_numpy(dtype=float)
+    reaktansi = katalog["Reaktansi (ohm/km)"].to_numpy(dtype=float)
+    kha = katalog["KHA (A)"].to_numpy(dtype=float)
+    harga = katalog["Harga (Rp/m)"].to_numpy(dtype=float)
+    phase_katalog = katalog["Tipe Phase"].astype(str).str.upper().to_numpy()
+
+    cos_phi = min(max(config["faktor_daya"], 0.0), 1.0)
+    sin_phi = np.sqrt(1 - cos_phi ** 2)
+    arus = calculate_current_array(beban, tegangan, three_phase)
+    valid = (beban > 0) & (tegangan > 0)
+
+    pilihan = np.full(n, -1)
+    biaya_total = np.full(n, np.nan)
+    susut = np.full(n, np.nan)
+    losses = np.full(n, np.nan)
+    block = max(1, OPTIMIZER_BLOCK_SIZE // len(katalog))
+    for start in range(0, n, block):
+        sl = slice(start, min(start + block, n))
+        i = arus[sl][:, None]
+        l_km = panjang_km[sl][:, None]
+        # Rugi daya (kW), biaya losses PV dan investasi (Rp) untuk setiap pasangan lokasi × kabel
+        p_loss = (i ** 2) * resistansi[None, :] * l_km / 1000
+        biaya = harga[None, :] * l_km * 1000 + p_loss * faktor_rugi_tarif[sl][:, None] * jam_tarif * pv
+        # Susut tegangan (%): 3 phase √3·I·Z·L, 1 phase 2·I·Z·L (kawat pergi-pulang)
+        faktor_susut = np.where(three_phase[sl], np.sqrt(3), 2.0)[:, None]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            dv = faktor_susut * i * (resistansi * cos_phi + reaktansi * sin_phi)[None, :] * l_km \
+                / tegangan[sl][:, None] * 100
+        phase_ok = (phase_katalog[None, :] == "SEMUA") | \
+            (phase_katalog[None, :] == np.where(three_phase[sl], "3 PHASE", "1 PHASE")[:, None])
+        feasible = (i <= kha[None, :]) & (dv <= batas_susut) & phase_ok & valid[sl][:, None]
+        biaya_feasible = np.where(feasible, biaya, np.inf)
+        terbaik = np.argmin(biaya_feasible, axis=1)
+        rows = np.arange(terbaik.size)
+        ada = np.isfinite(biaya_feasible[rows, terbaik])
+        pilihan[sl] = np.where(ada, terbaik, -1)
+        biaya_total[sl] = np.where(ada, biaya[rows, terbaik], np.nan)
+        susut[sl] = np.where(ada, dv[rows, terbaik], np.nan)
+        losses[sl] = np.where(ada, p_loss[rows, terbaik], np.nan)
+
+    # Biaya siklus hidup kabel saat ini (jika ada di katalog) sebagai pembanding
+    idx_saat_ini = pd.Index(nama).get_indexer(df["Jenis Kabel"].astype(str).to_numpy())
+    ada_saat_ini = idx_saat_ini >= 0
+    r_saat_ini = np.where(ada_saat_ini, resistansi[np.maximum(idx_saat_ini, 0)], np.nan)
+    loss_saat_ini = (arus ** 2) * r_saat_ini * panjang_km / 1000
+    biaya_saat_ini = np.where(ada_saat_ini, harga[np.maximum(idx_saat_ini, 0)], np.nan) * panjang_km * 1000 \
+        + loss_saat_ini * faktor_rugi_tarif * jam_tarif * pv
+
+    return pd.DataFrame({
+        "Nama Lokasi": df["Nama Lokasi"].to_numpy(),
+        "Jenis Kabel": df["Jenis Kabel"].to_numpy(),
+        "Arus (A)": np.where(valid, arus, np.nan),
+        "Kabel Optimal": np.where(pilihan >= 0, nama[np.maximum(pilihan, 0)], "Tidak ada kabel memenuhi"),
+        "Susut Tegangan (%)": susut,
+        "Losses Kabel Optimal (kW)": losses,
+        "Biaya Siklus Hidup (Rp)": biaya_total,
+        "Biaya Siklus Hidup Kabel Saat Ini (Rp)": np.where(valid, biaya_saat_ini, np.nan),
+    }, index=df.index)
+
+# -------------------------------
+# MODE STREAMING
+# -------------------------------
+@dataclass(frozen=True, eq=False)
+class StreamingResult:
+    """Hasil analisis mode streaming: hanya agregat, hasil per baris ada di file Parquet.
+
+    Memori yang dipakai tidak bergantung pada jumlah baris sheet Gambar, kecuali ringkasan
+    per lokasi yang sebanding dengan jumlah lokasi unik.
+    """
+    df_rab: pd.DataFrame
+    peringatan: tuple
+    jumlah_peringatan: dict
+    jumlah_baris: int
+    total_biaya: float
+    total_manfaat: float
+    roi: float
+    efisiensi_di_luar_rentang: bool
+    ringkasan_lokasi: pd.DataFrame
+    rata_rata_semua: dict
+    path_hasil: str
+    info_muat: dict
+
+    def conclusion(self, lokasi="Semua"):
+        """Mengembalikan klasifikasi kesimpulan untuk satu lokasi (atau semua)."""
+        if lokasi == "Semua":
+            rata_rata = self.rata_rata_semua
+        elif lokasi in self.ringkasan_lokasi.index:
+            rata_rata = self.ringkasan_lokasi.loc[lokasi]
+        else:
+            rata_rata = {"Efisiensi (%)": np.nan, "Penghematan Losses (kW)": np.nan}
+        return classify_conclusion(rata_rata["Efisiensi (%)"], rata_rata["Penghematan Losses (kW)"], self.roi)
+
+def rollup_chunk(df_hasil):
+    """Menjumlahkan nilai per lokasi dalam satu potongan (jumlah dan cacah non-NaN untuk rata-rata)."""
+    nilai = pd.DataFrame({
+        "Nama Lokasi": df_hasil["Nama Lokasi"].to_numpy(),
+        "Jumlah Baris": 1,
+        "Σ Efisiensi": df_hasil["Efisiensi (%)"].to_numpy(dtype=float),
+        "n Efisiensi": df_hasil["Efisiensi (%)"].notna().to_numpy(dtype=int),
+        "Σ Penghematan": df_hasil["Penghematan Losses (kW)"].to_numpy(dtype=float),
+        "n Penghematan": df_hasil["Penghematan Losses (kW)"].notna().to_numpy(dtype=int),
+        "Losses Total (kW)": df_hasil["Losses Total (kW)"].to_numpy(dtype=float),
+        "Manfaat (Rp/tahun)": df_hasil["Manfaat (Rp/tahun)"].to_numpy(dtype=float),
+    })
+    return nilai.groupby("Nama Lokasi", sort=False, dropna=False).sum()
+
+def finalize_rollup(rollup):
+    """Mengubah jumlah per lokasi menjadi ringkasan (rata-rata efisiensi dan penghematan, total losses dan manfaat)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return pd.DataFrame({
+            "Jumlah Baris": rollup["Jumlah Baris"],
+            "Efisiensi (%)": rollup["Σ Efisiensi"] / rollup["n Efisiensi"].replace(0, np.nan),
+            "Penghematan Losses (kW)": rollup["Σ Penghematan"] / rollup["n Penghematan"].replace(0, np.nan),
+            "Losses Total (kW)": rollup["Losses Total (kW)"],
+            "Manfaat (Rp/tahun)": rollup["Manfaat (Rp/tahun)"],
+        })
+
+def spill_schema(df_hasil):
+    """Skema Parquet file hasil: kolom teks sebagai string, kolom lain sebagai float64."""
+    return pa.schema([(c, pa.string() if c in STREAMING_TEXT_COLUMNS else pa.float64()) for c in df_hasil.columns])
+
+def arrow_table(df_hasil, schema):
+    """Mengonversi satu potongan DataFrame ke tabel Arrow dengan skema tetap."""
+    arrays = []
+    for field in schema:
+        kolom = df_hasil[field.name]
+        try:
+            kolom = kolom.astype("string") if field.type == pa.string() else kolom.astype(field.type.to_pandas_dtype())
+        except (TypeError, ValueError):
+            raise ValidationError(f"Kolom '{field.name}' berisi tipe data yang tidak konsisten.")
+        arrays.append(pa.array(kolom, type=field.type, from_pandas=True))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+def analyze_chunk(df_chunk, config, profil):
+    """Menjalankan validasi, preprocessing, losses, dan profil beban untuk satu potongan sheet Gambar.
+
+    Mengembalikan (DataFrame hasil, peringatan, jumlah baris tanpa profil beban yang cocok); peringatan
+    profil tidak ditemukan disusun pemanggil dari jumlah seluruh potongan.
+    """
+    validate_schema([(df_chunk, GAMBAR_SCHEMA, "Gambar", {"kabel": list(config["selected_kabel"]) + ["-"]})]).raise_if_invalid()
+    df_hasil, peringatan = preprocess_data(
+        df_chunk,
+        config["tipe_phase"],
+        config["rugi_trafo"],
+        config["baseline_losses"],
+        config["core_loss"],
+        config["full_load_loss"]
+    )
+    df_hasil, peringatan_losses = compute_losses(df_hasil, config["resistansi_kabel"], config["faktor_daya"], config["tarif_kwh"])
+    peringatan += peringatan_losses
+    tanpa_profil = 0
+    if profil is not None:
+        profil_index = match_load_profile(df_hasil, profil)
+        tanpa_profil = int((profil_index < 0).sum())
+        df_hasil, peringatan_profil = apply_load_profile(df_hasil, profil, config["core_loss"], profil_index)
+        peringatan += [p for p in peringatan_profil if p["kode"] != "profil_tidak_ditemukan"]
+    return df_hasil, peringatan, tanpa_profil
+
+def run_streaming_analysis(source, config, output_path, df_profil=None, chunk_rows=STREAMING_CHUNK_ROWS):
+    """Menganalisis workbook per potongan baris sheet Gambar dan menulis hasil per baris ke Parquet.
+
+    source adalah path atau objek file workbook. Hanya agregat berjalan (total manfaat, jumlah untuk
+    rata-rata kesimpulan, dan ringkasan per lokasi) yang disimpan di memori. Peringatan dataset dicatat
+    sekali per kode; peringatan per baris disimpan maksimal STREAMING_MAX_ROW_WARNINGS contoh dan
+    jumlah lengkapnya per kode ada di jumlah_peringatan. Mode topologi
+    penyulang tidak didukung karena beban kumulatif membutuhkan seluruh pohon. df_profil (misalnya
+    dari CSV) menggantikan sheet Profil Beban. Melempar ValidationError jika data tidak valid.
+    """
+    start = time.perf_counter()
+    try:
+        wb = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    except Exception as e:
+        raise ValidationError(f"Terjadi kesalahan saat membaca file: {e}") from e
+    tmp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    writer = None
+    try:
+        if any(sheet not in wb.sheetnames for sheet in REQUIRED_SHEETS):
+            raise ValidationError(f"File Excel harus memiliki sheet: {REQUIRED_SHEETS}.")
+        df_rab = read_sheet(wb["RAB"])
+        validate_schema([(df_rab, RAB_SCHEMA, "RAB", None)]).raise_if_invalid()
+        if df_profil is None and PROFILE_SHEET in wb.sheetnames:
+            df_profil = read_sheet(wb[PROFILE_SHEET])
+        profil = None
+        if df_profil is not None and config.get("profil_beban", True):
+            profil = summarize_load_profile(df_profil, config["tarif_kwh"], config.get("tarif_wbp", 0))
+
+        peringatan, baris_peringatan, jumlah_peringatan = {}, [], {}
+        rollup = None
+        jumlah_baris, tanpa_profil, total_manfaat = 0, 0, 0.0
+        sum_efisiensi = sum_penghematan = 0.0
+        n_efisiensi = n_penghematan = 0
+        di_luar_rentang = False
+        for i, df_chunk in enumerate(iter_sheet_chunks(wb["Gambar"], chunk_rows, GAMBAR_COLUMNS, GAMBAR_NUMERIC_COLUMNS)):
+            if i == 0:
+                validate_columns(df_rab, df_chunk)
+                if "Segmen Induk" in df_chunk.columns:
+                    raise ValidationError("Mode streaming tidak mendukung topologi penyulang (kolom 'Segmen Induk').")
+            df_hasil, peringatan_chunk, tanpa_profil_chunk = analyze_chunk(df_chunk, config, profil)
+            tanpa_profil += tanpa_profil_chunk
+            for p in peringatan_chunk:
+                if p["baris"] is None:
+                    peringatan.setdefault(p["kode"], p)
+                    continue
+                jumlah_peringatan[p["kode"]] = jumlah_peringatan.get(p["kode"], 0) + 1
+                if len(baris_peringatan) < STREAMING_MAX_ROW_WARNINGS:
+                    baris_peringatan.append(p)
+            if df_hasil.empty:
+                continue
+
+            if writer is None:
+                schema = spill_schema(df_hasil)
+                writer = pq.ParquetWriter(tmp_path, schema)
+            writer.write_table(arrow_table(df_hasil, schema))
+
+            efisiensi = df_hasil["Efisiensi (%)"]
+            penghematan = df_hasil["Penghematan Losses (kW)"]
+            jumlah_baris += len(df_hasil)
+            total_manfaat += df_hasil["Manfaat (Rp/tahun)"].sum()
+            sum_efisiensi += efisiensi.sum()
+            n_efisiensi += int(efisiensi.count())
+            sum_penghematan += penghematan.sum()
+            n_penghematan += int(penghematan.count())
+            di_luar_rentang = di_luar_rentang or bool(((efisiensi < 0) | (efisiensi > 100)).any())
+            part = rollup_chunk(df_hasil)
+            rollup = part if rollup is None else pd.concat([rollup, part]).groupby(level=0, sort=False, dropna=False).sum()
+
+        if writer is not None:
+            writer.close()
+            writer = None
+            os.replace(tmp_path, output_path)
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        wb.close()
+
+    if tanpa_profil:
+        peringatan["profil_tidak_ditemukan"] = profile_fallback_warning(tanpa_profil, profil)
+    total_biaya = df_rab["Total (Rp)"].sum()
+    roi = (total_manfaat / total_biaya) * 100 if total_biaya > 0 else 0
+    if rollup is None:
+        rollup = rollup_chunk(pd.DataFrame(columns=["Nama Lokasi", "Efisiensi (%)", "Penghematan Losses (kW)",
+                                                    "Losses Total (kW)", "Manfaat (Rp/tahun)"]))
+    return StreamingResult(
+        df_rab=df_rab,
+        peringatan=tuple(peringatan.values()) + tuple(baris_peringatan),
+        jumlah_peringatan=jumlah_peringatan,
+        jumlah_baris=jumlah_baris,
+        total_biaya=total_biaya,
+        total_manfaat=total_manfaat,
+        roi=roi,
+        efisiensi_di_luar_rentang=di_luar_rentang,
+        ringkasan_lokasi=finalize_rollup(rollup),
+        rata_rata_semua={
+            "Efisiensi (%)": sum_efisiensi / n_efisiensi if n_efisiensi else np.nan,
+            "Penghematan Losses (kW)": sum_penghematan / n_penghematan if n_penghematan else np.nan,
+        },
+        path_hasil=output_path if jumlah_baris else None,
+        info_muat={"sumber": "streaming", "durasi": time.perf_counter() - start},
+    )
+
+# -------------------------------
+# EKSPOR HASIL
+# -------------------------------
+def iter_export_chunks(source, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Menghasilkan potongan DataFrame dari DataFrame atau path file Parquet (hasil mode streaming)."""
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), chunk_rows):
+            yield source.iloc[start:start + chunk_rows]
+        return
+    for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_rows):
+        yield batch.to_pandas()
+
+def export_columns(source):
+    """Nama kolom ekspor dari DataFrame atau skema file Parquet, juga jika hasil tidak memiliki baris."""
+    if isinstance(source, pd.DataFrame):
+        return [str(c) for c in source.columns]
+    return pq.ParquetFile(source).schema_arrow.names
+
+def export_schema(df):
+    """Skema Arrow ekspor: kolom numerik mempertahankan tipenya, kolom lain sebagai string."""
+    return pa.schema([
+        (str(c), pa.from_numpy_dtype(df[c].dtype) if pd.api.types.is_numeric_dtype(df[c]) else pa.string())
+        for c in df.columns
+    ])
+
+def write_csv_export(source, target, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Menulis CSV per potongan ke file biner target; header selalu ditulis, juga tanpa baris."""
+    teks = io.TextIOWrapper(target, encoding="utf-8", newline="")
+    pd.DataFrame(columns=export_columns(source)).to_csv(teks, index=False)
+    for chunk in iter_export_chunks(source, chunk_rows):
+        chunk.to_csv(teks, header=False, index=False)
+    teks.flush()
+    teks.detach()  # target tetap terbuka untuk pemanggil
+
+def write_parquet_export(source, target, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Menulis Parquet per row group ke file biner target; file Parquet sumber cukup disalin."""
+    if not isinstance(source, pd.DataFrame):
+        with open(source, "rb") as file:
+            shutil.copyfileobj(file, target)
+        return
+    schema = export_schema(source)
+    with pq.ParquetWriter(target, schema) as writer:
+        for chunk in iter_export_chunks(source, chunk_rows):
+            writer.write_table(arrow_table(chunk.rename(columns=str), schema))
+
+def export_summary(hasil, lokasi="Semua"):
+    """Baris (label, nilai) sheet Ringkasan: biaya, manfaat, ROI, rata-rata, dan kesimpulan."""
+    if lokasi == "Semua":
+        rata_rata = hasil.rata_rata_semua
+    elif lokasi in hasil.ringkasan_lokasi.index:
+        rata_rata = hasil.ringkasan_lokasi.loc[lokasi]
+    else:
+        rata_rata = {"Efisiensi (%)": np.nan, "Penghematan Losses (kW)": np.nan}
+    baris = [
+        ("Lokasi", lokasi),
+        ("Total Biaya RAB (Rp)", hasil.total_biaya),
+        ("Total Manfaat (Rp/tahun)", hasil.total_manfaat),
+        ("ROI Tahunan (%)", hasil.roi),
+        ("Rata-rata Efisiensi (%)", rata_rata["Efisiensi (%)"]),
+        ("Rata-rata Penghematan Losses (kW)", rata_rata["Penghematan Losses (kW)"]),
+    ]
+    baris += [(f"Kesimpulan {i}", teks) for i, (teks, _) in enumerate(hasil.conclusion(lokasi), start=1)]
+    return baris
+
+def _excel_value(value):
+    """Mengubah nilai NumPy/pandas menjadi nilai yang bisa ditulis openpyxl (NaN menjadi sel kosong)."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is pd.NA or value is pd.NaT or (isinstance(value, float) and np.isnan(value)):
+        return None
+    return value
+
+def write_xlsx_report(source, target, ringkasan, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Menulis laporan XLSX (sheet Analisis dan Ringkasan) dengan openpyxl mode write-only.
+
+    Baris dialirkan per potongan; jika melebihi batas baris Excel, dilanjutkan ke sheet
+    'Analisis (2)', dan seterusnya.
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    ws_ringkasan = wb.create_sheet("Ringkasan")
+    for label, nilai in ringkasan:
+        ws_ringkasan.append([label, _excel_value(nilai)])
+
+    ws, n_baris, n_sheet, header = None, 0, 0, export_columns(source)
+    for chunk in iter_export_chunks(source, chunk_rows):
+        for row in chunk.itertuples(index=False, name=None):
+            if ws is None or n_baris >= XLSX_MAX_ROWS:
+                n_sheet += 1
+                ws = wb.create_sheet("Analisis" if n_sheet == 1 else f"Analisis ({n_sheet})", index=n_sheet - 1)
+                ws.append(header)
+                n_baris = 0
+            ws.append([_excel_value(v) for v in row])
+            n_baris += 1
+    if ws is None:
+        wb.create_sheet("Analisis", 0).append(header)
+    wb.save(target)
+
+def deferred_export(writer, source, *args):
+    """Membuat callable untuk st.download_button yang baru membuat ekspor (bytes) saat tombol diklik."""
+    def build():
+        buffer = io.BytesIO()
+        writer(source, buffer, *args)
+        return buffer.getvalue()
+    return build
+
+def display_export_buttons(hasil, source, lokasi="Semua", key="ekspor"):
+    """Menampilkan tombol unduh CSV, Parquet, dan XLSX yang baru dibuat ketika diklik."""
+    col1, col2, col3 = st.columns(3)
+    col1.download_button(
+        label="📥 Unduh Hasil Analisis (CSV)",
+        data=deferred_export(write_csv_export, source),
+        file_name="hasil_analisis_rab_pln.csv",
+        mime="text/csv",
+        key=f"{key}_csv"
+    )
+    col2.download_button(
+        label="📥 Unduh Hasil Analisis (Parquet)",
+        data=deferred_export(write_parquet_export, source),
+        file_name="hasil_analisis_rab_pln.parquet",
+        mime="application/octet-stream",
+        key=f"{key}_parquet"
+    )
+    col3.download_button(
+        label="📥 Unduh Laporan (XLSX)",
+        data=deferred_export(write_xlsx_report, source, export_summary(hasil, lokasi)),
+        file_name="laporan_analisis_rab_pln.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        key=f"{key}_xlsx"
+    )
+
+# -------------------------------
+# PENYIMPANAN PROYEK
+# -------------------------------
+STORE_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS workbook (
+    hash TEXT PRIMARY KEY,
+    nama_file TEXT,
+    jumlah_baris_rab INTEGER NOT NULL,
+    disimpan_pada TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rab (
+    hash TEXT NOT NULL REFERENCES workbook(hash) ON DELETE CASCADE,
+    baris INTEGER NOT NULL,
+    uraian TEXT,
+    total_rp REAL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (hash, baris)
+);
+CREATE TABLE IF NOT EXISTS analisis (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    hash TEXT NOT NULL REFERENCES workbook(hash),
+    hash_profil TEXT,
+    ulp TEXT NOT NULL,
+    tanggal TEXT NOT NULL,
+    disimpan_pada TEXT NOT NULL,
+    config TEXT NOT NULL,
+    jumlah_baris INTEGER NOT NULL DEFAULT 0,
+    jumlah_lokasi INTEGER NOT NULL DEFAULT 0,
+    total_biaya REAL,
+    total_manfaat REAL,
+    roi REAL,
+    rata_efisiensi REAL,
+    rata_penghematan REAL,
+    UNIQUE (hash, ulp, tanggal)
+);
+CREATE INDEX IF NOT EXISTS idx_analisis_ulp_tanggal ON analisis (ulp, tanggal);
+CREATE INDEX IF NOT EXISTS idx_analisis_tanggal ON analisis (tanggal);
+CREATE TABLE IF NOT EXISTS hasil_baris (
+    analisis_id INTEGER NOT NULL REFERENCES analisis(id) ON DELETE CASCADE,
+    baris INTEGER NOT NULL,
+    {", ".join(f"{nama} {tipe}" for nama, tipe in STORE_COLUMNS.values())},
+    PRIMARY KEY (analisis_id, baris)
+);
+CREATE TABLE IF NOT EXISTS lokasi (
+    analisis_id INTEGER NOT NULL REFERENCES analisis(id) ON DELETE CASCADE,
+    nama_lokasi TEXT,
+    jumlah_baris INTEGER NOT NULL,
+    efisiensi_persen REAL,
+    penghematan_kw REAL,
+    losses_total_kw REAL,
+    manfaat_rp REAL
+);
+CREATE INDEX IF NOT EXISTS idx_lokasi_analisis ON lokasi (analisis_id);
+CREATE INDEX IF NOT EXISTS idx_lokasi_nama ON lokasi (nama_lokasi);
+CREATE INDEX IF NOT EXISTS idx_lokasi_efisiensi ON lokasi (efisiensi_persen);
+"""
+
+class ProjectStore:
+    """Penyimpanan proyek SQLite: workbook, RAB, dan hasil analisis per baris dan per lokasi.
+
+    Satu analisis disimpan per (hash workbook, ULP, tanggal); menyimpan ulang menggantikannya.
+    Ringkasan per lokasi diagregasi SQLite saat disimpan dan diindeks menurut nama lokasi dan
+    efisiensi, sehingga kueri portofolio tidak perlu membaca ulang workbook. Koneksi dibuka per
+    operasi agar aman dipakai dari beberapa sesi Streamlit sekaligus.
+    """
+
+    def __init__(self, path=PROJECT_STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode = WAL")  # pembaca tidak terblokir saat ada penulisan
+            conn.executescript(STORE_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Membuka koneksi dengan foreign key aktif; transaksi di-commit atau di-rollback otomatis."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA foreign_keys = ON")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _query(self, sql, params=()):
+        """Menjalankan kueri baca dan mengembalikan DataFrame."""
+        with self._connect() as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+    def save_analysis(self, hasil, source, file_hash, nama_file, ulp, tanggal, config, hash_profil=None):
+        """Menyimpan satu analisis (AnalysisResult atau StreamingResult) dan mengembalikan id-nya.
+
+        source adalah DataFrame hasil per baris atau path Parquet hasil mode streaming; baris
+        ditulis per potongan dalam satu transaksi. tanggal berupa date atau string ISO.
+        """
+        tanggal = tanggal.isoformat() if hasattr(tanggal, "isoformat") else str(tanggal)
+        sekarang = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        with self._connect() as conn:
+            if conn.execute("SELECT 1 FROM workbook WHERE hash = ?", (file_hash,)).fetchone() is None:
+                df_rab = hasil.df_rab
+                conn.execute("INSERT INTO workbook VALUES (?, ?, ?, ?)", (file_hash, nama_file, len(df_rab), sekarang))
+                uraian = df_rab["Uraian"].tolist() if "Uraian" in df_rab.columns else [None] * len(df_rab)
+                conn.executemany("INSERT INTO rab VALUES (?, ?, ?, ?, ?)", zip(
+                    [file_hash] * len(df_rab), range(len(df_rab)), uraian,
+                    pd.to_numeric(df_rab["Total (Rp)"], errors="coerce").tolist(),
+                    df_rab.to_json(orient="records", lines=True, force_ascii=False).splitlines(),
+                ))
+            conn.execute("DELETE FROM analisis WHERE hash = ? AND ulp = ? AND tanggal = ?", (file_hash, ulp, tanggal))
+            analisis_id = conn.execute(
+                "INSERT INTO analisis (hash, hash_profil, ulp, tanggal, disimpan_pada, config, total_biaya, total_manfaat, "
+                "roi, rata_efisiensi, rata_penghematan) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (file_hash, hash_profil, ulp, tanggal, sekarang, json.dumps(config, sort_keys=True, default=str),
+                 float(hasil.total_biaya), float(hasil.total_manfaat), float(hasil.roi),
+                 float(hasil.rata_rata_semua["Efisiensi (%)"]), float(hasil.rata_rata_semua["Penghematan Losses (kW)"])),
+            ).lastrowid
+
+            jumlah_baris = 0
+            for chunk in iter_export_chunks(source):
+                kolom = [k for k in STORE_COLUMNS if k in chunk.columns]
+                nama_sql = ["analisis_id", "baris"] + [STORE_COLUMNS[k][0] for k in kolom]
+                nilai = [chunk[k].astype(object).where(chunk[k].notna(), None).tolist() for k in kolom]
+                conn.executemany(
+                    f"INSERT INTO hasil_baris ({', '.join(nama_sql)}) VALUES ({', '.join('?' * len(nama_sql))})",
+                    zip([analisis_id] * len(chunk), range(jumlah_baris, jumlah_baris + len(chunk)), *nilai),
+                )
+                jumlah_baris += len(chunk)
+            conn.execute(
+                "INSERT INTO lokasi SELECT analisis_id, nama_lokasi, COUNT(*), AVG(efisiensi_persen), AVG(penghematan_kw), "
+                "AVG(losses_total_kw), SUM(manfaat_rp) FROM hasil_baris WHERE analisis_id = ? GROUP BY nama_lokasi",
+                (analisis_id,),
+            )
+            conn.execute(
+                "UPDATE analisis SET jumlah_baris = ?, jumlah_lokasi = (SELECT COUNT(*) FROM lokasi WHERE analisis_id = ?) "
+                "WHERE id = ?", (jumlah_baris, analisis_id, analisis_id),
+            )
+            conn.execute("DELETE FROM workbook WHERE hash NOT IN (SELECT hash FROM analisis)")
+        return analisis_id
+
+    def delete_analysis(self, analisis_id):
+        """Menghapus satu analisis beserta hasilnya; workbook tanpa analisis ikut dihapus."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM analisis WHERE id = ?", (int(analisis_id),))
+            conn.execute("DELETE FROM workbook WHERE hash NOT IN (SELECT hash FROM analisis)")
+
+    def analyses(self):
+        """Daftar analisis tersimpan, terbaru lebih dulu."""
+        return self._query(
+            'SELECT a.id AS "ID", a.ulp AS "ULP", a.tanggal AS "Tanggal", w.nama_file AS "File", '
+            'a.jumlah_baris AS "Jumlah Baris", a.jumlah_lokasi AS "Jumlah Lokasi", a.total_biaya AS "Total Biaya (Rp)", '
+            'a.total_manfaat AS "Total Manfaat (Rp/tahun)", a.roi AS "ROI (%)", a.rata_efisiensi AS "Rata-rata Efisiensi (%)", '
+            'a.disimpan_pada AS "Disimpan" FROM analisis a JOIN workbook w ON w.hash = a.hash '
+            'ORDER BY a.tanggal DESC, a.ulp'
+        )
+
+    def portfolio_by_ulp(self, terbaru=False):
+        """Total biaya, manfaat, dan ROI per ULP; terbaru=True hanya memakai tanggal terakhir tiap ULP."""
+        filter_terbaru = "WHERE a.tanggal = (SELECT MAX(b.tanggal) FROM analisis b WHERE b.ulp = a.ulp) " if terbaru else ""
+        return self._query(
+            'SELECT a.ulp AS "ULP", COUNT(*) AS "Jumlah Analisis", SUM(a.jumlah_lokasi) AS "Jumlah Lokasi", '
+            'SUM(a.total_biaya) AS "Total Biaya (Rp)", SUM(a.total_manfaat) AS "Total Manfaat (Rp/tahun)", '
+            'CASE WHEN SUM(a.total_biaya) > 0 THEN SUM(a.total_manfaat) * 100.0 / SUM(a.total_biaya) ELSE 0 END AS "ROI (%)" '
+            f"FROM analisis a {filter_terbaru}GROUP BY a.ulp ORDER BY a.ulp"
+        )
+
+    def roi_trend(self):
+        """ROI per ULP dan tanggal, urut menurut tanggal."""
+        return self._query(
+            'SELECT ulp AS "ULP", tanggal AS "Tanggal", SUM(total_biaya) AS "Total Biaya (Rp)", '
+            'SUM(total_manfaat) AS "Total Manfaat (Rp/tahun)", '
+            'CASE WHEN SUM(total_biaya) > 0 THEN SUM(total_manfaat) * 100.0 / SUM(total_biaya) ELSE 0 END AS "ROI (%)" '
+            "FROM analisis GROUP BY ulp, tanggal ORDER BY tanggal, ulp"
+        )
+
+    def worst_locations(self, n=STORE_WORST_LOCATIONS, ulp=None):
+        """n lokasi dengan rata-rata efisiensi terendah di seluruh analisis (atau satu ULP)."""
+        filter_ulp = "AND a.ulp = ? " if ulp is not None else ""
+        params = ((ulp,) if ulp is not None else ()) + (int(n),)
+        return self._query(
+            'SELECT a.ulp AS "ULP", a.tanggal AS "Tanggal", l.nama_lokasi AS "Nama Lokasi", l.jumlah_baris AS "Jumlah Baris", '
+            'l.efisiensi_persen AS "Efisiensi (%)", l.penghematan_kw AS "Penghematan Losses (kW)", '
+            'l.manfaat_rp AS "Manfaat (Rp/tahun)", a.id AS "ID Analisis" '
+            "FROM lokasi l JOIN analisis a ON a.id = l.analisis_id "
+            f"WHERE l.efisiensi_persen IS NOT NULL {filter_ulp}ORDER BY l.efisiensi_persen LIMIT ?",
+            params,
+        )
+
+    def location_history(self, nama_lokasi):
+        """Riwayat satu lokasi di seluruh analisis tersimpan, urut menurut tanggal."""
+        return self._query(
+            'SELECT a.ulp AS "ULP", a.tanggal AS "Tanggal", l.jumlah_baris AS "Jumlah Baris", '
+            'l.efisiensi_persen AS "Efisiensi (%)", l.penghematan_kw AS "Penghematan Losses (kW)", '
+            'l.losses_total_kw AS "Losses Total (kW)", l.manfaat_rp AS "Manfaat (Rp/tahun)", a.id AS "ID Analisis" '
+            "FROM lokasi l JOIN analisis a ON a.id = l.analisis_id WHERE l.nama_lokasi = ? ORDER BY a.tanggal, a.ulp",
+            (nama_lokasi,),
+        )
+
+@st.cache_resource
+def get_project_store():
+    """Mengembalikan penyimpanan proyek bersama untuk seluruh sesi dalam proses ini."""
+    return ProjectStore(PROJECT_STORE_PATH)
+
+# -------------------------------
+# FUNGSI VISUALISASI DAN OUTPUT
+# -------------------------------
+def build_losses_figure(df_filtered):
+    """Membuat grafik batang rugi daya total per lokasi."""
+    fig = px.bar(
+        df_filtered,
+        x="Nama Lokasi",
+        y="Losses Total (kW)",
+        color="Losses Total (kW)",
+        color_continuous_scale="Plasma",
+        title="Rugi Daya Total per Lokasi",
+        height=500,
         text="Losses Total (kW)"
     )
     fig.update_traces(
@@ -349,10 +2788,10 @@ def display_results(df_rab, df_gambar, tarif_kwh, faktor_daya, resistansi_kabel)
         margin=dict(l=50, r=50, t=80, b=100),
         showlegend=False
     )
-    st.plotly_chart(fig, use_container_width=True)
-    
-    # Visualisasi Efisiensi
-    st.subheader("Visualisasi Efisiensi per Lokasi")
+    return fig
+
+def build_efficiency_figure(df_filtered):
+    """Membuat grafik batang efisiensi sistem per lokasi."""
     fig_eff = px.bar(
         df_filtered,
         x="Nama Lokasi",
@@ -380,10 +2819,10 @@ def display_results(df_rab, df_gambar, tarif_kwh, faktor_daya, resistansi_kabel)
         margin=dict(l=50, r=50, t=80, b=100),
         showlegend=False
     )
-    st.plotly_chart(fig_eff, use_container_width=True)
-    
-    # Visualisasi Penghematan
-    st.subheader("Visualisasi Penghematan Losses per Lokasi")
+    return fig_eff
+
+def build_savings_figure(df_filtered):
+    """Membuat grafik batang penghematan rugi daya per lokasi."""
     fig_penghematan = px.bar(
         df_filtered,
         x="Nama Lokasi",
@@ -411,56 +2850,270 @@ def display_results(df_rab, df_gambar, tarif_kwh, faktor_daya, resistansi_kabel)
         margin=dict(l=50, r=50, t=80, b=100),
         showlegend=False
     )
-    st.plotly_chart(fig_penghematan, use_container_width=True)
+    return fig_penghematan
+
+def aggregate_per_location(df_filtered):
+    """Mengagregasi metrik grafik per lokasi (jumlah untuk losses/penghematan, rata-rata untuk efisiensi)."""
+    grouped = df_filtered.groupby("Nama Lokasi", sort=False, dropna=False)
+    return grouped.agg({kolom: meta["agregasi"] for kolom, meta in CHART_METRICS.items()})
+
+def top_locations(per_lokasi, kolom, n=CHART_MAX_BARS):
+    """Mengambil n lokasi terburuk untuk satu metrik (terbesar untuk losses, terkecil untuk efisiensi/penghematan)."""
+    nilai = per_lokasi[kolom].dropna()
+    if CHART_METRICS[kolom]["terburuk"] == "terbesar":
+        return nilai.nlargest(n)
+    return nilai.nsmallest(n)
+
+def histogram_bins(nilai, bins=CHART_HISTOGRAM_BINS):
+    """Menghitung histogram di server; mengembalikan (titik tengah bin, lebar bin, jumlah)."""
+    nilai = np.asarray(nilai, dtype=float)
+    nilai = nilai[np.isfinite(nilai)]
+    if len(nilai) == 0:
+        return np.array([]), np.array([]), np.array([], dtype=int)
+    counts, edges = np.histogram(nilai, bins=bins)
+    return (edges[:-1] + edges[1:]) / 2, np.diff(edges), counts
+
+def style_figure(fig, title, height=500):
+    """Menerapkan tema gelap yang sama dengan grafik lain ke grafik agregat."""
+    fig.update_layout(
+        title=dict(text=title, x=0.5, font=dict(size=20, family="Arial", color="#F1E9E9")),
+        font=dict(family="Arial", size=12, color="#EEE6E6"),
+        plot_bgcolor="rgba(0,0,0,1)",
+        paper_bgcolor="rgba(0,0,0,0)",
+        margin=dict(l=50, r=50, t=80, b=60),
+        height=height,
+        showlegend=False
+    )
+    fig.update_xaxes(showgrid=False)
+    fig.update_yaxes(showgrid=True, gridcolor="rgba(200,200,200,0.3)")
+    return fig
+
+def build_aggregated_metric_figure(per_lokasi, kolom):
+    """Grafik satu metrik untuk data besar: top-N lokasi terburuk dan distribusi (histogram) seluruh lokasi."""
+    meta = CHART_METRICS[kolom]
+    top = top_locations(per_lokasi, kolom)
+    tengah, lebar, counts = histogram_bins(per_lokasi[kolom])
+    fig = make_subplots(rows=1, cols=2, column_widths=[0.55, 0.45], horizontal_spacing=0.12, subplot_titles=(
+        f"{len(top)} Lokasi dengan {meta['judul']} {meta['terburuk'].capitalize()}",
+        f"Distribusi {len(per_lokasi):,} Lokasi"))
+    fig.add_trace(go.Bar(
+        x=top.to_numpy(), y=top.index.astype(str), orientation="h",
+        marker=dict(color=top.to_numpy(), colorscale=meta["skala"]),
+        hovertemplate=f"%{{y}}: %{{x:.2f}} {meta['satuan']}<extra></extra>"
+    ), row=1, col=1)
+    fig.add_trace(go.Bar(
+        x=tengah, y=counts, width=lebar, marker_color=COLORS["moderate"],
+        hovertemplate=f"%{{x:.2f}} {meta['satuan']}: %{{y}} lokasi<extra></extra>"
+    ), row=1, col=2)
+    fig.update_yaxes(autorange="reversed", showgrid=False, row=1, col=1)
+    fig.update_xaxes(title_text=f"{kolom}", row=1, col=1)
+    fig.update_xaxes(title_text=f"{kolom}", row=1, col=2)
+    fig.update_yaxes(title_text="Jumlah Lokasi", row=1, col=2)
+    return style_figure(fig, f"{meta['judul']} per Lokasi", height=max(500, 14 * len(top) + 150))
+
+def build_group_figure(df_filtered):
+    """Grafik rata-rata metrik per kombinasi jenis kabel dan tipe phase."""
+    grup = df_filtered.groupby(["Jenis Kabel", "Tipe Phase"], dropna=False)[list(CHART_METRICS)].mean()
+    label = [f"{kabel} | {phase}" for kabel, phase in grup.index]
+    fig = make_subplots(rows=1, cols=len(CHART_METRICS), subplot_titles=[f"Rata-rata {k}" for k in CHART_METRICS])
+    for i, kolom in enumerate(CHART_METRICS, start=1):
+        fig.add_trace(go.Bar(
+            x=label, y=grup[kolom].to_numpy(),
+            marker=dict(color=grup[kolom].to_numpy(), colorscale=CHART_METRICS[kolom]["skala"]),
+            hovertemplate=f"%{{x}}: %{{y:.2f}} {CHART_METRICS[kolom]['satuan']}<extra></extra>"
+        ), row=1, col=i)
+    fig.update_xaxes(tickangle=30)
+    return style_figure(fig, "Rata-rata per Jenis Kabel & Tipe Phase", height=450)
+
+def sample_rows(n, n_max=CHART_MAX_POINTS, seed=0):
+    """Memilih indeks posisi maksimal n_max baris secara deterministik (terurut)."""
+    if n <= n_max:
+        return np.arange(n)
+    return np.sort(np.random.default_rng(seed).choice(n, n_max, replace=False))
+
+def build_scatter_figure(df_filtered):
+    """Scatter WebGL efisiensi terhadap beban dari sampel baris (maksimal CHART_MAX_POINTS titik)."""
+    posisi = sample_rows(len(df_filtered))
+    sampel = df_filtered.iloc[posisi]
+    beban = load_column(sampel)
+    fig = go.Figure(go.Scattergl(
+        x=sampel[beban].to_numpy(dtype=float), y=sampel["Efisiensi (%)"].to_numpy(dtype=float),
+        mode="markers", text=sampel["Nama Lokasi"].astype(str).to_numpy(),
+        marker=dict(size=5, color=sampel["Losses Total (kW)"].to_numpy(dtype=float), colorscale="Plasma",
+                    showscale=True, colorbar=dict(title="Losses (kW)")),
+        hovertemplate="%{text}<br>%{x:.1f} kVA · %{y:.2f}%<extra></extra>"
+    ))
+    fig.update_xaxes(title_text=beban)
+    fig.update_yaxes(title_text="Efisiensi (%)")
+    judul = f"Efisiensi vs Beban ({len(sampel):,} dari {len(df_filtered):,} baris)"
+    return style_figure(fig, judul, height=450)
+
+def build_figures(df_filtered):
+    """Menyusun daftar (subjudul, grafik) untuk data terpilih.
+
+    Hingga CHART_MAX_BARS baris, grafik batang per baris seperti biasa. Di atasnya data
+    diagregasi di server (top-N, histogram, rata-rata per kabel/phase, dan scatter WebGL
+    dari sampel) sehingga ukuran payload tidak bergantung pada jumlah baris, termasuk satu
+    lokasi dengan banyak segmen.
+    """
+    if len(df_filtered) <= CHART_MAX_BARS:
+        return [
+            ("Visualisasi Losses per Lokasi", build_losses_figure(df_filtered)),
+            ("Visualisasi Efisiensi per Lokasi", build_efficiency_figure(df_filtered)),
+            ("Visualisasi Penghematan Losses per Lokasi", build_savings_figure(df_filtered)),
+        ]
+    per_lokasi = aggregate_per_location(df_filtered)
+    return [
+        ("Visualisasi Losses per Lokasi", build_aggregated_metric_figure(per_lokasi, "Losses Total (kW)")),
+        ("Visualisasi Efisiensi per Lokasi", build_aggregated_metric_figure(per_lokasi, "Efisiensi (%)")),
+        ("Visualisasi Penghematan Losses per Lokasi", build_aggregated_metric_figure(per_lokasi, "Penghematan Losses (kW)")),
+        ("Ringkasan per Jenis Kabel & Tipe Phase", build_group_figure(df_filtered)),
+        ("Sebaran Efisiensi terhadap Beban", build_scatter_figure(df_filtered)),
+    ]
+
+def get_session_figures(hasil, selected_lokasi, df_filtered):
+    """Mengambil grafik untuk lokasi terpilih dari session state, membuatnya bila belum ada."""
+    memo = st.session_state.get("figures")
+    if memo is None or memo["hasil"] is not hasil:
+        memo = {"hasil": hasil, "lokasi": {}}
+        st.session_state["figures"] = memo
+    if selected_lokasi not in memo["lokasi"]:
+        memo["lokasi"][selected_lokasi] = build_figures(df_filtered)
+    return memo["lokasi"][selected_lokasi]
+
+def query_table(df, cari="", kolom_urut=None, naik=True, kolom_filter=None, rentang=(None, None)):
+    """Menyaring dan mengurutkan tabel di server; mengembalikan posisi baris hasil (array int).
+
+    cari dicocokkan (tanpa membedakan huruf besar, bukan regex) ke kolom non-numerik dan indeks
+    non-numerik; rentang (min, max) berlaku untuk kolom_filter numerik, None berarti tanpa batas.
+    Kolom object (misalnya 'No' berisi judul bagian teks dan angka) diurutkan sebagai teks.
+    """
+    mask = np.ones(len(df), dtype=bool)
+    if cari:
+        cocok = np.zeros(len(df), dtype=bool)
+        for kolom in df.columns:
+            if not pd.api.types.is_numeric_dtype(df[kolom]):
+                cocok |= df[kolom].astype(str).str.contains(cari, case=False, regex=False).to_numpy()
+        if not pd.api.types.is_numeric_dtype(df.index):
+            cocok |= np.asarray(df.index.astype(str).str.contains(cari, case=False, regex=False), dtype=bool)
+        mask &= cocok
+    if kolom_filter is not None and rentang != (None, None):
+        nilai = df[kolom_filter].to_numpy(dtype=float)
+        if rentang[0] is not None:
+            mask &= nilai >= rentang[0]
+        if rentang[1] is not None:
+            mask &= nilai <= rentang[1]
+    posisi = np.flatnonzero(mask)
+    if kolom_urut is not None:
+        nilai = df[kolom_urut].iloc[posisi].reset_index(drop=True)
+        if pd.api.types.is_object_dtype(nilai):
+            nilai = nilai.where(nilai.isna(), nilai.astype(str))
+        urutan = nilai.sort_values(ascending=naik, kind="stable", na_position="last").index.to_numpy()
+        posisi = posisi[urutan]
+    return posisi
+
+def display_paginated_table(df, key, columns=None, format_map=None):
+    """Menampilkan tabel per halaman dengan pencarian, filter rentang, dan pengurutan di server.
+
+    Hanya halaman yang terlihat yang diformat dan dikirim ke browser. Posisi baris hasil query
+    disimpan di session state per tabel sehingga berpindah halaman tidak menyaring ulang.
+    """
+    columns = [c for c in (columns or df.columns) if c in df.columns]
+    numerik = [c for c in columns if pd.api.types.is_numeric_dtype(df[c])]
+    col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
+    cari = col1.text_input("Cari", key=f"{key}_cari", placeholder="Teks pada kolom non-numerik")
+    kolom_urut = col2.selectbox("Urutkan", ["(urutan asli)"] + columns, key=f"{key}_urut")
+    naik = col3.selectbox("Arah", ["Naik", "Turun"], key=f"{key}_arah") == "Naik"
+    page_size = col4.selectbox("Baris/halaman", TABLE_PAGE_SIZES, index=TABLE_PAGE_SIZES.index(TABLE_DEFAULT_PAGE_SIZE),
+                               key=f"{key}_ukuran")
+    kolom_filter, rentang = None, (None, None)
+    if numerik:
+        with st.expander("Filter Rentang"):
+            fcol1, fcol2, fcol3 = st.columns([2, 1, 1])
+            pilihan = fcol1.selectbox("Kolom", ["(tanpa filter)"] + numerik, key=f"{key}_filter")
+            if pilihan != "(tanpa filter)":
+                kolom_filter = pilihan
+                rentang = (fcol2.number_input("Minimum", value=None, key=f"{key}_min"),
+                           fcol3.number_input("Maksimum", value=None, key=f"{key}_max"))
+
+    query = (cari, None if kolom_urut == "(urutan asli)" else kolom_urut, naik, kolom_filter, rentang)
+    memo = st.session_state.get(f"table_{key}")
+    if memo is None or memo[0]() is not df or memo[1] != query:
+        memo = (weakref.ref(df), query, query_table(df, *query))
+        st.session_state[f"table_{key}"] = memo
+    posisi = memo[2]
+
+    n_halaman = max(1, -(-len(posisi) // page_size))
+    halaman = min(int(st.number_input(f"Halaman (dari {n_halaman:,})", min_value=1, value=1, key=f"{key}_halaman")), n_halaman)
+    start = (halaman - 1) * page_size
+    page = df.iloc[posisi[start:start + page_size]][columns]
+    if format_map:
+        page = page.style.format({k: v for k, v in format_map.items() if k in columns}, na_rep="-")
+    st.dataframe(page, use_container_width=True)
+    st.caption(f"Menampilkan baris {min(start + 1, len(posisi)):,}-{min(start + page_size, len(posisi)):,} "
+               f"dari {len(posisi):,} (total {len(df):,})")
+
+def display_results(hasil, diagnostics=None):
+    """Menampilkan hasil analisis, tabel, grafik, dan kesimpulan dari AnalysisResult."""
+    diagnostics = diagnostics if diagnostics is not None else Diagnostics()
+    display_warnings(hasil.peringatan)
+
+    # Validasi efisiensi
+    if hasil.efisiensi_di_luar_rentang:
+        st.warning("Efisiensi di luar rentang realistis (0-100%). Periksa data input.")
+    
+    # Tampilkan tabel
+    with diagnostics.stage("tabel_data", len(hasil.df_gambar)):
+        st.subheader("Data RAB")
+        display_paginated_table(hasil.df_rab, "rab")
+        st.subheader("Data Teknis Jaringan")
+        display_paginated_table(hasil.df_gambar, "gambar")
+    
+    # Filter berdasarkan lokasi
+    st.subheader("Hasil Analisis Teknis & Ekonomi")
+    selected_lokasi = st.selectbox("Pilih Lokasi untuk Analisis", hasil.lokasi_options)
+    df_filtered = hasil.filter_lokasi(selected_lokasi)
+    
+    with diagnostics.stage("tabel_hasil", len(df_filtered)):
+        display_paginated_table(
+            df_filtered,
+            "hasil",
+            columns=["Nama Lokasi", "Jenis Kabel", "Panjang Jaringan (m)", "Beban Total (kVA)", "Tegangan (V)",
+                     "Daya Trafo (kVA)", "Losses Konduktor (kW)", "Losses Total (kW)", "Penghematan Losses (kW)",
+                     "Efisiensi (%)", "Manfaat (Rp/tahun)", "Rekomendasi Kabel"],
+            format_map={
+                "Losses Konduktor (kW)": "{:.2f}",
+                "Losses Total (kW)": "{:.2f}",
+                "Penghematan Losses (kW)": "{:.2f}",
+                "Efisiensi (%)": "{:.2f}",
+                "Manfaat (Rp/tahun)": "Rp {:,.0f}"
+            }
+        )
+    
+    # Visualisasi (grafik disimpan per lokasi di session state)
+    with diagnostics.stage("grafik_dibuat", len(df_filtered)):
+        figures = get_session_figures(hasil, selected_lokasi, df_filtered)
+    with diagnostics.stage("grafik_dikirim", len(df_filtered)):
+        for subjudul, fig in figures:
+            st.subheader(subjudul)
+            st.plotly_chart(fig, use_container_width=True)
     
     # Metrik
     col1, col2 = st.columns(2)
-    col1.metric("Total Biaya RAB", f"Rp {total_biaya:,.0f}")
-    col2.metric("ROI Tahunan", f"{roi:.2f}%")
+    col1.metric("Total Biaya RAB", f"Rp {hasil.total_biaya:,.0f}")
+    col2.metric("ROI Tahunan", f"{hasil.roi:.2f}%")
+    if "Susut Tegangan Kumulatif (%)" in hasil.df_gambar.columns:
+        col3, col4 = st.columns(2)
+        col3.metric("Susut Tegangan Ujung Terbesar", f"{hasil.df_gambar['Susut Tegangan Kumulatif (%)'].max():.2f}%")
+        col4.metric("Beban Kumulatif Terbesar", f"{hasil.df_gambar['Beban Kumulatif (kVA)'].max():,.1f} kVA")
     
-    # Unduh hasil
-    csv = df_filtered.to_csv(index=False)
-    st.download_button(
-        label="📥 Unduh Hasil Analisis (CSV)",
-        data=csv,
-        file_name="hasil_analisis_rab_pln.csv",
-        mime="text/csv"
-    )
+    # Unduh hasil (dibuat hanya ketika tombol diklik)
+    display_export_buttons(hasil, df_filtered, selected_lokasi)
     
     # Kesimpulan
     st.subheader("Kesimpulan")
-    avg_efisiensi = df_filtered["Efisiensi (%)"].mean()
-    avg_penghematan = df_filtered["Penghematan Losses (kW)"].mean()
-    
-    if avg_efisiensi > 95:
-        efisiensi_teks = f"Efisiensi sistem sangat baik ({avg_efisiensi:.2f}%)."
-        efisiensi_color = COLORS["good"]
-    elif avg_efisiensi > 90:
-        efisiensi_teks = f"Efisiensi sistem baik ({avg_efisiensi:.2f}%)."
-        efisiensi_color = COLORS["moderate"]
-    else:
-        efisiensi_teks = f"Efisiensi sistem perlu ditingkatkan ({avg_efisiensi:.2f}%)."
-        efisiensi_color = COLORS["poor"]
-    
-    if avg_penghematan > 3:
-        penghematan_teks = f"Penghematan rugi daya sangat baik ({avg_penghematan:.2f} kW)."
-        penghematan_color = COLORS["very_good"]
-    elif avg_penghematan > 1:
-        penghematan_teks = f"Penghematan rugi daya cukup baik ({avg_penghematan:.2f} kW)."
-        penghematan_color = COLORS["fair"]
-    else:
-        penghematan_teks = f"Penghematan rugi daya rendah ({avg_penghematan:.2f} kW), perlu optimasi."
-        penghematan_color = COLORS["low"]
-    
-    if roi > 20:
-        roi_teks = f"Proyek ini layak secara ekonomi (ROI {roi:.2f}%)."
-        roi_color = COLORS["excellent"]
-    elif roi > 10:
-        roi_teks = f"Proyek cukup layak (ROI {roi:.2f}%)."
-        roi_color = COLORS["adequate"]
-    else:
-        roi_teks = f"Proyek kurang layak (ROI {roi:.2f}%)."
-        roi_color = COLORS["unfeasible"]
+    (efisiensi_teks, efisiensi_color), (penghematan_teks, penghematan_color), (roi_teks, roi_color) = \
+        hasil.conclusion(selected_lokasi)
     
     st.markdown(f"<div style='background-color:{efisiensi_color}; padding:10px; border-radius:10px; margin-bottom:8px;'>{efisiensi_teks}</div>", unsafe_allow_html=True)
     st.markdown(f"<div style='background-color:{penghematan_color}; padding:10px; border-radius:10px; margin-bottom:8px;'>{penghematan_teks}</div>", unsafe_allow_html=True)
@@ -469,34 +3122,525 @@ def display_results(df_rab, df_gambar, tarif_kwh, faktor_daya, resistansi_kabel)
     st.markdown("---")
     st.caption("Dibuat dengan 💡 Streamlit | PLN ULP Batang © 2025")
 
+def display_streaming_results(hasil):
+    """Menampilkan ringkasan hasil mode streaming dan tautan unduh file hasil per baris."""
+    display_warnings(hasil.peringatan)
+    jumlah_baris_peringatan = sum(hasil.jumlah_peringatan.values())
+    if jumlah_baris_peringatan > STREAMING_MAX_ROW_WARNINGS:
+        st.caption(f"Detail hanya memuat {STREAMING_MAX_ROW_WARNINGS:,} dari {jumlah_baris_peringatan:,} peringatan per baris.")
+    if hasil.efisiensi_di_luar_rentang:
+        st.warning("Efisiensi di luar rentang realistis (0-100%). Periksa data input.")
+
+    st.subheader("Data RAB")
+    display_paginated_table(hasil.df_rab, "rab")
+    st.subheader("Ringkasan per Lokasi")
+    display_paginated_table(
+        hasil.ringkasan_lokasi,
+        "ringkasan_lokasi",
+        format_map={
+            "Efisiensi (%)": "{:.2f}",
+            "Penghematan Losses (kW)": "{:.2f}",
+            "Losses Total (kW)": "{:.2f}",
+            "Manfaat (Rp/tahun)": "Rp {:,.0f}"
+        }
+    )
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Total Biaya RAB", f"Rp {hasil.total_biaya:,.0f}")
+    col2.metric("ROI Tahunan", f"{hasil.roi:.2f}%")
+    col3.metric("Jumlah Baris Dianalisis", f"{hasil.jumlah_baris:,}")
+    if hasil.path_hasil is not None:
+        display_export_buttons(hasil, hasil.path_hasil)
+
+    st.subheader("Kesimpulan")
+    for teks, color in hasil.conclusion():
+        st.markdown(f"<div style='background-color:{color}; padding:10px; border-radius:10px; margin-bottom:8px;'>{teks}</div>", unsafe_allow_html=True)
+    st.success("✅ Analisis streaming selesai!")
+    st.markdown("---")
+    st.caption("Dibuat dengan 💡 Streamlit | PLN ULP Batang © 2025")
+
+def display_diagnostics(diagnostics, profil_cprofile=None):
+    """Menampilkan waktu, jumlah baris, dan memori puncak per tahap di sidebar, serta hasil cProfile."""
+    with st.sidebar.expander("Diagnostik Rerun", expanded=True):
+        df = diagnostics.to_frame()
+        st.dataframe(df.style.format({"durasi_ms": "{:.1f}", "memori_puncak_mb": "{:.0f}", "kenaikan_memori_mb": "{:.1f}"},
+                                     na_rep="-"),
+                     use_container_width=True, hide_index=True)
+        st.caption(f"Total tercatat {df['durasi_ms'].sum():.0f} ms · sesi {diagnostics.sesi} · rerun {diagnostics.rerun}"
+                   + (f" · log: {DIAGNOSTICS_LOG}" if DIAGNOSTICS_LOG else ""))
+    if profil_cprofile is not None:
+        teks, data = profil_cprofile
+        with st.expander("🔬 Hasil cProfile Rerun Ini"):
+            st.code(teks)
+            st.download_button("📥 Unduh Profil (.prof)", data=data, file_name="pln_analysis_rerun.prof",
+                               mime="application/octet-stream")
+
+def build_tornado_figure(df_tornado, roi_dasar):
+    """Membuat diagram tornado pengaruh tiap parameter terhadap ROI."""
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        y=df_tornado["Parameter"], x=df_tornado["ROI Bawah (%)"] - roi_dasar, base=roi_dasar,
+        orientation="h", name="Batas bawah", marker_color=COLORS["poor"]
+    ))
+    fig.add_trace(go.Bar(
+        y=df_tornado["Parameter"], x=df_tornado["ROI Atas (%)"] - roi_dasar, base=roi_dasar,
+        orientation="h", name="Batas atas", marker_color=COLORS["good"]
+    ))
+    fig.update_layout(
+        barmode="overlay",
+        title=dict(text="Diagram Tornado ROI", x=0.5, font=dict(size=20, family="Arial", color="#F1E9E9")),
+        xaxis_title="ROI Tahunan (%)",
+        font=dict(family="Arial", size=12, color="#EEE6E6"),
+        plot_bgcolor="rgba(0,0,0,1)",
+        paper_bgcolor="rgba(0,0,0,0)",
+        height=400
+    )
+    return fig
+
+def display_sensitivity(hasil, config, opsi):
+    """Menampilkan distribusi ROI, persentil, dan diagram tornado."""
+    st.subheader("Analisis Sensitivitas ROI")
+    # weakref: id(hasil) bisa dipakai ulang hasil lain setelah hasil ini dibuang dari cache
+    key = (json.dumps(config, sort_keys=True, default=str), opsi["n_scenario"], opsi["rentang"])
+    memo = st.session_state.get("sensitivity")
+    if memo is None or memo[0]() is not hasil or memo[1] != key:
+        start = time.perf_counter()
+        memo = (weakref.ref(hasil), key, run_sensitivity(hasil, config, opsi["n_scenario"], opsi["rentang"], seed=0),
+                time.perf_counter() - start)
+        st.session_state["sensitivity"] = memo
+    sensitivitas, durasi = memo[2], memo[3]
+
+    col1, col2, col3 = st.columns(3)
+    for col, label in zip((col1, col2, col3), ("P10", "P50", "P90")):
+        col.metric(f"ROI {label}", f"{sensitivitas['persentil'].loc[label, 'ROI (%)']:.2f}%")
+    fig_hist = px.histogram(sensitivitas["skenario"], x="ROI (%)", nbins=50, title="Distribusi ROI Tahunan", height=400)
+    fig_hist.update_layout(
+        title=dict(x=0.5, font=dict(size=20, family="Arial", color="#F1E9E9")),
+        font=dict(family="Arial", size=12, color="#EEE6E6"),
+        plot_bgcolor="rgba(0,0,0,1)",
+        paper_bgcolor="rgba(0,0,0,0)"
+    )
+    st.plotly_chart(fig_hist, use_container_width=True)
+    st.plotly_chart(build_tornado_figure(sensitivitas["tornado"], sensitivitas["roi_dasar"]), use_container_width=True)
+    st.dataframe(sensitivitas["persentil"].style.format("{:.2f}"), use_container_width=True)
+    st.caption(f"{opsi['n_scenario']:,} skenario × {len(hasil.df_gambar):,} lokasi dihitung dalam {durasi:.2f} detik.")
+
+def display_cable_optimization(hasil, config, opsi):
+    """Menampilkan hasil optimasi ukuran kabel per lokasi."""
+    st.subheader("Optimasi Ukuran Kabel (Biaya Siklus Hidup)")
+    try:
+        katalog = load_conductor_catalogue(opsi["katalog_file"])
+    except ValidationError as e:
+        st.error(str(e))
+        return
+    katalog_id = opsi["katalog_file"].file_id if opsi["katalog_file"] is not None else None
+    key = (json.dumps(config, sort_keys=True, default=str), katalog_id,
+           opsi["umur_tahun"], opsi["suku_bunga"], opsi["batas_susut"])
+    memo = st.session_state.get("cable_optimization")
+    if memo is None or memo[0]() is not hasil or memo[1] != key:
+        memo = (weakref.ref(hasil), key,
+                optimize_cables(hasil, katalog, config, opsi["umur_tahun"], opsi["suku_bunga"], opsi["batas_susut"]))
+        st.session_state["cable_optimization"] = memo
+    df_optimal = memo[2]
+
+    # Kedua total dijumlahkan atas lokasi yang sama: ada kabel optimal dan kabel saat ini ada di katalog
+    sebanding = df_optimal["Biaya Siklus Hidup (Rp)"].notna() & df_optimal["Biaya Siklus Hidup Kabel Saat Ini (Rp)"].notna()
+    biaya_optimal = df_optimal.loc[sebanding, "Biaya Siklus Hidup (Rp)"].sum()
+    biaya_saat_ini = df_optimal.loc[sebanding, "Biaya Siklus Hidup Kabel Saat Ini (Rp)"].sum()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Biaya Siklus Hidup Optimal", f"Rp {biaya_optimal:,.0f}")
+    col2.metric("Biaya Siklus Hidup Kabel Saat Ini", f"Rp {biaya_saat_ini:,.0f}")
+    col3.metric("Lokasi Tanpa Kabel Memenuhi", f"{(df_optimal['Kabel Optimal'] == 'Tidak ada kabel memenuhi').sum():,}")
+    st.caption(f"Total dibandingkan atas {sebanding.sum():,} dari {len(df_optimal):,} lokasi yang memiliki kabel optimal "
+               "dan kabel saat ini ada di katalog. Biaya investasi memakai Harga (Rp/m) katalog × panjang, "
+               "bukan nilai RAB.")
+    st.dataframe(df_optimal["Kabel Optimal"].value_counts().rename("Jumlah Lokasi"), use_container_width=True)
+    with st.expander("Detail Optimasi per Lokasi"):
+        display_paginated_table(df_optimal, "optimasi")
+    with st.expander("Katalog Kabel"):
+        st.dataframe(katalog, use_container_width=True)
+
+def display_what_if(hasil, config, file_id):
+    """Menampilkan editor what-if per lokasi dan mengembalikan hasil dengan edit baris diterapkan.
+
+    Edit disimpan di session state per lokasi (selama file yang sama) dan diterapkan dengan
+    update_rows, sehingga hanya baris yang diedit yang dihitung ulang.
+    """
+    state = st.session_state.get("what_if")
+    if state is None or state["file"] != file_id:
+        state = {"file": file_id, "versi": 0, "perubahan": {}}
+        st.session_state["what_if"] = state
+
+    with st.expander("🧪 Simulasi What-if per Baris"):
+        if "Segmen Induk" in hasil.kolom_input:
+            st.info("Simulasi what-if per baris belum tersedia pada mode topologi penyulang.")
+            return hasil
+        kolom = [c for c in WHAT_IF_COLUMNS if c in hasil.kolom_input]
+        col1, col2 = st.columns([3, 1])
+        lokasi = col1.selectbox("Lokasi", hasil.lokasi_options[1:], key="what_if_lokasi")
+        if col2.button("Reset Simulasi", key="what_if_reset"):
+            state["perubahan"] = {}
+            state["versi"] += 1
+            st.rerun()
+
+        dasar = hasil.df_gambar.take(hasil.lokasi_index[lokasi])[kolom]
+        tersimpan = state["perubahan"].get(lokasi)
+        tampil = dasar if tersimpan is None else pd.concat([dasar.drop(index=tersimpan.index), tersimpan]).loc[dasar.index]
+        diedit = st.data_editor(
+            tampil,
+            key=f"what_if_{lokasi}_{state['versi']}",
+            num_rows="fixed",
+            use_container_width=True,
+            column_config={
+                "Jenis Kabel": st.column_config.SelectboxColumn(options=list(config["selected_kabel"]) + ["-"]),
+                "Tipe Phase": st.column_config.SelectboxColumn(options=["3 Phase", "1 Phase"]),
+            },
+        )
+        berubah = ~(diedit.eq(dasar) | (diedit.isna() & dasar.isna())).all(axis=1)
+        if berubah.any():
+            state["perubahan"][lokasi] = diedit[berubah]
+        else:
+            state["perubahan"].pop(lokasi, None)
+
+        if not state["perubahan"]:
+            return hasil
+        perubahan = pd.concat(state["perubahan"].values())
+        key = perubahan.to_json()
+        memo = st.session_state.get("what_if_hasil")
+        if memo is None or memo[0]() is not hasil or memo[1] != key:
+            try:
+                memo = (weakref.ref(hasil), key, update_rows(hasil, config, perubahan))
+            except ValidationError as e:
+                st.error(str(e))
+                return hasil
+            st.session_state["what_if_hasil"] = memo
+        hasil_edit = memo[2]
+        st.caption(f"{len(perubahan):,} baris diedit di {len(state['perubahan']):,} lokasi — "
+                   f"ROI {hasil.roi:.2f}% → {hasil_edit.roi:.2f}%, "
+                   f"total manfaat Rp {hasil.total_manfaat:,.0f} → Rp {hasil_edit.total_manfaat:,.0f}/tahun")
+    return hasil_edit
+
+def display_store_form(hasil, source, uploaded_file, profil_file, config, simulasi_aktif=False):
+    """Formulir menyimpan analisis workbook yang diunggah ke penyimpanan proyek.
+
+    hasil harus hasil workbook apa adanya; simulasi_aktif menampilkan catatan bahwa
+    suntingan what-if yang sedang ditampilkan tidak ikut disimpan.
+    """
+    with st.expander("🗄️ Simpan ke Penyimpanan Proyek"):
+        if simulasi_aktif:
+            st.caption("Suntingan what-if tidak ikut disimpan; yang disimpan adalah hasil analisis workbook asli.")
+        col1, col2 = st.columns(2)
+        ulp = col1.text_input("ULP", value=os.path.splitext(uploaded_file.name)[0], key="proyek_ulp")
+        tanggal = col2.date_input("Tanggal RAB", key="proyek_tanggal")
+        if st.button("💾 Simpan Analisis", key="proyek_simpan"):
+            if not ulp.strip():
+                st.error("ULP tidak boleh kosong.")
+                return
+            try:
+                analisis_id = get_project_store().save_analysis(
+                    hasil, source, hash_file(uploaded_file.getvalue()), uploaded_file.name, ulp.strip(), tanggal, config,
+                    hash_file(profil_file.getvalue()) if profil_file is not None else None,
+                )
+            except (sqlite3.Error, OSError) as e:
+                st.error(f"Gagal menyimpan ke penyimpanan proyek: {e}")
+                return
+            st.success(f"Analisis disimpan (ID {analisis_id}) untuk ULP {ulp.strip()} tanggal {tanggal:%d-%m-%Y}.")
+
+def display_portfolio(store):
+    """Menampilkan kueri portofolio dari penyimpanan proyek: ringkasan ULP, tren ROI, dan lokasi terburuk."""
+    st.subheader("🗄️ Portofolio Proyek")
+    df_analisis = store.analyses()
+    if df_analisis.empty:
+        st.info("Belum ada analisis tersimpan. Simpan analisis dari tampilan Analisis Workbook.")
+        return
+
+    terbaru = st.checkbox("Hanya analisis terbaru per ULP", key="portofolio_terbaru")
+    df_ulp = store.portfolio_by_ulp(terbaru)
+    total_biaya = df_ulp["Total Biaya (Rp)"].sum()
+    total_manfaat = df_ulp["Total Manfaat (Rp/tahun)"].sum()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Jumlah Analisis", f"{df_ulp['Jumlah Analisis'].sum():,}")
+    col2.metric("Total Biaya RAB", f"Rp {total_biaya:,.0f}")
+    col3.metric("Total Manfaat", f"Rp {total_manfaat:,.0f}/tahun")
+    col4.metric("ROI Portofolio", f"{(total_manfaat / total_biaya) * 100 if total_biaya > 0 else 0:.2f}%")
+    st.dataframe(df_ulp.style.format({
+        "Total Biaya (Rp)": "Rp {:,.0f}",
+        "Total Manfaat (Rp/tahun)": "Rp {:,.0f}",
+        "ROI (%)": "{:.2f}",
+    }), use_container_width=True)
+
+    df_tren = store.roi_trend()
+    if df_tren["Tanggal"].nunique() > 1:
+        fig = px.line(df_tren, x="Tanggal", y="ROI (%)", color="ULP", markers=True)
+        fig = style_figure(fig, "Tren ROI per ULP", height=400)
+        fig.update_layout(showlegend=True)
+        st.plotly_chart(fig, use_container_width=True)
+
+    st.subheader("Lokasi dengan Efisiensi Terendah")
+    col1, col2 = st.columns([3, 1])
+    ulp = col1.selectbox("ULP", ["Semua"] + df_ulp["ULP"].tolist(), key="portofolio_ulp")
+    n = int(col2.number_input("Jumlah Lokasi", min_value=1, max_value=10_000, value=STORE_WORST_LOCATIONS, key="portofolio_n"))
+    st.dataframe(store.worst_locations(n, None if ulp == "Semua" else ulp).style.format({
+        "Efisiensi (%)": "{:.2f}",
+        "Penghematan Losses (kW)": "{:.2f}",
+        "Manfaat (Rp/tahun)": "Rp {:,.0f}",
+    }), use_container_width=True)
+
+    st.subheader("Riwayat Lokasi")
+    nama_lokasi = st.text_input("Nama Lokasi", key="portofolio_lokasi")
+    if nama_lokasi:
+        df_riwayat = store.location_history(nama_lokasi)
+        if df_riwayat.empty:
+            st.info(f"Lokasi '{nama_lokasi}' tidak ditemukan di penyimpanan proyek.")
+        else:
+            st.dataframe(df_riwayat, use_container_width=True)
+
+    st.subheader("Daftar Analisis")
+    display_paginated_table(df_analisis, "proyek_analisis", format_map={
+        "Total Biaya (Rp)": "Rp {:,.0f}",
+        "Total Manfaat (Rp/tahun)": "Rp {:,.0f}",
+        "ROI (%)": "{:.2f}",
+        "Rata-rata Efisiensi (%)": "{:.2f}",
+    })
+    col1, col2 = st.columns([3, 1])
+    hapus_id = col1.selectbox("Hapus Analisis", df_analisis["ID"].tolist(), key="portofolio_hapus_id",
+                              format_func=lambda i: "{ULP} — {Tanggal} (ID {ID})".format(**df_analisis.set_index("ID", drop=False).loc[i]))
+    if col2.button("🗑️ Hapus", key="portofolio_hapus"):
+        store.delete_analysis(hapus_id)
+        st.rerun()
+
 # -------------------------------
 # LOGIKA UTAMA
 # -------------------------------
-def main():
-    """Menjalankan aplikasi utama."""
+def calculate_roi(df_rab, df_gambar):
+    """Menghitung total biaya RAB, total manfaat tahunan, dan ROI (%)."""
+    total_biaya = df_rab["Total (Rp)"].sum()
+    total_manfaat = df_gambar["Manfaat (Rp/tahun)"].sum()
+    roi = (total_manfaat / total_biaya) * 100 if total_biaya > 0 else 0
+    return total_biaya, total_manfaat, roi
+
+def analyze_frames(df_rab, df_gambar, config, df_profil=None, validasi=True):
+    """Menjalankan validasi, preprocessing, dan perhitungan losses tanpa bergantung pada UI.
+
+    Jika sheet Gambar memiliki kolom 'Segmen Induk', losses dihitung dengan beban kumulatif
+    penyulang radial. Jika df_profil diberikan dan mode profil beban aktif, manfaat dihitung dari
+    energi losses sepanjang profil. Mengembalikan (df_rab, df_gambar, peringatan, ringkasan profil atau None).
+    Melempar ValidationError (dengan laporan seluruh kesalahan) jika data tidak valid; validasi=False
+    jika data sudah diperiksa dengan validate_workbook.
+    """
+    if validasi:
+        validate_workbook(df_rab, df_gambar, config["selected_kabel"]).raise_if_invalid()
+    df_gambar, peringatan = preprocess_data(
+        df_gambar,
+        config["tipe_phase"],
+        config["rugi_trafo"],
+        config["baseline_losses"],
+        config["core_loss"],
+        config["full_load_loss"]
+    )
+    df_gambar, topologi, peringatan_topologi = apply_feeder_topology(df_gambar)
+    peringatan += peringatan_topologi
+    df_gambar, peringatan_losses = compute_losses(df_gambar, config["resistansi_kabel"], config["faktor_daya"], config["tarif_kwh"])
+    peringatan += peringatan_losses
+    if topologi is not None:
+        df_gambar = calculate_feeder_voltage_drop(df_gambar, topologi, config["resistansi_kabel"], config["faktor_daya"])
+    profil = None
+    if df_profil is not None and config.get("profil_beban", True):
+        profil = summarize_load_profile(df_profil, config["tarif_kwh"], config.get("tarif_wbp", 0))
+        df_gambar, peringatan_profil = apply_load_profile(df_gambar, profil, config["core_loss"])
+        peringatan += peringatan_profil
+    return df_rab, df_gambar, peringatan, profil
+
+def read_profile_csv(profil_file):
+    """Membaca file CSV profil beban yang diunggah terpisah dari workbook."""
+    try:
+        return pd.read_csv(io.BytesIO(profil_file.getvalue()))
+    except Exception as e:
+        raise ValidationError(f"Terjadi kesalahan saat membaca file profil beban: {e}") from e
+
+def run_analysis(uploaded_file, config, profil_file=None, diagnostics=None):
+    """Menjalankan seluruh pipeline untuk file unggahan dan mengembalikan AnalysisResult.
+
+    Profil beban dari CSV (profil_file) menggantikan sheet Profil Beban di workbook.
+    Tiap tahap dicatat ke diagnostics (Diagnostics) jika diberikan.
+    """
+    diagnostics = diagnostics if diagnostics is not None else Diagnostics()
+    with diagnostics.stage("validate_excel_file") as tahap:
+        df_rab, df_gambar, df_profil, info_muat = validate_excel_file(uploaded_file)
+        tahap["baris"] = len(df_gambar)
+    if profil_file is not None:
+        with diagnostics.stage("read_profile_csv") as tahap:
+            df_profil = read_profile_csv(profil_file)
+            tahap["baris"] = len(df_profil)
+    kolom_input = tuple(df_gambar.columns)
+    with diagnostics.stage("validate_workbook", len(df_gambar)):
+        laporan = validate_workbook(df_rab, df_gambar, config["selected_kabel"])
+    laporan.raise_if_invalid()
+    info_muat = {**info_muat, "durasi_validasi": laporan.durasi}
+    with diagnostics.stage("analyze_frames", len(df_gambar)):
+        df_rab, df_gambar, peringatan, profil = analyze_frames(df_rab, df_gambar, config, df_profil, validasi=False)
+    with diagnostics.stage("build_analysis_result", len(df_gambar)):
+        return build_analysis_result(df_rab, df_gambar, peringatan, info_muat, profil, kolom_input)
+
+def get_analysis(uploaded_file, config, profil_file=None, diagnostics=None):
+    """Mengambil AnalysisResult dari session state, cache proses, atau menghitung ulang.
+
+    Session state dikunci dengan id file unggahan dan konfigurasi sehingga interaksi widget
+    lain (misalnya pilihan lokasi) tidak memicu hashing maupun perhitungan ulang. Jika hanya
+    parameter sidebar yang berubah untuk file yang sama, hasil sebelumnya diperbarui secara
+    inkremental dengan reanalyze.
+    """
+    profil_id = profil_file.file_id if profil_file is not None else None
+    session_key = (uploaded_file.file_id, profil_id, json.dumps(config, sort_keys=True, default=str))
+    memo = st.session_state.get("analysis")
+    if memo is not None and memo[0] == session_key:
+        return memo[1]
+
+    diagnostics = diagnostics if diagnostics is not None else Diagnostics()
+    cache = get_result_cache()
+    with diagnostics.stage("hash_file"):
+        file_hash = hash_file(uploaded_file.getvalue())
+        if profil_file is not None:
+            file_hash += "+" + hash_file(profil_file.getvalue())
+    cache_key = dataset_cache_key(file_hash, config)
+    hasil = cache.get(cache_key)
+    if hasil is None and memo is not None and memo[0][:2] == session_key[:2]:
+        with diagnostics.stage("reanalyze", len(memo[1].df_gambar)):
+            hasil = reanalyze(memo[1], memo[2], config)
+        if hasil is not None:
+            cache.put(cache_key, hasil)
+    if hasil is None:
+        try:
+            hasil = cache.compute_once(cache_key, lambda: run_analysis(uploaded_file, config, profil_file, diagnostics))
+        except ValidationError as e:
+            st.error(str(e))
+            if e.laporan is not None:
+                display_validation_report(e.laporan)
+            st.stop()
+    st.session_state["analysis"] = (session_key, hasil, config)
+    return hasil
+
+def get_streaming_analysis(uploaded_file, config, profil_file=None, diagnostics=None):
+    """Mengambil StreamingResult dari session state, cache proses, atau menjalankan mode streaming.
+
+    File hasil per baris disimpan di DATA_CACHE_DIR dengan nama dari kunci cache dataset.
+    """
+    profil_id = profil_file.file_id if profil_file is not None else None
+    session_key = (uploaded_file.file_id, profil_id, json.dumps(config, sort_keys=True, default=str))
+    memo = st.session_state.get("streaming_analysis")
+    if memo is not None and memo[0] == session_key:
+        return memo[1]
+
+    cache = get_result_cache()
+    file_hash = hash_file(uploaded_file.getvalue())
+    if profil_file is not None:
+        file_hash += "+" + hash_file(profil_file.getvalue())
+    cache_key = dataset_cache_key(file_hash, config) + ":streaming"
+    hasil = cache.get(cache_key)
+    if hasil is None or (hasil.path_hasil is not None and not os.path.exists(hasil.path_hasil)):
+        try:
+            output_dir = ensure_private_dir(DATA_CACHE_DIR)
+        except OSError as e:
+            st.error(f"Mode streaming membutuhkan direktori cache yang aman: {e}")
+            st.stop()
+        output_path = os.path.join(output_dir, f"{hashlib.sha256(cache_key.encode()).hexdigest()}_hasil.parquet")
+
+        def hitung():
+            evict_data_cache()  # sediakan ruang sebelum file hasil baru ditulis
+            df_profil = read_profile_csv(profil_file) if profil_file is not None else None
+            with (diagnostics if diagnostics is not None else Diagnostics()).stage("run_streaming_analysis") as tahap:
+                hasil = run_streaming_analysis(io.BytesIO(uploaded_file.getvalue()), config, output_path, df_profil)
+                tahap["baris"] = hasil.jumlah_baris
+            return hasil
+
+        if hasil is not None:
+            cache.discard(cache_key)  # file hasil per baris sudah terhapus, hitung ulang
+        try:
+            hasil = cache.compute_once(cache_key, hitung)
+        except ValidationError as e:
+            st.error(str(e))
+            if e.laporan is not None:
+                display_validation_report(e.laporan)
+            st.stop()
+    st.session_state["streaming_analysis"] = (session_key, hasil)
+    return hasil
+
+def render_app(diagnostics):
+    """Menyusun seluruh halaman aplikasi untuk satu rerun."""
     set_background("tema2.jpg")
     set_sidebar_background("temasd1.jpg")
     display_header()
+    tampilan = st.sidebar.radio("Tampilan", ["Analisis Workbook", "Portofolio Proyek"], key="tampilan")
+    if tampilan == "Portofolio Proyek":
+        try:
+            store = get_project_store()
+        except (sqlite3.Error, OSError) as e:
+            st.error(f"Penyimpanan proyek tidak dapat dibuka ({PROJECT_STORE_PATH}): {e}")
+            return
+        with diagnostics.stage("portofolio"):
+            display_portfolio(store)
+        return
     config = configure_sidebar()
+    opsi_sensitivitas = configure_sensitivity_sidebar()
+    opsi_optimasi = configure_optimizer_sidebar()
+    mode_streaming = configure_streaming_sidebar()
     
     uploaded_file = st.file_uploader("📂 Unggah File Excel Template RAB PLN (.xlsx)", type=["xlsx"])
-    if uploaded_file:
-        df_rab, df_gambar = validate_excel_file(uploaded_file)
-        validate_columns(df_rab, df_gambar)
-        validate_numeric(df_gambar, ["Panjang Jaringan (m)", "Beban Total (kVA)", "Tegangan (V)"])
-        validate_kabel(df_gambar, config["selected_kabel"])
-        df_gambar = preprocess_data(
-            df_gambar,
-            config["tipe_phase"],
-            config["rugi_trafo"],
-            config["baseline_losses"],
-            config["core_loss"],
-            config["full_load_loss"]
-        )
-        display_results(df_rab, df_gambar, config["tarif_kwh"], config["faktor_daya"], config["resistansi_kabel"])
+    profil_file = None
+    if config["profil_beban"]:
+        profil_file = st.sidebar.file_uploader("Profil Beban (CSV)", type=["csv"],
+                                               help="Opsional, menggantikan sheet 'Profil Beban' di workbook.")
+    if uploaded_file and mode_streaming:
+        hasil = get_streaming_analysis(uploaded_file, config, profil_file, diagnostics)
+        st.sidebar.caption(f"Analisis streaming {hasil.jumlah_baris:,} baris dalam {hasil.info_muat['durasi']:.1f} detik")
+        display_streaming_results(hasil)
+        if hasil.path_hasil is not None:
+            display_store_form(hasil, hasil.path_hasil, uploaded_file, profil_file, config)
+    elif uploaded_file:
+        hasil_workbook = get_analysis(uploaded_file, config, profil_file, diagnostics)
+        with diagnostics.stage("what_if", len(hasil_workbook.df_gambar)):
+            hasil = display_what_if(hasil_workbook, config, uploaded_file.file_id)
+        stats = get_result_cache().stats()
+        st.sidebar.caption(f"Cache hasil: {stats['hits']} hit / {stats['shared_hits']} hit bersama / "
+                           f"{stats['misses']} miss ({stats['entries']} entri)")
+        st.sidebar.caption(f"Workbook dimuat dari {hasil.info_muat['sumber']} dalam {hasil.info_muat['durasi'] * 1000:.1f} ms")
+        if "durasi_validasi" in hasil.info_muat:
+            st.sidebar.caption(f"Validasi {len(hasil.df_gambar):,} baris dalam {hasil.info_muat['durasi_validasi'] * 1000:.1f} ms")
+        display_results(hasil, diagnostics)
+        # Simulasi what-if tidak disimpan atas nama workbook yang diunggah
+        display_store_form(hasil_workbook, hasil_workbook.df_gambar, uploaded_file, profil_file, config,
+                           simulasi_aktif=hasil is not hasil_workbook)
+        if opsi_sensitivitas is not None:
+            with diagnostics.stage("sensitivitas", len(hasil.df_gambar)):
+                display_sensitivity(hasil, config, opsi_sensitivitas)
+        if opsi_optimasi is not None:
+            with diagnostics.stage("optimasi_kabel", len(hasil.df_gambar)):
+                display_cable_optimization(hasil, config, opsi_optimasi)
     else:
         st.info("📥 Silakan unggah file Excel RAB PLN terlebih dahulu untuk memulai analisis.")
 
+def main():
+    """Menjalankan aplikasi utama."""
+    st.set_page_config(
+        page_title="Simulasi RAB & Efisiensi PLN",
+        layout="wide",
+        page_icon="⚡"
+    )
+    diagnostics = get_session_diagnostics()
+    # Tombol cProfile bernilai True tepat pada rerun yang dipicunya
+    profiler = cProfile.Profile() if st.session_state.get("diagnostics_profile") else None
+    opsi_diagnostik = configure_diagnostics_sidebar()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        with diagnostics.stage("rerun_total"):
+            render_app(diagnostics)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+    if opsi_diagnostik["tampilkan"] or profiler is not None:
+        display_diagnostics(diagnostics, profile_summary(profiler) if profiler is not None else None)
+
 if __name__ == "__main__":
 
     main()
@@ -0,0 +1,206 @@
+"""Analisis batch banyak workbook RAB PLN tanpa UI Streamlit.
+
+Contoh:
+    python batch_pln_analysis.py data/ULP_*.xlsx --output hasil.parquet --summary ringkasan.csv --workers 8
+    python batch_pln_analysis.py data/ --streaming --output hasil/ --summary ringkasan.csv
+"""
+import argparse
+import glob
+import hashlib
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from app_pln_analysis import (DEFAULT_CONFIG, STREAMING_CHUNK_ROWS, ValidationError, analyze_frames, calculate_roi,
+                              load_workbook, run_streaming_analysis)
+
+
+def collect_files(patterns):
+    """Mengumpulkan file .xlsx dari daftar direktori, glob, atau path file."""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            files.extend(glob.glob(os.path.join(pattern, "*.xlsx")))
+        else:
+            files.extend(glob.glob(pattern))
+    # Abaikan file lock Excel (~$nama.xlsx) dan duplikat (termasuk path yang sama dengan penulisan berbeda)
+    return sorted({os.path.normpath(f) for f in files if not os.path.basename(f).startswith("~$")})
+
+
+def analyze_file(path, config):
+    """Menganalisis satu workbook dan mengembalikan (ringkasan, DataFrame hasil atau None)."""
+    start = time.perf_counter()
+    ringkasan = {"File": path, "Status": "ok", "Pesan": "", "Jumlah Lokasi": 0, "Jumlah Baris": 0,
+                 "Total Biaya (Rp)": None, "Total Manfaat (Rp/tahun)": None, "ROI (%)": None, "Jumlah Peringatan": 0}
+    tahap = "membaca file"
+    try:
+        with open(path, "rb") as file:
+            df_rab, df_gambar, df_profil, _ = load_workbook(file.read(), cache=False)
+        tahap = "analisis"
+        df_rab, df_gambar, peringatan, _ = analyze_frames(df_rab, df_gambar, config, df_profil)
+    except ValidationError as e:
+        ringkasan.update({"Status": "gagal validasi", "Pesan": str(e),
+                          "Jumlah Kesalahan Validasi": len(e.laporan.kesalahan) if e.laporan is not None else None})
+        return ringkasan, None
+    except Exception as e:
+        ringkasan.update({"Status": "gagal", "Pesan": f"Terjadi kesalahan saat {tahap}: {e}"})
+        return ringkasan, None
+    finally:
+        ringkasan["Durasi (detik)"] = time.perf_counter() - start
+
+    total_biaya, total_manfaat, roi = calculate_roi(df_rab, df_gambar)
+    ringkasan.update({
+        "Jumlah Lokasi": df_gambar["Nama Lokasi"].nunique(dropna=False),
+        "Jumlah Baris": len(df_gambar),
+        "Total Biaya (Rp)": total_biaya,
+        "Total Manfaat (Rp/tahun)": total_manfaat,
+        "ROI (%)": roi,
+        "Jumlah Peringatan": len(peringatan),
+    })
+    df_gambar.insert(0, "File", path)
+    return ringkasan, df_gambar
+
+
+def output_name(path):
+    """Nama file hasil streaming untuk satu workbook: nama dasar ditambah hash path absolutnya."""
+    path_hash = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:12]
+    return f"{os.path.splitext(os.path.basename(path))[0]}_{path_hash}.parquet"
+
+
+def analyze_file_streaming(path, config, output_dir, chunk_rows=STREAMING_CHUNK_ROWS):
+    """Menganalisis satu workbook per potongan baris; hasil per baris ditulis ke output_dir/<nama>_<hash>.parquet.
+
+    Hash path lengkap membedakan workbook bernama sama dari direktori berbeda. Mengembalikan
+    (ringkasan, None) agar bisa dipakai run_batch tanpa menggabungkan hasil di memori.
+    """
+    start = time.perf_counter()
+    output_path = os.path.join(output_dir, output_name(path))
+    ringkasan = {"File": path, "Status": "ok", "Pesan": "", "Jumlah Lokasi": 0, "Jumlah Baris": 0,
+                 "Total Biaya (Rp)": None, "Total Manfaat (Rp/tahun)": None, "ROI (%)": None, "Jumlah Peringatan": 0,
+                 "File Hasil": None}
+    try:
+        hasil = run_streaming_analysis(path, config, output_path, chunk_rows=chunk_rows)
+    except ValidationError as e:
+        ringkasan.update({"Status": "gagal validasi", "Pesan": str(e),
+                          "Jumlah Kesalahan Validasi": len(e.laporan.kesalahan) if e.laporan is not None else None})
+        return ringkasan, None
+    except Exception as e:
+        # Kegagalan membuka workbook sudah dilaporkan run_streaming_analysis sebagai ValidationError
+        ringkasan.update({"Status": "gagal", "Pesan": f"Terjadi kesalahan saat analisis: {e}"})
+        return ringkasan, None
+    finally:
+        ringkasan["Durasi (detik)"] = time.perf_counter() - start
+
+    ringkasan.update({
+        "Jumlah Lokasi": len(hasil.ringkasan_lokasi),
+        "Jumlah Baris": hasil.jumlah_baris,
+        "Total Biaya (Rp)": hasil.total_biaya,
+        "Total Manfaat (Rp/tahun)": hasil.total_manfaat,
+        "ROI (%)": hasil.roi,
+        "Jumlah Peringatan": sum(hasil.jumlah_peringatan.values())
+                             + sum(1 for p in hasil.peringatan if p["baris"] is None),
+        "File Hasil": hasil.path_hasil,
+    })
+    return ringkasan, None
+
+
+def run_batch(files, config, workers=None, analyze=analyze_file, *args):
+    """Menganalisis banyak workbook secara paralel dengan process pool.
+
+    analyze dipanggil sebagai analyze(path, config, *args) di tiap proses.
+    Mengembalikan (DataFrame ringkasan per file, DataFrame hasil gabungan).
+    """
+    ringkasan, hasil = [], []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(analyze, path, config, *args) for path in files]
+        for future in as_completed(futures):
+            info, df = future.result()
+            ringkasan.append(info)
+            if df is not None:
+                hasil.append((info["File"], df))
+    df_ringkasan = pd.DataFrame(ringkasan).sort_values("File", ignore_index=True)
+    hasil.sort(key=lambda item: item[0])
+    df_hasil = pd.concat([df for _, df in hasil], ignore_index=True) if hasil else pd.DataFrame()
+    return df_ringkasan, df_hasil
+
+
+def write_frame(df, path):
+    """Menulis DataFrame ke CSV atau Parquet sesuai ekstensi file."""
+    if path.lower().endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def parse_args(argv=None):
+    """Membaca argumen baris perintah."""
+    parser = argparse.ArgumentParser(description="Analisis batch workbook RAB PLN (.xlsx).")
+    parser.add_argument("inputs", nargs="+", help="Direktori, pola glob, atau file .xlsx")
+    parser.add_argument("--output", default="hasil_analisis_rab_pln.parquet",
+                        help="File hasil gabungan (.parquet atau .csv)")
+    parser.add_argument("--summary", default="ringkasan_analisis_rab_pln.csv",
+                        help="File ringkasan per workbook (.csv atau .parquet)")
+    parser.add_argument("--workers", type=int, default=None, help="Jumlah proses (default: jumlah core)")
+    parser.add_argument("--tarif-kwh", type=float, default=DEFAULT_CONFIG["tarif_kwh"])
+    parser.add_argument("--faktor-daya", type=float, default=DEFAULT_CONFIG["faktor_daya"])
+    parser.add_argument("--tipe-phase", choices=["3 Phase", "1 Phase"], default=DEFAULT_CONFIG["tipe_phase"])
+    parser.add_argument("--rugi-trafo", type=float, default=DEFAULT_CONFIG["rugi_trafo"])
+    parser.add_argument("--baseline-losses", type=float, default=DEFAULT_CONFIG["baseline_losses"])
+    parser.add_argument("--core-loss", type=float, default=DEFAULT_CONFIG["core_loss"])
+    parser.add_argument("--full-load-loss", type=float, default=DEFAULT_CONFIG["full_load_loss"])
+    parser.add_argument("--tarif-wbp", type=float, default=DEFAULT_CONFIG["tarif_wbp"],
+                        help="Tarif jam 17.00-22.00 untuk mode profil beban (0 = sama dengan tarif)")
+    parser.add_argument("--tanpa-profil", action="store_true", help="Abaikan sheet Profil Beban")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Proses sheet Gambar per potongan; --output menjadi direktori hasil per workbook")
+    parser.add_argument("--chunk-rows", type=int, default=STREAMING_CHUNK_ROWS, help="Jumlah baris per potongan")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Menjalankan analisis batch dari baris perintah."""
+    args = parse_args(argv)
+    files = collect_files(args.inputs)
+    if not files:
+        print("Tidak ada file .xlsx yang ditemukan.", file=sys.stderr)
+        return 1
+
+    config = dict(DEFAULT_CONFIG)
+    config.update({
+        "tarif_kwh": args.tarif_kwh,
+        "faktor_daya": args.faktor_daya,
+        "tipe_phase": args.tipe_phase,
+        "rugi_trafo": args.rugi_trafo,
+        "baseline_losses": args.baseline_losses,
+        "core_loss": args.core_loss,
+        "full_load_loss": args.full_load_loss,
+        "tarif_wbp": args.tarif_wbp,
+        "profil_beban": not args.tanpa_profil,
+    })
+
+    start = time.perf_counter()
+    if args.streaming:
+        os.makedirs(args.output, exist_ok=True)
+        df_ringkasan, df_hasil = run_batch(files, config, args.workers, analyze_file_streaming,
+                                           args.output, args.chunk_rows)
+    else:
+        df_ringkasan, df_hasil = run_batch(files, config, args.workers)
+    durasi = time.perf_counter() - start
+
+    write_frame(df_ringkasan, args.summary)
+    if not df_hasil.empty:
+        write_frame(df_hasil, args.output)
+
+    gagal = df_ringkasan[df_ringkasan["Status"] != "ok"]
+    for _, row in gagal.iterrows():
+        print(f"[{row['Status']}] {row['File']}: {row['Pesan']}", file=sys.stderr)
+    print(f"{len(files)} file dianalisis dalam {durasi:.1f} detik "
+          f"({len(files) - len(gagal)} berhasil, {len(gagal)} gagal).")
+    return 1 if len(gagal) == len(files) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""Benchmark tahapan analisis RAB PLN dengan workbook sintetis.
+
+Contoh:
+    python benchmark_pln_analysis.py --sizes 1000 10000 100000 1000000 --output benchmark.json
+    python benchmark_pln_analysis.py --sizes 10000 --baseline benchmark.json --threshold 1.25
+    python benchmark_pln_analysis.py --generate contoh_10k.xlsx --rows 10000 --tanpa-trafo
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+import app_pln_analysis as app
+
+PHASE_OPTIONS = ["3 Phase", "1 Phase"]
+TEGANGAN_PHASE = {"3 Phase": 380.0, "1 Phase": 220.0}
+DAYA_TRAFO_OPTIONS = [50.0, 100.0, 160.0, 200.0, 250.0, 400.0]
+
+
+def parse_mix(text, names):
+    """Membaca proporsi campuran 'a,b,...' menjadi probabilitas untuk tiap nama (default merata)."""
+    if not text:
+        return np.full(len(names), 1 / len(names))
+    bobot = np.array([float(v) for v in text.split(",")], dtype=float)
+    if len(bobot) != len(names) or (bobot < 0).any() or bobot.sum() <= 0:
+        raise ValueError(f"Campuran harus berisi {len(names)} bobot non-negatif untuk {names}.")
+    return bobot / bobot.sum()
+
+
+def generate_gambar(n_rows, n_lokasi=None, kabel_mix=None, phase_mix=None, daya_trafo=True, seed=0):
+    """Membuat DataFrame sheet Gambar sintetis.
+
+    kabel_mix dan phase_mix adalah probabilitas per jenis kabel (DEFAULT_KABEL_DB, ditambah '-')
+    dan per tipe phase. n_lokasi default sama dengan n_rows (satu baris per lokasi).
+    """
+    rng = np.random.default_rng(seed)
+    kabel_names = list(app.DEFAULT_KABEL_DB) + ["-"]
+    kabel_mix = np.full(len(kabel_names), 1 / len(kabel_names)) if kabel_mix is None else kabel_mix
+    phase_mix = np.full(len(PHASE_OPTIONS), 1 / len(PHASE_OPTIONS)) if phase_mix is None else phase_mix
+    n_lokasi = n_rows if n_lokasi is None else n_lokasi
+
+    tipe_phase = rng.choice(PHASE_OPTIONS, n_rows, p=phase_mix)
+    df = pd.DataFrame({
+        "Nama Lokasi": [f"Lokasi {i:07d}" for i in rng.integers(0, n_lokasi, n_rows)],
+        "Jenis Kabel": rng.choice(kabel_names, n_rows, p=kabel_mix),
+        "Panjang Jaringan (m)": rng.uniform(20, 1500, n_rows).round(1),
+        "Beban Total (kVA)": rng.uniform(5, 200, n_rows).round(2),
+        "Tegangan (V)": np.vectorize(TEGANGAN_PHASE.get)(tipe_phase),
+        "Tipe Phase": tipe_phase,
+    })
+    if daya_trafo:
+        df["Daya Trafo (kVA)"] = rng.choice(DAYA_TRAFO_OPTIONS, n_rows)
+    return df
+
+
+def generate_rab(n_items=20, seed=0):
+    """Membuat DataFrame sheet RAB sintetis."""
+    rng = np.random.default_rng(seed)
+    volume = rng.integers(1, 50, n_items)
+    harga = rng.uniform(1e5, 5e7, n_items).round(-3)
+    return pd.DataFrame({
+        "No": np.arange(1, n_items + 1),
+        "Uraian": [f"Material {i + 1}" for i in range(n_items)],
+        "Volume": volume,
+        "Harga Satuan (Rp)": harga,
+        "Total (Rp)": volume * harga,
+    })
+
+
+def write_workbook(target, df_rab, df_gambar):
+    """Menulis workbook RAB/Gambar dengan openpyxl mode write-only (cepat untuk jutaan baris)."""
+    wb = openpyxl.Workbook(write_only=True)
+    for sheet, df in (("RAB", df_rab), ("Gambar", df_gambar)):
+        ws = wb.create_sheet(sheet)
+        ws.append(list(df.columns))
+        for row in df.itertuples(index=False, name=None):
+            ws.append([v.item() if isinstance(v, np.generic) else v for v in row])
+    wb.save(target)
+
+
+def workbook_bytes(df_rab, df_gambar):
+    """Mengembalikan isi workbook sintetis sebagai bytes."""
+    buffer = io.BytesIO()
+    write_workbook(buffer, df_rab, df_gambar)
+    return buffer.getvalue()
+
+
+def time_stage(fn, repeat):
+    """Menjalankan fn sebanyak repeat kali; mengembalikan (hasil terakhir, daftar durasi detik)."""
+    durasi = []
+    hasil = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        hasil = fn()
+        durasi.append(time.perf_counter() - start)
+    return hasil, durasi
+
+
+def benchmark_size(n_rows, config, repeat=3, seed=0, **gambar_options):
+    """Mengukur tiap tahapan pipeline untuk satu ukuran workbook dan mengembalikan daftar record."""
+    df_gambar_src = generate_gambar(n_rows, seed=seed, **gambar_options)
+    start = time.perf_counter()
+    file_bytes = workbook_bytes(generate_rab(seed=seed), df_gambar_src)
+    durasi_tulis = time.perf_counter() - start
+    del df_gambar_src
+
+    records = []
+
+    def record(stage, durasi, rows):
+        records.append({
+            "rows": n_rows,
+            "stage": stage,
+            "repeat": len(durasi),
+            "min_s": min(durasi),
+            "median_s": statistics.median(durasi),
+            "rows_per_s": rows / min(durasi) if min(durasi) > 0 else None,
+        })
+
+    record("generate_workbook", [durasi_tulis], n_rows)
+    cache_dir = app.DATA_CACHE_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        app.DATA_CACHE_DIR = tmp
+        try:
+            # Cold: parsing Excel (cache dikosongkan tiap ulangan); warm: dari cache Parquet
+            def cold():
+                for name in os.listdir(tmp):
+                    os.remove(os.path.join(tmp, name))
+                return app.validate_excel_file(io.BytesIO(file_bytes))
+            _, durasi = time_stage(cold, repeat)
+            record("validate_excel_file_cold", durasi, n_rows)
+            (df_rab, df_gambar, df_profil, _), durasi = time_stage(lambda: app.validate_excel_file(io.BytesIO(file_bytes)), repeat)
+            record("validate_excel_file_warm", durasi, n_rows)
+        finally:
+            app.DATA_CACHE_DIR = cache_dir
+
+    _, durasi = time_stage(lambda: app.validate_workbook(df_rab, df_gambar, config["selected_kabel"]), repeat)
+    record("validate_workbook", durasi, n_rows)
+    _, durasi = time_stage(lambda: app.validate_columns(df_rab, df_gambar), repeat)
+    record("validate_columns", durasi, n_rows)
+    _, durasi = time_stage(lambda: app.validate_numeric(
+        df_gambar, ["Panjang Jaringan (m)", "Beban Total (kVA)", "Tegangan (V)"]), repeat)
+    record("validate_numeric", durasi, n_rows)
+    _, durasi = time_stage(lambda: app.validate_kabel(df_gambar, config["selected_kabel"]), repeat)
+    record("validate_kabel", durasi, n_rows)
+    (df_pre, _), durasi = time_stage(lambda: app.preprocess_data(
+        df_gambar, config["tipe_phase"], config["rugi_trafo"], config["baseline_losses"],
+        config["core_loss"], config["full_load_loss"]), repeat)
+    record("preprocess_data", durasi, n_rows)
+    (df_hasil, _), durasi = time_stage(lambda: app.compute_losses(
+        df_pre, config["resistansi_kabel"], config["faktor_daya"], config["tarif_kwh"]), repeat)
+    record("compute_losses", durasi, n_rows)
+    _, durasi = time_stage(lambda: app.build_analysis_result(df_rab, df_hasil, [], {}), repeat)
+    record("build_analysis_result", durasi, n_rows)
+    _, durasi = time_stage(lambda: df_hasil.to_csv(index=False), repeat)
+    record("csv_export", durasi, n_rows)
+    return records
+
+
+def compare_baseline(records, baseline_records, threshold):
+    """Mengembalikan record yang median-nya lebih lambat dari baseline × threshold."""
+    baseline = {(r["rows"], r["stage"]): r for r in baseline_records}
+    regresi = []
+    for r in records:
+        dasar = baseline.get((r["rows"], r["stage"]))
+        if dasar is not None and dasar["median_s"] > 0 and r["median_s"] > dasar["median_s"] * threshold:
+            regresi.append({**r, "baseline_median_s": dasar["median_s"], "rasio": r["median_s"] / dasar["median_s"]})
+    return regresi
+
+
+def parse_args(argv=None):
+    """Membaca argumen baris perintah."""
+    parser = argparse.ArgumentParser(description="Benchmark tahapan analisis RAB PLN dengan workbook sintetis.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000],
+                        help="Jumlah baris sheet Gambar yang diukur")
+    parser.add_argument("--repeat", type=int, default=3, help="Jumlah ulangan per tahapan")
+    parser.add_argument("--lokasi", type=int, default=None, help="Jumlah lokasi unik (default: satu per baris)")
+    parser.add_argument("--kabel-mix", default=None,
+                        help=f"Bobot jenis kabel {list(app.DEFAULT_KABEL_DB) + ['-']}, misalnya '2,1,1'")
+    parser.add_argument("--phase-mix", default=None, help=f"Bobot tipe phase {PHASE_OPTIONS}, misalnya '3,1'")
+    parser.add_argument("--tanpa-trafo", action="store_true", help="Tanpa kolom Daya Trafo (kVA)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="File hasil JSON (default: stdout)")
+    parser.add_argument("--baseline", default=None, help="File JSON hasil sebelumnya untuk deteksi regresi")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Rasio median terhadap baseline yang dianggap regresi")
+    parser.add_argument("--generate", default=None, help="Hanya tulis workbook sintetis ke path ini lalu keluar")
+    parser.add_argument("--rows", type=int, default=10000, help="Jumlah baris untuk --generate")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Menjalankan benchmark dari baris perintah."""
+    args = parse_args(argv)
+    gambar_options = {
+        "n_lokasi": args.lokasi,
+        "kabel_mix": parse_mix(args.kabel_mix, list(app.DEFAULT_KABEL_DB) + ["-"]),
+        "phase_mix": parse_mix(args.phase_mix, PHASE_OPTIONS),
+        "daya_trafo": not args.tanpa_trafo,
+    }
+
+    if args.generate:
+        write_workbook(args.generate, generate_rab(seed=args.seed),
+                       generate_gambar(args.rows, seed=args.seed, **gambar_options))
+        print(f"Workbook sintetis {args.rows:,} baris ditulis ke {args.generate}.")
+        return 0
+
+    config = dict(app.DEFAULT_CONFIG)
+    records = []
+    for n_rows in args.sizes:
+        hasil = benchmark_size(n_rows, config, args.repeat, args.seed, **gambar_options)
+        records.extend(hasil)
+        for r in hasil:
+            print(f"{r['rows']:>9,} baris  {r['stage']:<26} {r['median_s'] * 1000:>10.1f} ms", file=sys.stderr)
+
+    laporan = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "options": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "generate", "rows")},
+        "results": records,
+    }
+    regresi = []
+    if args.baseline:
+        with open(args.baseline) as file:
+            regresi = compare_baseline(records, json.load(file)["results"], args.threshold)
+        laporan["regressions"] = regresi
+        for r in regresi:
+            print(f"REGRESI {r['rows']:,} baris {r['stage']}: {r['median_s'] * 1000:.1f} ms "
+                  f"({r['rasio']:.2f}× baseline)", file=sys.stderr)
+
+    teks = json.dumps(laporan, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(teks)
+    else:
+        print(teks)
+    return 1 if regresi else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
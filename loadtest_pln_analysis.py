@@ -0,0 +1,165 @@
+"""Uji beban cache hasil bersama dengan banyak pengguna simulasi di beberapa proses server.
+
+Tiap proses mensimulasikan satu server Streamlit (cache memori sendiri); tiap thread di dalamnya
+adalah satu pengguna yang berulang kali mengunggah salah satu workbook dengan salah satu konfigurasi.
+Mode 'lokal' hanya memakai cache memori per proses, mode 'bersama' menambahkan SharedResultCache
+di direktori yang sama untuk seluruh proses.
+
+Contoh:
+    python loadtest_pln_analysis.py --users 16 --processes 4 --requests 10 --rows 20000
+    python loadtest_pln_analysis.py --users 32 --processes 8 --workbooks 3 --configs 2 --output beban.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+import app_pln_analysis as app
+from benchmark_pln_analysis import generate_gambar, generate_rab, workbook_bytes
+
+MODES = ["lokal", "bersama"]
+
+
+def build_configs(n_configs):
+    """Membuat n_configs konfigurasi sidebar yang berbeda tarif listriknya."""
+    return [{**app.DEFAULT_CONFIG, "tarif_kwh": app.DEFAULT_CONFIG["tarif_kwh"] + 100 * i} for i in range(n_configs)]
+
+
+def run_server(indeks, workbook_paths, configs, n_users, n_requests, data_dir, shared_dir, seed):
+    """Menjalankan satu proses server dengan n_users pengguna serentak; mengembalikan latensi dan statistik."""
+    app.DATA_CACHE_DIR = data_dir
+    cache = app.ResultCache(shared=app.SharedResultCache(shared_dir) if shared_dir else None)
+    workbooks = []
+    for path in workbook_paths:
+        with open(path, "rb") as file:
+            workbooks.append(file.read())
+    dihitung = []
+    lock = threading.Lock()
+
+    def request(file_bytes, config):
+        """Satu unggahan: alur yang sama dengan get_analysis tanpa session state."""
+        cache_key = app.dataset_cache_key(app.hash_file(file_bytes), config)
+        hasil = cache.get(cache_key)
+        if hasil is None:
+            def hitung():
+                with lock:
+                    dihitung.append(cache_key)
+                return app.run_analysis(io.BytesIO(file_bytes), config)
+            hasil = cache.compute_once(cache_key, hitung)
+        return hasil
+
+    def user(nomor):
+        """Satu pengguna simulasi: n_requests unggahan acak berurutan."""
+        rng = np.random.default_rng([seed, indeks, nomor])
+        latensi = []
+        for _ in range(n_requests):
+            file_bytes = workbooks[rng.integers(len(workbooks))]
+            config = configs[rng.integers(len(configs))]
+            start = time.perf_counter()
+            request(file_bytes, config)
+            latensi.append(time.perf_counter() - start)
+        return latensi
+
+    with ThreadPoolExecutor(max_workers=max(n_users, 1)) as executor:
+        latensi = [d for hasil in executor.map(user, range(n_users)) for d in hasil]
+    return {"latensi": latensi, "dihitung": len(dihitung), "stats": cache.stats()}
+
+
+def run_mode(mode, workbook_paths, configs, args, tmp):
+    """Menjalankan seluruh proses server untuk satu mode cache dan merangkum hasilnya."""
+    data_dir = os.path.join(tmp, mode, "data")
+    shared_dir = os.path.join(tmp, mode, "hasil") if mode == "bersama" else None
+    pengguna = [args.users // args.processes + (i < args.users % args.processes) for i in range(args.processes)]
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.processes) as executor:
+        futures = [executor.submit(run_server, i, workbook_paths, configs, n, args.requests, data_dir, shared_dir, args.seed)
+                   for i, n in enumerate(pengguna) if n]
+        hasil = [f.result() for f in futures]
+    durasi = time.perf_counter() - start
+
+    latensi = sorted(d for h in hasil for d in h["latensi"])
+    stats = [h["stats"] for h in hasil]
+    return {
+        "mode": mode,
+        "users": args.users,
+        "processes": args.processes,
+        "requests": len(latensi),
+        "durasi_s": durasi,
+        "throughput_rps": len(latensi) / durasi if durasi > 0 else None,
+        "latensi_p50_ms": statistics.median(latensi) * 1000,
+        "latensi_p95_ms": latensi[int(0.95 * (len(latensi) - 1))] * 1000,
+        "latensi_max_ms": latensi[-1] * 1000,
+        "dihitung": sum(h["dihitung"] for h in hasil),
+        "hits": sum(s["hits"] for s in stats),
+        "shared_hits": sum(s["shared_hits"] for s in stats),
+        "misses": sum(s["misses"] for s in stats),
+        "shared_cache": app.SharedResultCache(shared_dir).stats() if shared_dir else None,
+    }
+
+
+def parse_args(argv=None):
+    """Membaca argumen baris perintah."""
+    parser = argparse.ArgumentParser(description="Uji beban cache hasil analisis RAB PLN dengan pengguna simulasi.")
+    parser.add_argument("--users", type=int, default=16, help="Jumlah pengguna serentak (total semua proses)")
+    parser.add_argument("--processes", type=int, default=4, help="Jumlah proses server simulasi")
+    parser.add_argument("--requests", type=int, default=10, help="Jumlah unggahan per pengguna")
+    parser.add_argument("--rows", type=int, default=20000, help="Jumlah baris sheet Gambar per workbook")
+    parser.add_argument("--workbooks", type=int, default=2, help="Jumlah workbook berbeda yang diunggah")
+    parser.add_argument("--configs", type=int, default=2, help="Jumlah konfigurasi sidebar berbeda")
+    parser.add_argument("--mode", choices=MODES + ["keduanya"], default="keduanya")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="File hasil JSON (default: stdout)")
+    args = parser.parse_args(argv)
+    if args.users < 1 or args.processes < 1:
+        parser.error("--users dan --processes harus minimal 1.")
+    args.processes = min(args.processes, args.users)
+    return args
+
+
+def main(argv=None):
+    """Menjalankan uji beban dari baris perintah."""
+    args = parse_args(argv)
+    configs = build_configs(args.configs)
+    records = []
+    with tempfile.TemporaryDirectory() as tmp:
+        workbook_paths = []
+        for i in range(args.workbooks):
+            path = os.path.join(tmp, f"workbook_{i}.xlsx")
+            with open(path, "wb") as file:
+                file.write(workbook_bytes(generate_rab(seed=args.seed + i), generate_gambar(args.rows, seed=args.seed + i)))
+            workbook_paths.append(path)
+        for mode in (MODES if args.mode == "keduanya" else [args.mode]):
+            r = run_mode(mode, workbook_paths, configs, args, tmp)
+            records.append(r)
+            print(f"{mode:<8} {r['requests']:>6} permintaan  {r['throughput_rps']:>8.1f} permintaan/detik  "
+                  f"p50 {r['latensi_p50_ms']:>8.1f} ms  p95 {r['latensi_p95_ms']:>8.1f} ms  "
+                  f"{r['dihitung']} kali dihitung", file=sys.stderr)
+
+    laporan = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": {k: v for k, v in vars(args).items() if k != "output"},
+        "results": records,
+    }
+    teks = json.dumps(laporan, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(teks)
+    else:
+        print(teks)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,23 @@
+"""Fixture bersama untuk pengujian analisis RAB PLN dengan workbook sintetis."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app_pln_analysis as app  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Mengarahkan cache Parquet dan cache hasil bersama ke direktori sementara per pengujian."""
+    monkeypatch.setattr(app, "DATA_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(app, "SHARED_CACHE_DIR", str(tmp_path / "cache" / "hasil"))
+    return tmp_path / "cache"
+
+
+@pytest.fixture
+def config():
+    """Konfigurasi sidebar default."""
+    return dict(app.DEFAULT_CONFIG)
@@ -0,0 +1,87 @@
+"""Pengujian ringkasan per workbook pada analisis batch."""
+import os
+
+import openpyxl
+import pytest
+
+import app_pln_analysis as app
+from batch_pln_analysis import analyze_file, analyze_file_streaming
+from benchmark_pln_analysis import generate_gambar, generate_rab, workbook_bytes
+
+
+@pytest.fixture
+def workbook_path(tmp_path):
+    """Workbook dengan 200 baris di 30 lokasi."""
+    def tulis(df_gambar, nama="ulp.xlsx"):
+        path = tmp_path / nama
+        path.write_bytes(workbook_bytes(generate_rab(), df_gambar))
+        return str(path)
+    return tulis
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_summary_counts_locations_and_rows(workbook_path, config, tmp_path, streaming):
+    df_gambar = generate_gambar(200, n_lokasi=30, seed=3)
+    path = workbook_path(df_gambar)
+
+    if streaming:
+        ringkasan, _ = analyze_file_streaming(path, config, str(tmp_path), chunk_rows=64)
+    else:
+        ringkasan, _ = analyze_file(path, config)
+
+    assert ringkasan["Status"] == "ok"
+    assert ringkasan["Jumlah Lokasi"] == df_gambar["Nama Lokasi"].nunique()
+    assert ringkasan["Jumlah Baris"] == 200
+
+
+def test_validation_error_is_reported_as_is(workbook_path, config):
+    df_gambar = generate_gambar(20, seed=4)
+    df_gambar.loc[3, "Beban Total (kVA)"] = -5.0
+
+    ringkasan, df = analyze_file(workbook_path(df_gambar), config)
+
+    assert df is None
+    assert ringkasan["Status"] == "gagal validasi"
+    assert ringkasan["Pesan"].startswith("Validasi gagal")
+    assert ringkasan["Jumlah Kesalahan Validasi"] == 1
+
+
+def test_unreadable_file_is_reported_as_read_error(tmp_path, config):
+    path = tmp_path / "rusak.xlsx"
+    path.write_bytes(b"bukan workbook")
+
+    ringkasan, _ = analyze_file(str(path), config)
+
+    assert ringkasan["Status"] == "gagal"
+    assert ringkasan["Pesan"].startswith("Terjadi kesalahan saat membaca file")
+
+
+def test_missing_sheet_is_validation_error(tmp_path, config):
+    path = tmp_path / "tanpa_gambar.xlsx"
+    wb = openpyxl.Workbook()
+    wb.active.title = "RAB"
+    wb.save(path)
+
+    ringkasan, _ = analyze_file(str(path), config)
+
+    assert ringkasan["Status"] == "gagal validasi"
+    assert ringkasan["Pesan"] == f"File Excel harus memiliki sheet: {app.REQUIRED_SHEETS}."
+
+
+def test_same_basename_in_different_directories(tmp_path, config):
+    df_gambar = generate_gambar(30, seed=6)
+    paths = []
+    for sub in ("a", "b"):
+        (tmp_path / sub).mkdir()
+        path = tmp_path / sub / "ULP.xlsx"
+        path.write_bytes(workbook_bytes(generate_rab(), df_gambar))
+        paths.append(str(path))
+    output_dir = tmp_path / "hasil"
+    output_dir.mkdir()
+
+    hasil_streaming = [analyze_file_streaming(p, config, str(output_dir))[0]["File Hasil"] for p in paths]
+    hasil_penuh = [analyze_file(p, config)[1]["File"].unique().tolist() for p in paths]
+
+    assert hasil_streaming[0] != hasil_streaming[1]
+    assert all(os.path.exists(p) for p in hasil_streaming)
+    assert hasil_penuh == [[paths[0]], [paths[1]]]
@@ -0,0 +1,80 @@
+"""Pengujian cache Parquet workbook dan cache hasil bersama: kepemilikan direktori, eviksi, dan mode tanpa cache."""
+import os
+import pickle
+import time
+
+import pytest
+
+import app_pln_analysis as app
+from benchmark_pln_analysis import generate_gambar, generate_rab, workbook_bytes
+
+
+def workbook(seed):
+    """Isi workbook sintetis kecil."""
+    return workbook_bytes(generate_rab(seed=seed), generate_gambar(50, seed=seed))
+
+
+def test_load_workbook_uses_private_cache(cache_dir):
+    data = workbook(0)
+
+    assert app.load_workbook(data)[3]["sumber"] == "excel"
+    assert app.load_workbook(data)[3]["sumber"] == "cache"
+    assert os.stat(cache_dir).st_mode & 0o777 == 0o700
+
+
+def test_load_workbook_without_cache_writes_nothing(cache_dir):
+    _, df_gambar, _, info = app.load_workbook(workbook(0), cache=False)
+
+    assert info["sumber"] == "excel"
+    assert len(df_gambar) == 50
+    assert not cache_dir.exists()
+
+
+def test_load_workbook_refuses_shared_cache_dir(cache_dir):
+    cache_dir.mkdir(mode=0o777)
+    os.chmod(cache_dir, 0o777)
+
+    with pytest.raises(PermissionError):
+        app.ensure_private_dir(str(cache_dir))
+    assert app.load_workbook(workbook(0))[3]["sumber"] == "excel"
+    assert os.listdir(cache_dir) == []
+
+
+def test_evict_data_cache_removes_least_recently_used_workbook(cache_dir, monkeypatch):
+    lama, baru = workbook(0), workbook(1)
+    app.load_workbook(lama)
+    lampau = time.time() - 60
+    for path in app._cache_paths(app.hash_file(lama)):
+        if os.path.exists(path):
+            os.utime(path, (lampau, lampau))
+    app.load_workbook(baru)
+    ukuran_baru = sum(os.path.getsize(p) for p in app._cache_paths(app.hash_file(baru)) if os.path.exists(p))
+    monkeypatch.setattr(app, "DATA_CACHE_MAX_MB", ukuran_baru / (1024 * 1024))
+
+    app.evict_data_cache()
+
+    assert not any(os.path.exists(p) for p in app._cache_paths(app.hash_file(lama)))
+    assert app.load_workbook(baru)[3]["sumber"] == "cache"
+
+
+def test_shared_cache_round_trip_in_private_dir(tmp_path):
+    cache = app.SharedResultCache(str(tmp_path / "hasil"))
+
+    cache.put("kunci", {"roi": 12.5})
+
+    assert cache.get("kunci") == {"roi": 12.5}
+    assert os.stat(tmp_path / "hasil").st_mode & 0o777 == 0o700
+
+
+def test_shared_cache_ignores_pickle_in_world_writable_dir(tmp_path):
+    direktori = tmp_path / "hasil"
+    direktori.mkdir()
+    os.chmod(direktori, 0o777)
+    cache = app.SharedResultCache(str(direktori))
+    with open(cache._path("kunci"), "wb") as file:
+        pickle.dump({"roi": 99.0}, file)
+
+    assert cache.get("kunci") is None
+    cache.put("lain", {"roi": 1.0})
+    assert not os.path.exists(cache._path("lain"))
+    assert cache.stats()["misses"] == 1
@@ -0,0 +1,48 @@
+"""Pengujian ekspor CSV, Parquet, dan XLSX hasil analisis."""
+import io
+
+import openpyxl
+import pandas as pd
+import pytest
+
+import app_pln_analysis as app
+
+
+@pytest.fixture(params=["frame", "parquet"])
+def source(request, tmp_path):
+    """Pembuat sumber ekspor: DataFrame (mode penuh) atau path Parquet (mode streaming)."""
+    def buat(df):
+        if request.param == "frame":
+            return df
+        path = tmp_path / "hasil.parquet"
+        df.to_parquet(path, index=False)
+        return str(path)
+    return buat
+
+
+def hasil_frame(n):
+    """DataFrame hasil kecil dengan kolom teks dan angka."""
+    return pd.DataFrame({"Nama Lokasi": [f"Lokasi {i}" for i in range(n)], "Efisiensi (%)": [97.5] * n})
+
+
+@pytest.mark.parametrize("n", [0, 5])
+def test_csv_export_has_header(source, n):
+    buffer = io.BytesIO()
+
+    app.write_csv_export(source(hasil_frame(n)), buffer, chunk_rows=2)
+
+    df = pd.read_csv(io.BytesIO(buffer.getvalue()))
+    assert list(df.columns) == ["Nama Lokasi", "Efisiensi (%)"]
+    assert len(df) == n
+
+
+@pytest.mark.parametrize("n", [0, 5])
+def test_xlsx_export_has_header(source, n):
+    buffer = io.BytesIO()
+
+    app.write_xlsx_report(source(hasil_frame(n)), buffer, [("Lokasi", "Semua")], chunk_rows=2)
+
+    ws = openpyxl.load_workbook(io.BytesIO(buffer.getvalue()), read_only=True)["Analisis"]
+    rows = list(ws.iter_rows(values_only=True))
+    assert rows[0] == ("Nama Lokasi", "Efisiensi (%)")
+    assert len(rows) == n + 1
@@ -0,0 +1,122 @@
+"""Pengujian analisis inkremental (reanalyze dan update_rows) terhadap run_analysis penuh."""
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app_pln_analysis as app
+from benchmark_pln_analysis import generate_gambar, generate_rab, workbook_bytes
+
+N_ROWS = 2000
+N_LOKASI = 300
+MODES = ["polos", "daya_trafo", "profil_beban"]
+PERUBAHAN_PARAMETER = [
+    {"tarif_kwh": 1700},
+    {"faktor_daya": 0.9},
+    {"tarif_wbp": 2500},
+    {"core_loss": 0.35},
+    {"full_load_loss": 1.4, "baseline_losses": 7.0},
+    {"rugi_trafo": 0.9},
+    {"tarif_kwh": 1200, "tarif_wbp": 2000, "faktor_daya": 0.7},
+    {"resistansi_kabel": {k: v * 1.3 for k, v in app.DEFAULT_KABEL_DB.items()}},
+]
+
+
+class Unggahan(io.BytesIO):
+    """Pengganti file unggahan Streamlit untuk run_analysis."""
+
+
+def make_dataset(mode):
+    """Mengembalikan (df_rab, df_gambar, bytes CSV profil atau None) untuk satu mode analisis."""
+    df_gambar = generate_gambar(N_ROWS, n_lokasi=N_LOKASI, daya_trafo=mode == "daya_trafo", seed=1)
+    df_gambar.loc[5, "Beban Total (kVA)"] = 190.0
+    profil = None
+    if mode == "profil_beban":
+        rng = np.random.default_rng(0)
+        df_profil = pd.DataFrame({"Waktu": pd.date_range("2024-01-01", periods=24 * 7, freq="h").astype(str)})
+        for i in range(0, N_LOKASI, 7):
+            df_profil[f"Lokasi {i:07d}"] = rng.random(len(df_profil))
+        df_profil["Default"] = 0.6
+        profil = df_profil.to_csv(index=False).encode()
+    return generate_rab(), df_gambar, profil
+
+
+def run_full(df_rab, df_gambar, profil, config):
+    """Analisis penuh dari workbook (dan CSV profil) seperti saat diunggah di aplikasi."""
+    return app.run_analysis(Unggahan(workbook_bytes(df_rab, df_gambar)), config,
+                            Unggahan(profil) if profil is not None else None)
+
+
+def assert_same_result(hasil, acuan):
+    """Membandingkan seluruh nilai turunan dua AnalysisResult."""
+    assert list(hasil.df_gambar.columns) == list(acuan.df_gambar.columns)
+    for kolom in hasil.df_gambar.columns:
+        x, y = hasil.df_gambar[kolom], acuan.df_gambar[kolom]
+        if pd.api.types.is_numeric_dtype(x):
+            np.testing.assert_allclose(x.to_numpy(float), y.to_numpy(float), rtol=1e-9, err_msg=kolom)
+        else:
+            assert (x.astype(str).to_numpy() == y.astype(str).to_numpy()).all(), kolom
+    assert hasil.total_biaya == pytest.approx(acuan.total_biaya, rel=1e-9)
+    assert hasil.total_manfaat == pytest.approx(acuan.total_manfaat, rel=1e-9)
+    assert hasil.roi == pytest.approx(acuan.roi, rel=1e-9)
+    assert hasil.rata_rata_semua == pytest.approx(acuan.rata_rata_semua, rel=1e-9)
+    pd.testing.assert_frame_equal(hasil.ringkasan_lokasi.sort_index(), acuan.ringkasan_lokasi.sort_index(),
+                                  rtol=1e-9, check_dtype=False)
+    assert hasil.efisiensi_di_luar_rentang == acuan.efisiensi_di_luar_rentang
+    assert sorted((p["kode"], str(p["baris"])) for p in hasil.peringatan) == \
+        sorted((p["kode"], str(p["baris"])) for p in acuan.peringatan)
+    assert hasil.jumlah_tanpa_profil == acuan.jumlah_tanpa_profil
+    assert hasil.conclusion() == acuan.conclusion()
+
+
+@pytest.fixture(scope="module", params=MODES)
+def dataset(request):
+    """Dataset dan hasil analisis penuh dengan config default untuk satu mode."""
+    df_rab, df_gambar, profil = make_dataset(request.param)
+    config = dict(app.DEFAULT_CONFIG)
+    return df_rab, df_gambar, profil, config, run_full(df_rab, df_gambar, profil, config)
+
+
+@pytest.mark.parametrize("ubah", PERUBAHAN_PARAMETER, ids=lambda u: "+".join(u))
+def test_reanalyze_matches_full_run(dataset, ubah):
+    df_rab, df_gambar, profil, config, hasil = dataset
+    config_baru = {**config, **ubah}
+
+    hasil_baru = app.reanalyze(hasil, config, config_baru)
+
+    assert hasil_baru is not None
+    assert_same_result(hasil_baru, run_full(df_rab, df_gambar, profil, config_baru))
+
+
+def test_reanalyze_requires_full_run_for_phase_change(dataset):
+    _, _, _, config, hasil = dataset
+    assert app.reanalyze(hasil, config, {**config, "tipe_phase": "1 Phase"}) is None
+
+
+def test_update_rows_matches_full_run(dataset):
+    df_rab, df_gambar, profil, config, hasil = dataset
+    baris = [3, 5, 100, 101, N_ROWS - 1]
+    perubahan = pd.DataFrame({
+        "Beban Total (kVA)": [10.5, 40.0, 150.0, 2.0, 99.9],
+        "Jenis Kabel": ["-", "-", list(app.DEFAULT_KABEL_DB)[0], "-", "-"],
+    }, index=baris)
+    df_diedit = df_gambar.copy()
+    df_diedit.loc[baris, perubahan.columns] = perubahan
+
+    hasil_baru = app.update_rows(hasil, config, perubahan)
+
+    assert_same_result(hasil_baru, run_full(df_rab, df_diedit, profil, config))
+    # Parameter yang berubah setelah edit baris tetap setara dengan analisis penuh
+    config_baru = {**config, "faktor_daya": 0.85, "tarif_wbp": 3000}
+    assert_same_result(app.reanalyze(hasil_baru, config, config_baru),
+                       run_full(df_rab, df_diedit, profil, config_baru))
+
+
+def test_update_rows_renames_location(dataset):
+    df_rab, df_gambar, profil, config, hasil = dataset
+    perubahan = pd.DataFrame({"Nama Lokasi": ["Lokasi 0000007", "Lokasi Baru"]}, index=[0, 1])
+    df_diedit = df_gambar.copy()
+    df_diedit.loc[[0, 1], "Nama Lokasi"] = perubahan["Nama Lokasi"]
+
+    assert_same_result(app.update_rows(hasil, config, perubahan), run_full(df_rab, df_diedit, profil, config))
@@ -0,0 +1,101 @@
+"""Pengujian mesin losses vektor terhadap rumus per baris aslinya."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import app_pln_analysis as app
+
+RESISTANSI = {"Kabel A": 0.443, "Kabel B": 0.253, "Kabel C": 0.641}
+
+
+def conductor_loss(row, resistansi_kabel):
+    """Rumus per baris asli: tipe phase dibandingkan huruf besar, kabel tak dikenal memakai kabel pertama."""
+    jenis = row.get("Jenis Kabel", "-")
+    beban, tegangan = row["Beban Total (kVA)"], row["Tegangan (V)"]
+    if beban <= 0 or tegangan <= 0:
+        return 0.0
+    if jenis not in resistansi_kabel:
+        jenis = list(resistansi_kabel)[0]
+    r = resistansi_kabel[jenis] * (row["Panjang Jaringan (m)"] / 1000)
+    i = (beban * 1000) / (np.sqrt(3) * tegangan if row["Tipe Phase"].upper() == "3 PHASE" else tegangan)
+    return (i ** 2) * r / 1000
+
+
+def recommend_cable(row, resistansi_kabel):
+    """Rumus per baris asli: tipe phase dibandingkan persis dengan '3 Phase'."""
+    beban, tegangan = row["Beban Total (kVA)"], np.float64(row["Tegangan (V)"])  # tegangan 0 -> arus inf
+    if beban <= 0:
+        return "-"
+    i = (beban * 1000) / (np.sqrt(3) * tegangan if row["Tipe Phase"] == "3 Phase" else tegangan)
+    losses = {jenis: (i ** 2) * resistansi * (row["Panjang Jaringan (m)"] / 1000) / 1000
+              for jenis, resistansi in resistansi_kabel.items()}
+    return min(losses, key=losses.get)
+
+
+def efficiency(losses_total, beban, faktor_daya):
+    """Rumus per baris asli efisiensi sistem (%)."""
+    if beban <= 0 or faktor_daya <= 0:
+        return 0.0
+    return 100 * (1 - losses_total / (beban * faktor_daya))
+
+
+@pytest.fixture
+def df_gambar():
+    """3.000 baris acak: kedua tipe phase (termasuk huruf kecil), kabel tak dikenal, beban/tegangan <= 0."""
+    rng = np.random.default_rng(7)
+    n = 3000
+    df = pd.DataFrame({
+        "Nama Lokasi": [f"Lokasi {i % 97}" for i in range(n)],
+        "Jenis Kabel": rng.choice(list(RESISTANSI) + ["Kabel X", "-"], n),
+        "Panjang Jaringan (m)": rng.uniform(0, 2000, n),
+        "Beban Total (kVA)": rng.uniform(-20, 200, n),
+        "Tegangan (V)": rng.choice([380.0, 220.0, 0.0, -5.0], n, p=[0.6, 0.3, 0.05, 0.05]),
+        "Tipe Phase": rng.choice(["3 Phase", "1 Phase", "3 phase", "1 phase"], n),
+        "Rugi Trafo (kW)": rng.uniform(0, 3, n),
+        "Baseline Losses (kW)": 5.0,
+    })
+    df.loc[:9, "Beban Total (kVA)"] = 0.0
+    return df
+
+
+def test_compute_losses_matches_row_formulas(df_gambar):
+    faktor_daya, tarif = 0.85, 1500
+
+    df_hasil, peringatan = app.compute_losses(df_gambar, RESISTANSI, faktor_daya, tarif)
+
+    rows = [row for _, row in df_gambar.iterrows()]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        konduktor = np.array([conductor_loss(row, RESISTANSI) for row in rows])
+        rekomendasi = [recommend_cable(row, RESISTANSI) for row in rows]
+    total = konduktor + df_gambar["Rugi Trafo (kW)"].to_numpy()
+    np.testing.assert_allclose(df_hasil["Losses Konduktor (kW)"], konduktor, rtol=1e-12)
+    np.testing.assert_allclose(df_hasil["Losses Total (kW)"], total, rtol=1e-12)
+    np.testing.assert_allclose(df_hasil["Efisiensi (%)"],
+                               [efficiency(t, row["Beban Total (kVA)"], faktor_daya) for t, row in zip(total, rows)],
+                               rtol=1e-12)
+    assert df_hasil["Rekomendasi Kabel"].tolist() == rekomendasi
+    tidak_dikenal = {p["baris"] for p in peringatan if p["kode"] == "kabel_tidak_dikenali"}
+    dikenal = df_gambar["Jenis Kabel"].isin(list(RESISTANSI))
+    valid = (df_gambar["Beban Total (kVA)"] > 0) & (df_gambar["Tegangan (V)"] > 0)
+    assert tidak_dikenal == set(df_gambar.index[~dikenal & valid])
+
+
+def test_lowercase_phase_uses_three_phase_current_for_losses_only():
+    df = pd.DataFrame({"Nama Lokasi": ["A", "B"], "Jenis Kabel": ["Kabel X", "Kabel A"],
+                       "Panjang Jaringan (m)": [1000.0, 1000.0], "Beban Total (kVA)": [100.0, 100.0],
+                       "Tegangan (V)": [380.0, 380.0], "Tipe Phase": ["3 phase", "3 Phase"]})
+
+    losses, _, unknown, _ = app.calculate_conductor_losses(df, RESISTANSI)
+
+    # 'Kabel X' tidak dikenal memakai kabel pertama; '3 phase' tetap dihitung 3 phase
+    assert losses[0] == pytest.approx(losses[1])
+    assert unknown.tolist() == [True, False]
+
+
+def test_transformer_loss_array_matches_row_formula():
+    beban = np.array([0.0, -1.0, 50.0, 100.0, 80.0])
+    daya_trafo = np.array([100.0, 100.0, 0.0, 100.0, 160.0])
+
+    rugi = app.calculate_transformer_loss_array(beban, daya_trafo, 0.3, 1.2)
+
+    np.testing.assert_allclose(rugi, [0.3, 0.3, 0.3, 1.5, 0.3 + (80 / 160) ** 2 * 1.2])
@@ -0,0 +1,84 @@
+"""Pengujian optimasi ukuran kabel berdasarkan biaya siklus hidup."""
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app_pln_analysis as app
+
+TANPA_BATAS = 1e9
+
+
+def hasil_dari(beban, tipe_phase=None, panjang=1000.0, tegangan=380.0):
+    """AnalysisResult minimal (tanpa profil beban) untuk lokasi dengan beban (kVA) tertentu."""
+    n = len(beban)
+    df = pd.DataFrame({
+        "Nama Lokasi": [f"Lokasi {i}" for i in range(n)],
+        "Jenis Kabel": "-",
+        "Panjang Jaringan (m)": panjang,
+        "Beban Total (kVA)": np.asarray(beban, dtype=float),
+        "Tegangan (V)": tegangan,
+        "Tipe Phase": tipe_phase or ["3 Phase"] * n,
+    })
+    return SimpleNamespace(df_gambar=df, profil=None)
+
+
+def katalog(*kabel):
+    """Katalog dari tuple (nama, resistansi, KHA, harga[, tipe phase])."""
+    df = pd.DataFrame([k[:4] for k in kabel], columns=app.CATALOGUE_COLUMNS)
+    df["Reaktansi (ohm/km)"] = 0.0
+    df["Tipe Phase"] = [k[4] if len(k) > 4 else "Semua" for k in kabel]
+    return df
+
+
+def optimal(hasil, df_katalog, batas_susut=TANPA_BATAS, **config):
+    """Kolom 'Kabel Optimal' hasil optimize_cables."""
+    config = {**app.DEFAULT_CONFIG, **config}
+    return app.optimize_cables(hasil, df_katalog, config, batas_susut=batas_susut)["Kabel Optimal"].tolist()
+
+
+def test_current_capacity_excludes_cables():
+    df_katalog = katalog(("Kecil", 0.5, 50, 1000), ("Besar", 0.5, 200, 2000))
+
+    # Arus 3 phase 380 V: 10 kVA ≈ 15 A, 100 kVA ≈ 152 A, 200 kVA ≈ 304 A
+    assert optimal(hasil_dari([10, 100, 200]), df_katalog) == ["Kecil", "Besar", "Tidak ada kabel memenuhi"]
+
+
+def test_voltage_drop_excludes_cables():
+    df_katalog = katalog(("Tipis", 0.5, 1000, 1000), ("Tebal", 0.05, 1000, 1_000_000))
+    hasil = hasil_dari([10])  # susut ≈ 2,8% dengan kabel Tipis, 0,28% dengan kabel Tebal
+
+    assert optimal(hasil, df_katalog, batas_susut=5.0, tarif_kwh=0) == ["Tipis"]
+    assert optimal(hasil, df_katalog, batas_susut=1.0, tarif_kwh=0) == ["Tebal"]
+    assert optimal(hasil, df_katalog, batas_susut=0.1, tarif_kwh=0) == ["Tidak ada kabel memenuhi"]
+
+
+def test_phase_filter():
+    df_katalog = katalog(("Khusus 1P", 0.5, 1000, 100, "1 Phase"), ("Khusus 3P", 0.5, 1000, 500, "3 Phase"),
+                         ("Umum", 0.5, 1000, 1000))
+    hasil = hasil_dari([5, 5, 5], tipe_phase=["1 Phase", "3 phase", "3 Phase"], tegangan=220.0)
+
+    assert optimal(hasil, df_katalog, tarif_kwh=0) == ["Khusus 1P", "Khusus 3P", "Khusus 3P"]
+    assert optimal(hasil, df_katalog.iloc[[0, 2]], tarif_kwh=0) == ["Khusus 1P", "Umum", "Umum"]
+
+
+def test_invalid_load_has_no_cable():
+    assert optimal(hasil_dari([0, -3]), katalog(("A", 0.5, 1000, 1000))) == ["Tidak ada kabel memenuhi"] * 2
+
+
+def test_picks_lowest_lifecycle_cost():
+    df_katalog = katalog(("Murah", 1.0, 1000, 1000), ("Efisien", 0.1, 1000, 50_000))
+    hasil = hasil_dari([2, 150])
+    config = dict(app.DEFAULT_CONFIG)
+
+    df_optimal = app.optimize_cables(hasil, df_katalog, config, umur_tahun=30, suku_bunga=0.08, batas_susut=TANPA_BATAS)
+
+    arus = 1000 * hasil.df_gambar["Beban Total (kVA)"].to_numpy() / (np.sqrt(3) * 380)
+    pv = app.present_value_factor(0.08, 30)
+    biaya = {nama: harga * 1000 + arus ** 2 * r * 1.0 / 1000 * app.HOURS_PER_YEAR * config["tarif_kwh"] * pv
+             for nama, r, harga in [("Murah", 1.0, 1000), ("Efisien", 0.1, 50_000)]}
+    terbaik = [min(biaya, key=lambda k: biaya[k][i]) for i in range(2)]
+    assert terbaik == ["Murah", "Efisien"]  # beban kecil: investasi dominan; beban besar: losses dominan
+    assert df_optimal["Kabel Optimal"].tolist() == terbaik
+    assert df_optimal["Biaya Siklus Hidup (Rp)"].tolist() == pytest.approx([biaya[k][i] for i, k in enumerate(terbaik)])
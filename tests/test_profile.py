@@ -0,0 +1,23 @@
+"""Pengujian ringkasan profil beban."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import app_pln_analysis as app
+
+
+def profile(n=24):
+    """Profil beban per jam satu hari dengan kolom Waktu."""
+    return pd.DataFrame({
+        "Waktu": pd.date_range("2024-01-01", periods=n, freq="h").astype(str).astype(object),
+        "Default": np.linspace(0.3, 1.0, n),
+    })
+
+
+@pytest.mark.parametrize("nilai", ["bukan tanggal", None])
+def test_invalid_waktu_raises_validation_error(nilai):
+    df_profil = profile()
+    df_profil.loc[3, "Waktu"] = nilai
+
+    with pytest.raises(app.ValidationError, match="Waktu"):
+        app.summarize_load_profile(df_profil, 1500)
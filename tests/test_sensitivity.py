@@ -0,0 +1,24 @@
+"""Pengujian skenario sensitivitas terhadap analisis penuh dengan parameter yang sama."""
+import numpy as np
+import pytest
+
+import app_pln_analysis as app
+from test_incremental import MODES, make_dataset, run_full
+
+SKENARIO = {"tarif_kwh": 1.2, "faktor_daya": 0.9, "core_loss": 1.1, "full_load_loss": 0.8, "baseline_losses": 1.15}
+
+
+@pytest.mark.parametrize("tarif_wbp", [0, 2500])
+@pytest.mark.parametrize("mode", MODES)
+def test_scenario_matches_full_run(mode, tarif_wbp):
+    df_rab, df_gambar, profil = make_dataset(mode)
+    config = {**app.DEFAULT_CONFIG, "tarif_wbp": tarif_wbp}
+    config_skenario = {**config, **{k: config[k] * v for k, v in SKENARIO.items()}}
+    hasil = run_full(df_rab, df_gambar, profil, config)
+    acuan = run_full(df_rab, df_gambar, profil, config_skenario)
+
+    params = {k: np.array([float(config[k]), float(config_skenario[k])]) for k in app.SENSITIVITY_PARAMS}
+    roi, efisiensi = app.evaluate_scenarios(app.prepare_sensitivity_inputs(hasil, config), params)
+
+    assert roi == pytest.approx([hasil.roi, acuan.roi], rel=1e-9)
+    assert efisiensi[1] == pytest.approx(acuan.df_gambar["Efisiensi (%)"].mean(), rel=1e-9)
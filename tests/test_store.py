@@ -0,0 +1,119 @@
+"""Pengujian penyimpanan proyek SQLite (ProjectStore)."""
+import sqlite3
+from datetime import date
+
+import pytest
+
+import app_pln_analysis as app
+from benchmark_pln_analysis import generate_gambar, generate_rab, workbook_bytes
+from test_incremental import Unggahan
+
+
+def analisis(config, n_rows=60, n_lokasi=12, seed=0):
+    """Analisis penuh workbook sintetis kecil."""
+    df_gambar = generate_gambar(n_rows, n_lokasi=n_lokasi, seed=seed)
+    return app.run_analysis(Unggahan(workbook_bytes(generate_rab(seed=seed), df_gambar)), config)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return app.ProjectStore(str(tmp_path / "proyek" / "proyek.db"))
+
+
+def hitung(store, tabel):
+    """Jumlah baris satu tabel di database penyimpanan."""
+    with sqlite3.connect(store.path) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {tabel}").fetchone()[0]
+
+
+def test_save_analysis_stores_rows_and_locations(store, config):
+    hasil = analisis(config)
+
+    analisis_id = store.save_analysis(hasil, hasil.df_gambar, "h1", "a.xlsx", "ULP A", date(2024, 1, 31), config)
+
+    daftar = store.analyses()
+    assert daftar["ID"].tolist() == [analisis_id]
+    assert daftar.loc[0, "Tanggal"] == "2024-01-31"
+    assert daftar.loc[0, "Jumlah Baris"] == len(hasil.df_gambar)
+    assert daftar.loc[0, "Jumlah Lokasi"] == hasil.df_gambar["Nama Lokasi"].nunique()
+    assert daftar.loc[0, "Total Biaya (Rp)"] == pytest.approx(hasil.total_biaya)
+    assert hitung(store, "hasil_baris") == len(hasil.df_gambar)
+    assert hitung(store, "rab") == len(hasil.df_rab)
+
+
+def test_save_analysis_replaces_same_hash_ulp_date(store, config):
+    hasil = analisis(config)
+    hasil_baru = analisis(config, n_rows=40, n_lokasi=8, seed=1)
+    lama = store.save_analysis(hasil, hasil.df_gambar, "h1", "a.xlsx", "ULP A", "2024-01-31", config)
+
+    baru = store.save_analysis(hasil_baru, hasil_baru.df_gambar, "h1", "a.xlsx", "ULP A", "2024-01-31", config)
+
+    assert baru != lama
+    assert store.analyses()["ID"].tolist() == [baru]
+    assert hitung(store, "hasil_baris") == len(hasil_baru.df_gambar)
+    assert hitung(store, "lokasi") == hasil_baru.df_gambar["Nama Lokasi"].nunique()
+    # Workbook dengan hash yang sama tidak ditulis ulang
+    assert hitung(store, "workbook") == 1
+    assert hitung(store, "rab") == len(hasil.df_rab)
+
+
+def test_delete_analysis_cascades_and_drops_orphan_workbook(store, config):
+    hasil = analisis(config)
+    a = store.save_analysis(hasil, hasil.df_gambar, "h1", "a.xlsx", "ULP A", "2024-01-31", config)
+    b = store.save_analysis(hasil, hasil.df_gambar, "h1", "a.xlsx", "ULP A", "2024-02-29", config)
+    c = store.save_analysis(hasil, hasil.df_gambar, "h2", "b.xlsx", "ULP B", "2024-01-31", config)
+
+    store.delete_analysis(a)
+    # h1 masih dipakai analisis b
+    assert hitung(store, "workbook") == 2
+
+    store.delete_analysis(c)
+    assert store.analyses()["ID"].tolist() == [b]
+    assert hitung(store, "workbook") == 1
+    assert hitung(store, "rab") == len(hasil.df_rab)
+    assert hitung(store, "hasil_baris") == len(hasil.df_gambar)
+    assert hitung(store, "lokasi") == hasil.df_gambar["Nama Lokasi"].nunique()
+
+    store.delete_analysis(b)
+    assert [hitung(store, t) for t in ["analisis", "hasil_baris", "lokasi", "workbook", "rab"]] == [0] * 5
+
+
+def test_portfolio_by_ulp(store, config):
+    hasil = analisis(config)
+    hasil_baru = analisis(config, seed=1)
+    store.save_analysis(hasil, hasil.df_gambar, "h1", "a.xlsx", "ULP A", "2024-01-31", config)
+    store.save_analysis(hasil_baru, hasil_baru.df_gambar, "h2", "b.xlsx", "ULP A", "2024-02-29", config)
+    store.save_analysis(hasil, hasil.df_gambar, "h1", "a.xlsx", "ULP B", "2024-01-31", config)
+
+    semua = store.portfolio_by_ulp().set_index("ULP")
+    terbaru = store.portfolio_by_ulp(terbaru=True).set_index("ULP")
+
+    assert semua.loc["ULP A", "Jumlah Analisis"] == 2
+    assert semua.loc["ULP A", "Total Biaya (Rp)"] == pytest.approx(hasil.total_biaya + hasil_baru.total_biaya)
+    assert semua.loc["ULP A", "ROI (%)"] == pytest.approx(
+        (hasil.total_manfaat + hasil_baru.total_manfaat) * 100 / (hasil.total_biaya + hasil_baru.total_biaya))
+    assert terbaru.loc["ULP A", "Jumlah Analisis"] == 1
+    assert terbaru.loc["ULP A", "Total Biaya (Rp)"] == pytest.approx(hasil_baru.total_biaya)
+    assert terbaru.loc["ULP B", "ROI (%)"] == pytest.approx(hasil.roi)
+
+
+def test_worst_locations_and_location_history(store, config):
+    hasil = analisis(config)
+    store.save_analysis(hasil, hasil.df_gambar, "h1", "a.xlsx", "ULP A", "2024-02-29", config)
+    store.save_analysis(hasil, hasil.df_gambar, "h1", "a.xlsx", "ULP B", "2024-01-31", config)
+    per_lokasi = hasil.df_gambar.groupby("Nama Lokasi")["Efisiensi (%)"].mean().dropna().sort_values()
+
+    terburuk = store.worst_locations(n=3, ulp="ULP A")
+
+    assert terburuk["ULP"].eq("ULP A").all()
+    assert terburuk["Nama Lokasi"].tolist() == per_lokasi.index[:3].tolist()
+    assert terburuk["Efisiensi (%)"].tolist() == pytest.approx(per_lokasi.iloc[:3].tolist())
+    assert len(store.worst_locations(n=3)) == 3
+
+    nama = per_lokasi.index[0]
+    riwayat = store.location_history(nama)
+
+    assert riwayat["Tanggal"].tolist() == ["2024-01-31", "2024-02-29"]
+    assert riwayat["ULP"].tolist() == ["ULP B", "ULP A"]
+    assert riwayat["Jumlah Baris"].tolist() == [(hasil.df_gambar["Nama Lokasi"] == nama).sum()] * 2
+    assert store.location_history("Tidak Ada").empty
@@ -0,0 +1,40 @@
+"""Pengujian mode streaming terhadap analisis penuh."""
+import io
+
+import pytest
+
+import app_pln_analysis as app
+from benchmark_pln_analysis import generate_gambar, generate_rab, workbook_bytes
+
+
+def analyze_both(df_gambar, config, tmp_path, chunk_rows=100):
+    """Menjalankan analisis penuh dan streaming untuk workbook yang sama."""
+    data = workbook_bytes(generate_rab(), df_gambar)
+    penuh = app.run_analysis(io.BytesIO(data), config)
+    streaming = app.run_streaming_analysis(io.BytesIO(data), config, str(tmp_path / "hasil.parquet"),
+                                           chunk_rows=chunk_rows)
+    return penuh, streaming
+
+
+def test_streaming_chunk_with_empty_text_column(config, tmp_path):
+    df_gambar = generate_gambar(400, seed=1)
+    df_gambar["Tipe Phase"] = df_gambar["Tipe Phase"].astype(object)
+    df_gambar.loc[:199, "Tipe Phase"] = None
+
+    penuh, streaming = analyze_both(df_gambar, config, tmp_path)
+
+    assert streaming.jumlah_baris == len(df_gambar)
+    assert streaming.total_manfaat == pytest.approx(penuh.total_manfaat)
+    assert streaming.roi == pytest.approx(penuh.roi)
+
+
+def test_streaming_chunk_with_short_rows(config, tmp_path):
+    # Kolom terakhir kosong di seluruh potongan pertama: baris worksheet lebih pendek dari header
+    df_gambar = generate_gambar(400, seed=2, daya_trafo=False)
+    df_gambar["Profil Beban"] = None
+    df_gambar.loc[300:, "Profil Beban"] = "Default"
+
+    penuh, streaming = analyze_both(df_gambar, config, tmp_path)
+
+    assert streaming.jumlah_baris == len(df_gambar)
+    assert streaming.total_manfaat == pytest.approx(penuh.total_manfaat)
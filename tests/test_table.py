@@ -0,0 +1,24 @@
+"""Pengujian query tabel di server (pencarian, filter, dan pengurutan)."""
+import numpy as np
+import pandas as pd
+
+import app_pln_analysis as app
+
+
+def test_sort_mixed_type_column_as_text():
+    # Sheet RAB: judul bagian teks di kolom 'No' diikuti nomor item
+    df = pd.DataFrame({"No": ["A", 1, 2, "B", 3, None], "Harga": [0, 10, 20, 0, 30, 5]})
+
+    naik = app.query_table(df, kolom_urut="No")
+    turun = app.query_table(df, kolom_urut="No", naik=False)
+
+    assert df["No"].take(naik).tolist() == [1, 2, 3, "A", "B", None]
+    assert df["No"].take(turun).tolist() == ["B", "A", 3, 2, 1, None]
+
+
+def test_sort_numeric_column_after_filter():
+    df = pd.DataFrame({"Nama": ["x", "y", "z", "w"], "Nilai": [3.0, np.nan, 1.0, 2.0]})
+
+    posisi = app.query_table(df, cari="", kolom_urut="Nilai", kolom_filter="Nilai", rentang=(1.5, None))
+
+    assert posisi.tolist() == [3, 0]
@@ -0,0 +1,107 @@
+"""Pengujian topologi penyulang radial: pembentukan pohon, akumulasi, dan susut tegangan."""
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app_pln_analysis as app
+from benchmark_pln_analysis import generate_gambar, generate_rab, workbook_bytes
+
+
+def random_forest(n, seed, n_akar=3):
+    """ID dan induk acak: tiap segmen berinduk pada segmen sebelumnya, baris diacak."""
+    rng = np.random.default_rng(seed)
+    induk = np.array([-1 if i < n_akar else rng.integers(0, i) for i in range(n)])
+    acak = rng.permutation(n)
+    ids = np.array([f"S{i}" for i in range(n)], dtype=object)
+    parents = np.array([None if p < 0 else f"S{p}" for p in induk], dtype=object)
+    return ids[acak], parents[acak]
+
+
+def naive_sums(ids, parents, nilai):
+    """Jumlah hilir dan jumlah dari akar dengan menelusuri induk satu per satu."""
+    posisi = {k: i for i, k in enumerate(ids)}
+    induk = [posisi.get(p, -1) if p is not None else -1 for p in parents]
+    hilir = np.array(nilai, dtype=float)
+    dari_akar = np.array(nilai, dtype=float)
+    for v in range(len(ids)):
+        u = induk[v]
+        while u >= 0:
+            hilir[u] += nilai[v]
+            dari_akar[v] += nilai[u]
+            u = induk[u]
+    return hilir, dari_akar
+
+
+def test_duplicate_ids_raise():
+    with pytest.raises(app.ValidationError, match="unik"):
+        app.build_feeder_topology(["A", "B", "A"], [None, "A", "B"])
+
+
+@pytest.mark.parametrize("parents", [["B", "C", "A"], [None, "C", "B"]])
+def test_cycle_raises(parents):
+    with pytest.raises(app.ValidationError, match="siklus"):
+        app.build_feeder_topology(["A", "B", "C"], parents)
+
+
+def test_missing_parent_is_root():
+    topologi = app.build_feeder_topology(["A", "B", "C"], [None, "X", "B"])
+
+    assert topologi["induk"].tolist() == [-1, -1, 1]
+    assert topologi["induk_tidak_ditemukan"] == 1
+    assert app.accumulate_downstream(topologi, [1.0, 2.0, 4.0]).tolist() == [1.0, 6.0, 4.0]
+
+
+def test_float_ids_match_integer_parents():
+    topologi = app.build_feeder_topology(pd.Series([1.0, 2.0, 3.0]), pd.Series([None, 1, 2], dtype=object))
+
+    assert topologi["induk"].tolist() == [-1, 0, 1]
+
+
+@pytest.mark.parametrize("max_levels", [app.TOPOLOGY_MAX_VECTOR_LEVELS, 4])
+def test_accumulation_matches_parent_walk(monkeypatch, max_levels):
+    monkeypatch.setattr(app, "TOPOLOGY_MAX_VECTOR_LEVELS", max_levels)
+    ids, parents = random_forest(3000, seed=max_levels)
+    nilai = np.random.default_rng(1).uniform(0, 10, len(ids))
+
+    topologi = app.build_feeder_topology(ids, parents)
+    hilir, dari_akar = naive_sums(ids, parents, nilai)
+
+    assert (topologi["level"] is None) == (max_levels == 4)
+    np.testing.assert_allclose(app.accumulate_downstream(topologi, nilai), hilir, rtol=1e-12)
+    np.testing.assert_allclose(app.accumulate_from_root(topologi, nilai), dari_akar, rtol=1e-12)
+
+
+def test_deep_chain_uses_fallback():
+    n = app.TOPOLOGY_MAX_VECTOR_LEVELS + 500
+    ids = np.array([f"S{i}" for i in range(n)], dtype=object)
+    parents = np.array([None] + [f"S{i}" for i in range(n - 1)], dtype=object)
+
+    topologi = app.build_feeder_topology(ids[::-1], parents[::-1])
+
+    assert topologi["level"] is None
+    hilir = app.accumulate_downstream(topologi, np.ones(n))
+    dari_akar = app.accumulate_from_root(topologi, np.ones(n))
+    assert hilir[::-1].tolist() == list(range(n, 0, -1))
+    assert dari_akar[::-1].tolist() == list(range(1, n + 1))
+
+
+def test_run_analysis_with_feeder_topology(config):
+    df_gambar = generate_gambar(60, n_lokasi=60, daya_trafo=False, seed=8)
+    ids, parents = random_forest(len(df_gambar), seed=8)
+    df_gambar["ID Segmen"] = ids
+    df_gambar["Segmen Induk"] = parents
+
+    hasil = app.run_analysis(io.BytesIO(workbook_bytes(generate_rab(), df_gambar)), config)
+
+    df = hasil.df_gambar
+    segmen, induk = list(df["ID Segmen"]), [p if isinstance(p, str) else None for p in df["Segmen Induk"]]
+    beban = df["Beban Total (kVA)"].to_numpy(dtype=float)
+    hilir, _ = naive_sums(segmen, induk, beban)
+    np.testing.assert_allclose(df["Beban Kumulatif (kVA)"], hilir, rtol=1e-12)
+    akar = df["Segmen Induk"].isna().to_numpy()
+    assert df.loc[akar, "Beban Kumulatif (kVA)"].sum() == pytest.approx(beban.sum())
+    # Susut kumulatif = susut segmen sendiri + susut seluruh segmen di hulu
+    _, susut_hulu = naive_sums(segmen, induk, df["Susut Tegangan Segmen (%)"].to_numpy())
+    np.testing.assert_allclose(df["Susut Tegangan Kumulatif (%)"], susut_hulu, rtol=1e-12)
@@ -0,0 +1,72 @@
+"""Pengujian laporan validasi workbook."""
+import io
+
+import pandas as pd
+import pytest
+
+import app_pln_analysis as app
+from benchmark_pln_analysis import generate_gambar, generate_rab, workbook_bytes
+
+
+def workbook_with_blank_row(n_rows=10, baris_kosong=6, baris_negatif=7):
+    """Workbook dengan satu baris kosong dan Beban Total negatif, keduanya dalam nomor baris Excel."""
+    df_gambar = generate_gambar(n_rows, seed=5).astype(object)
+    df_gambar.loc[baris_negatif - 3, "Beban Total (kVA)"] = -5.0  # posisi data setelah header dan baris kosong
+    kosong = pd.DataFrame([[None] * df_gambar.shape[1]], columns=df_gambar.columns)
+    posisi = baris_kosong - 2
+    df_gambar = pd.concat([df_gambar.iloc[:posisi], kosong, df_gambar.iloc[posisi:]], ignore_index=True)
+    return workbook_bytes(generate_rab(), df_gambar)
+
+
+@pytest.mark.parametrize("sumber", ["excel", "cache"])
+def test_report_uses_spreadsheet_row_numbers(config, sumber):
+    data = workbook_with_blank_row()
+    app.load_workbook(data)
+
+    df_rab, df_gambar, _, info = app.load_workbook(data) if sumber == "cache" else app.load_workbook(data, cache=False)
+    laporan = app.validate_workbook(df_rab, df_gambar, config["selected_kabel"])
+
+    assert info["sumber"] == sumber
+    assert laporan.kesalahan[["Sheet", "Baris", "Kolom"]].values.tolist() == [["Gambar", 7, "Beban Total (kVA)"]]
+    with pytest.raises(app.ValidationError, match="baris 7 kolom 'Beban Total \\(kVA\\)'"):
+        laporan.raise_if_invalid()
+
+
+def test_streaming_report_uses_spreadsheet_row_numbers(config, tmp_path):
+    data = workbook_with_blank_row(n_rows=40, baris_kosong=6, baris_negatif=30)
+
+    with pytest.raises(app.ValidationError) as e:
+        app.run_streaming_analysis(io.BytesIO(data), config, str(tmp_path / "hasil.parquet"), chunk_rows=8)
+
+    assert e.value.laporan.kesalahan["Baris"].tolist() == [30]
+
+
+def workbook_with_text_cells():
+    """Workbook dengan teks di kolom Total (Rp) RAB dan Baseline Losses (kW) Gambar."""
+    df_rab = generate_rab(5).astype({"Total (Rp)": object})
+    df_rab.loc[1, "Total (Rp)"] = "Rp 1.000.000"
+    df_gambar = generate_gambar(6, seed=5)
+    df_gambar["Baseline Losses (kW)"] = pd.Series([5.0, "n/a", 4.0, -1.0, 3.0, 2.0], dtype=object)
+    return workbook_bytes(df_rab, df_gambar)
+
+
+def test_report_flags_text_in_total_and_baseline(config):
+    df_rab, df_gambar, _, _ = app.load_workbook(workbook_with_text_cells(), cache=False)
+
+    laporan = app.validate_workbook(df_rab, df_gambar, config["selected_kabel"])
+
+    assert laporan.kesalahan[["Sheet", "Baris", "Kolom", "Alasan"]].values.tolist() == [
+        ["RAB", 3, "Total (Rp)", "harus berisi angka"],
+        ["Gambar", 3, "Baseline Losses (kW)", "harus berisi angka"],
+        ["Gambar", 5, "Baseline Losses (kW)", "tidak boleh negatif"],
+    ]
+    with pytest.raises(app.ValidationError):
+        app.run_analysis(io.BytesIO(workbook_with_text_cells()), config)
+
+
+def test_streaming_report_flags_text_in_total(config, tmp_path):
+    with pytest.raises(app.ValidationError) as e:
+        app.run_streaming_analysis(io.BytesIO(workbook_with_text_cells()), config,
+                                   str(tmp_path / "hasil.parquet"), chunk_rows=4)
+
+    assert e.value.laporan.kesalahan[["Sheet", "Baris", "Kolom"]].values.tolist() == [["RAB", 3, "Total (Rp)"]]